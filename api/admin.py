@@ -1,3 +1,338 @@
+"""
+Admin for tables too large for the stock change list.
+
+``LargeTableAdmin`` counts rows with ``estimated_count`` instead of an exact
+``COUNT(*)`` and pages newest id first with ``?cursor=<last id>`` instead of
+offsets, so every page costs the same. Todo filters only use indexed columns,
+owners are picked with autocomplete, and the actions update or delete
+``ADMIN_ACTION_BATCH_SIZE`` todos per statement.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from .models import Todo, User
+from .shards import all_shards, on_shard
+from .signals import notify_todos_changed
+
+CURSOR_VAR = "cursor"
+
+
+def estimated_count(queryset, limit):
+    """
+    ``(count, estimated)`` for ``queryset``: exact up to ``limit`` rows, above
+    that the planner's estimate on Postgres, ``sqlite_stat1`` for a whole
+    SQLite table after ``ANALYZE``, or else ``limit`` itself.
+    """
+    queryset = queryset.order_by()
+    count = queryset[: limit + 1].count()
+    if count <= limit:
+        return count, False
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    estimate = None
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql" and not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [table],
+                )
+                estimate = cursor.fetchone()[0]
+            elif connection.vendor == "postgresql":
+                sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = plan[0]["Plan"]["Plan Rows"]
+            elif connection.vendor == "sqlite" and not queryset.query.where:
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+                )
+                row = cursor.fetchone()
+                estimate = int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        # No statistics yet (sqlite_stat1 only exists after ANALYZE).
+        estimate = None
+    # Estimates can be stale; the capped count is a lower bound.
+    return max(estimate or 0, limit), True
+
+
+class EstimatedCountPaginator(Paginator):
+    estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.estimated = estimated_count(
+            self.object_list, settings.ADMIN_EXACT_COUNT_LIMIT
+        )
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """Change list paged by ``?cursor=<last id>``, newest id first."""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_ordering(self, request, queryset):
+        return ["-pk"]
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        queryset = self.queryset
+        self.cursor = request.GET.get(CURSOR_VAR)
+        if self.cursor:
+            try:
+                queryset = queryset.filter(pk__lt=int(self.cursor))
+            except ValueError:
+                raise IncorrectLookupParameters
+        result_list = list(queryset[: self.list_per_page + 1])
+        self.next_page_url = None
+        if len(result_list) > self.list_per_page:
+            result_list = result_list[: self.list_per_page]
+            self.next_page_url = self.get_query_string(
+                {CURSOR_VAR: result_list[-1].pk}
+            )
+        self.first_page_url = self.get_query_string(remove=[CURSOR_VAR])
+
+        self.result_count = paginator.count
+        self.count_estimated = paginator.estimated
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_page_url)
+        self.paginator = paginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    ordering = ("-pk",)
+    show_full_result_count = False
+    sortable_by = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Which shard's todos to list; there is no list across all shards."""
+
+    title = "shard"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in all_shards()]
+
+    def value(self):
+        return super().value() or settings.TODO_SHARDS[0]
+
+    def queryset(self, request, queryset):
+        if self.value() not in dict(self.lookup_choices):
+            raise IncorrectLookupParameters
+        return queryset.using(self.value())
+
+    def choices(self, changelist):
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": self.value() == lookup,
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: lookup}, [CURSOR_VAR]
+                ),
+                "display": title,
+            }
+
+
+class OwnerFilter(admin.SimpleListFilter):
+    """One user's todos; set by the owner links rather than listing all users."""
+
+    title = "owner"
+    parameter_name = "owner"
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value:
+            return []
+        user = User.objects.filter(pk=value).first() if value.isdigit() else None
+        return [(value, str(user or value))]
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        if not value.isdigit():
+            raise IncorrectLookupParameters
+        return on_shard(queryset.filter(created_by_id=value), int(value))
+
+
+class ExpiryFilter(admin.SimpleListFilter):
+    title = "expiry"
+    parameter_name = "expiry"
+    windows = {"day": timedelta(days=1), "week": timedelta(days=7)}
+
+    def lookups(self, request, model_admin):
+        return [
+            ("overdue", "Overdue"),
+            ("day", "Expires within a day"),
+            ("week", "Expires within a week"),
+            ("none", "Never expires"),
+        ]
+
+    def queryset(self, request, queryset):
+        now = timezone.now()
+        value = self.value()
+        if value == "overdue":
+            return queryset.overdue(now)
+        if value in self.windows:
+            return queryset.filter(
+                expires_at__gte=now, expires_at__lt=now + self.windows[value]
+            )
+        if value == "none":
+            return queryset.filter(expires_at__isnull=True)
+        return queryset
+
+
+class TodoChangeList(KeysetChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        if settings.TODO_SHARDS:
+            # Owners live on the default database, so they cannot be joined.
+            owner_ids = {todo.created_by_id for todo in self.result_list}
+            owners = User.objects.in_bulk(owner_ids - {None})
+            for todo in self.result_list:
+                Todo.created_by.field.set_cached_value(
+                    todo, owners.get(todo.created_by_id)
+                )
+
+
+@admin.register(Todo)
+class TodoAdmin(LargeTableAdmin):
+    list_display = ("id", "title", "status", "owner", "expires_at", "updated_at")
+    list_filter = ("status", ExpiryFilter, OwnerFilter)
+    list_select_related = ("created_by",)
+    autocomplete_fields = ("created_by", "updated_by")
+    readonly_fields = ("created_at", "updated_at")
+    actions = ("mark_completed", "expire", "delete_todos")
+
+    def get_changelist(self, request, **kwargs):
+        return TodoChangeList
+
+    def get_list_filter(self, request):
+        if settings.TODO_SHARDS:
+            return (ShardFilter, *self.list_filter)
+        return self.list_filter
+
+    def get_list_select_related(self, request):
+        return () if settings.TODO_SHARDS else self.list_select_related
+
+    def get_actions(self, request):
+        # The stock action collects and lists every row before deleting.
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def get_object(self, request, object_id, from_field=None):
+        # A todo's id does not say which shard holds it, so look on each.
+        for alias in all_shards():
+            queryset = self.get_queryset(request).using(alias)
+            try:
+                return queryset.get(pk=object_id)
+            except (Todo.DoesNotExist, ValidationError, ValueError):
+                continue
+        return None
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        obj.delete()
+        notify_todos_changed(Todo, obj.created_by_id, "delete", [pk])
+
+    @admin.display(description="owner")
+    def owner(self, todo):
+        if todo.created_by_id is None:
+            return "-"
+        url = reverse("admin:api_todo_changelist")
+        return format_html(
+            '<a href="{}?owner={}">{}</a>', url, todo.created_by_id, todo.created_by
+        )
+
+    @admin.action(description="Mark selected todos completed", permissions=["change"])
+    def mark_completed(self, request, queryset):
+        changed = queryset.set_status(
+            "completed", batch_size=settings.ADMIN_ACTION_BATCH_SIZE
+        )
+        self.message_user(request, f"Marked {changed} todos as completed.")
+
+    @admin.action(description="Expire selected todos", permissions=["change"])
+    def expire(self, request, queryset):
+        changed = queryset.exclude(status="completed").set_status(
+            "expired", batch_size=settings.ADMIN_ACTION_BATCH_SIZE, action="expire"
+        )
+        self.message_user(request, f"Expired {changed} todos.")
+
+    @admin.action(description="Delete selected todos", permissions=["delete"])
+    def delete_todos(self, request, queryset):
+        deleted = queryset.delete_in_batches(settings.ADMIN_ACTION_BATCH_SIZE)
+        self.message_user(request, f"Deleted {deleted} todos.")
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
+    """
+    Django's user admin (password change and add forms included) on the
+    keyset change list. Searches match an email prefix, which the
+    ``user_email_search_idx`` index serves on Postgres.
+    """
+
+    list_display = ("id", "email", "is_active", "is_staff", "created_at", "todos")
+    list_filter = ()
+    search_fields = ("^email",)
+    fieldsets = (
+        (None, {"fields": ("email", "password")}),
+        (
+            "Permissions",
+            {
+                "fields": (
+                    "is_active",
+                    "is_staff",
+                    "is_superuser",
+                    "groups",
+                    "user_permissions",
+                ),
+            },
+        ),
+        ("Important dates", {"fields": ("last_login", "created_at")}),
+    )
+    add_fieldsets = (
+        (
+            None,
+            {
+                "classes": ("wide",),
+                "fields": ("email", "usable_password", "password1", "password2"),
+            },
+        ),
+    )
+    readonly_fields = ("last_login", "created_at")
 
-# Register your models here.
+    @admin.display(description="todos")
+    def todos(self, user):
+        url = reverse("admin:api_todo_changelist")
+        return format_html('<a href="{}?owner={}">Todos</a>', url, user.pk)
@@ -0,0 +1,269 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication
+from .events import get_broker
+from .filters import TodoFilterBackend
+from .hashing import HashingQueueFull, acheck_password, amake_password
+from .models import Todo, User
+from .pagination import KeysetPagination
+from .serializers import CredentialsSerializer, RegisterSerializer, TodoSerializer
+from .shards import check_writable, shard_for
+from .signals import notify_todos_changed
+
+
+def parse_json(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def error_response(detail, status_code):
+    return JsonResponse({"detail": detail}, status=status_code)
+
+
+def busy_response():
+    response = error_response(
+        "Too many authentication requests, try again shortly.",
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response["Retry-After"] = "1"
+    return response
+
+
+def token_response(user, status_code=status.HTTP_200_OK):
+    refresh = RefreshToken.for_user(user)
+    return JsonResponse(
+        {
+            "email": user.email,
+            "access": str(refresh.access_token),
+            "refresh": str(refresh),
+        },
+        status=status_code,
+    )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegisterView(View):
+    """``RegisterView`` with password hashing moved to the hashing pool."""
+
+    async def post(self, request):
+        data = parse_json(request)
+        if data is None:
+            return error_response("Invalid JSON body.", status.HTTP_400_BAD_REQUEST)
+
+        serializer = RegisterSerializer(data=data)
+        # The unique email validator queries the database.
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            password = await amake_password(serializer.validated_data["password"])
+        except HashingQueueFull:
+            return busy_response()
+
+        user = User(
+            email=User.objects.normalize_email(serializer.validated_data["email"]),
+            password=password,
+        )
+        try:
+            await user.asave()
+        except IntegrityError:
+            return JsonResponse(
+                {"email": ["user with this email already exists."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return token_response(user, status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncLoginView(View):
+    """``LoginView`` with password verification moved to the hashing pool."""
+
+    async def post(self, request):
+        data = parse_json(request)
+        if data is None:
+            return error_response("Invalid JSON body.", status.HTTP_400_BAD_REQUEST)
+
+        serializer = CredentialsSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data["email"]
+        password = serializer.validated_data["password"]
+
+        user = await User.objects.filter(email=email).afirst()
+        try:
+            if user is None:
+                # Hash anyway so unknown emails take as long as wrong passwords.
+                await amake_password(password)
+                valid = False
+            else:
+                valid = await acheck_password(password, user.password)
+        except HashingQueueFull:
+            return busy_response()
+
+        if not valid or not user.is_active:
+            return JsonResponse(
+                {"non_field_errors": ["Invalid credentials"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return token_response(user)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncTodoView(View):
+    """
+    Base for the async todo views: JWT authentication with the async ORM and
+    DRF-style JSON errors.
+    """
+
+    authenticator = CachedJWTAuthentication()
+    shard = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            auth = await self.authenticator.aauthenticate(request)
+        except APIException as exc:
+            return self.exception_response(exc)
+        if auth is None:
+            response = error_response(
+                "Authentication credentials were not provided.",
+                status.HTTP_401_UNAUTHORIZED,
+            )
+            response["WWW-Authenticate"] = self.authenticator.authenticate_header(
+                request
+            )
+            return response
+        request.user, request.auth = auth
+
+        try:
+            if settings.TODO_SHARDS:
+                # The shard directory is read with the sync ORM.
+                self.shard = await sync_to_async(shard_for)(request.user.pk)
+                if request.method not in ("GET", "HEAD", "OPTIONS"):
+                    await sync_to_async(check_writable)(request.user)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.exception_response(exc)
+
+    def exception_response(self, exc):
+        detail = exc.detail
+        if not isinstance(detail, (list, dict)):
+            detail = {"detail": detail}
+        response = JsonResponse(detail, status=exc.status_code, safe=False)
+        if getattr(exc, "wait", None):
+            response["Retry-After"] = str(int(exc.wait))
+        return response
+
+    def get_queryset(self):
+        todos = Todo.objects.using(self.shard)
+        return todos.owned_by(self.request.user).with_effective_status()
+
+    def get_data(self):
+        data = parse_json(self.request)
+        if data is None:
+            raise ValidationError({"detail": "Invalid JSON body."})
+        return data
+
+
+class AsyncTodoListView(AsyncTodoView):
+    """Async ``TodoViewSet`` list and create."""
+
+    async def get(self, request):
+        drf_request = Request(request)
+        queryset = TodoFilterBackend().filter_queryset(
+            drf_request, self.get_queryset(), self
+        )
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(queryset, drf_request, self)
+        data = TodoSerializer(page, many=True).data
+        return JsonResponse(paginator.get_paginated_data(data))
+
+    async def post(self, request):
+        serializer = TodoSerializer(data=self.get_data())
+        serializer.is_valid(raise_exception=True)
+        await sync_to_async(serializer.save)(
+            created_by=request.user, updated_by=request.user
+        )
+        return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncTodoDetailView(AsyncTodoView):
+    """Async ``TodoViewSet`` retrieve, update and destroy."""
+
+    async def get_object(self, pk):
+        todo = await self.get_queryset().filter(pk=pk).afirst()
+        if todo is None:
+            raise NotFound()
+        return todo
+
+    async def get(self, request, pk):
+        todo = await self.get_object(pk)
+        return JsonResponse(TodoSerializer(todo).data)
+
+    async def put(self, request, pk, partial=False):
+        todo = await self.get_object(pk)
+        serializer = TodoSerializer(todo, data=self.get_data(), partial=partial)
+        serializer.is_valid(raise_exception=True)
+        await sync_to_async(serializer.save)(updated_by=request.user)
+        return JsonResponse(serializer.data)
+
+    async def patch(self, request, pk):
+        return await self.put(request, pk, partial=True)
+
+    async def delete(self, request, pk):
+        deleted = await sync_to_async(self.perform_destroy)(pk)
+        if not deleted:
+            raise NotFound()
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    def perform_destroy(self, pk):
+        deleted, _ = self.get_queryset().filter(pk=pk).delete()
+        if deleted:
+            notify_todos_changed(Todo, self.request.user.pk, "delete", [pk])
+        return deleted
+
+
+class TodoEventStreamView(AsyncTodoView):
+    """
+    Server-sent events for the user's todo changes. Serve it through
+    ``config.asgi``; under WSGI every open stream would hold a worker.
+    """
+
+    async def get(self, request):
+        response = StreamingHttpResponse(
+            self.stream(request.user.pk), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, user_id):
+        subscription = get_broker().subscribe(
+            user_id, settings.TODO_EVENTS_QUEUE_SIZE
+        )
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                event = await subscription.get(settings.TODO_EVENTS_HEARTBEAT)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                data = {key: value for key, value in event.items() if key != "event"}
+                yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            subscription.close()
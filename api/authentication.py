@@ -0,0 +1,172 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .metrics import record_cache
+from .revocation import is_revoked, revocations
+
+
+class UserCache:
+    """
+    Cache of users with a TTL: a cache from ``CACHES`` shared between processes,
+    or else a bounded in-process LRU. There is no local tier in front of the
+    shared cache, since other processes could not evict it. A ``timeout`` of 0
+    turns the cache off.
+    """
+
+    def __init__(self, max_entries, timeout, shared_cache=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.shared_cache = shared_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, user_id):
+        return f"auth:user:{user_id}"
+
+    def get(self, user_id):
+        # Token claims carry the id as a string; model instances as an int.
+        user_id = str(user_id)
+        if self.shared_cache is not None:
+            return caches[self.shared_cache].get(self.key(user_id))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(user_id)
+                    return copy.copy(user)
+                del self._entries[user_id]
+        return None
+
+    def set(self, user_id, user):
+        user_id = str(user_id)
+        if self.timeout <= 0:
+            return
+        if self.shared_cache is not None:
+            caches[self.shared_cache].set(self.key(user_id), user, self.timeout)
+        else:
+            self._store(user_id, user)
+
+    def delete(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self.shared_cache is not None:
+            caches[self.shared_cache].delete(self.key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (copy.copy(user), time.monotonic() + self.timeout)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+user_cache = UserCache(
+    max_entries=settings.AUTH_USER_CACHE["MAX_ENTRIES"],
+    timeout=settings.AUTH_USER_CACHE["TIMEOUT"],
+    shared_cache=settings.AUTH_USER_CACHE["SHARED_CACHE"],
+)
+
+
+class BatchAuthentication(BaseAuthentication):
+    """
+    Authenticates a batch sub-request as the user and token of its batch
+    request, which was authenticated once (see ``api.batch``). Sub-requests
+    carry no token, so ``CachedJWTAuthentication`` passes them on to this.
+    """
+
+    def authenticate(self, request):
+        return getattr(request._request, "batch_auth", None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that resolves users through ``user_cache`` so warm
+    tokens skip the per-request user SELECT. Entries are evicted whenever the
+    user is saved, deleted or changed with ``User.objects.update()``, which
+    covers ``is_active`` and password changes. Revoked tokens are rejected
+    using the in-process ``revocations`` list.
+    """
+
+    def authenticate(self, request):
+        revocations.refresh()
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        record_cache("user", "miss" if user is None else "hit")
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+        self.check_user(user, validated_token)
+        return user
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views, loading users with the async ORM."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        if revocations.due():
+            await sync_to_async(revocations.refresh)()
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        record_cache("user", "miss" if user is None else "hit")
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+        self.check_user(user, validated_token)
+        return user
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
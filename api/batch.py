@@ -0,0 +1,188 @@
+"""
+Batched API requests.
+
+``POST /api/v1/batch/`` runs an ordered list of sub-requests against the API's
+own views in one round trip. The batch is authenticated once; each sub-request
+is resolved with the URL resolver and passed straight to its view, without
+going through middleware, where ``BatchAuthentication`` authenticates it as the
+batch's user without checking the token again. Sub-requests inherit the batch
+request's headers, but may not set the host, proxy or credential headers.
+Views that do their own authentication (signup, login, token refresh) set
+``batchable = False`` and cannot be batched, so a batch cannot multiply
+password or token guesses.
+
+With ``"atomic": true`` the sub-requests share one transaction on the default
+database and on the user's shard, and the first one answered with a status of
+400 or above rolls the batch back and ends it. Changes are only published on
+commit, so reads in an atomic batch skip read replicas and the response cache
+to see the batch's own writes.
+"""
+import io
+import json
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import APIView
+
+from .shards import shard_for
+
+BATCH_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+# Describe the batch request itself rather than the sub-request. Without the
+# token, sub-requests fall through to BatchAuthentication.
+BATCH_ONLY_META = {
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_ACCEPT",
+    "HTTP_AUTHORIZATION",
+    "PATH_INFO",
+    "QUERY_STRING",
+    "REQUEST_METHOD",
+}
+# Headers a sub-request may not set: the host and proxy headers decide the
+# request's origin, and credentials come from the batch request.
+DENIED_HEADERS = {
+    "HTTP_AUTHORIZATION",
+    "HTTP_COOKIE",
+    "HTTP_FORWARDED",
+    "HTTP_HOST",
+    "HTTP_X_REAL_IP",
+}
+DENIED_HEADER_PREFIXES = ("HTTP_X_FORWARDED_",)
+
+
+class BatchTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Batch request body is too large."
+    default_code = "batch_too_large"
+
+
+def check_batch_size(request):
+    """Refuse bodies over ``BATCH_MAX_BYTES`` before they are parsed."""
+    try:
+        size = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        size = 0
+    if size > settings.BATCH_MAX_BYTES:
+        raise BatchTooLarge(
+            f"Batch request body is larger than {settings.BATCH_MAX_BYTES} bytes."
+        )
+
+
+def resolve_view(path):
+    """
+    The ``ResolverMatch`` for ``path`` (a path or URL, with any query string),
+    or None unless it is a DRF view that may run in a batch.
+    """
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, "cls", None)
+    if not (view_class and issubclass(view_class, APIView)):
+        return None
+    return match if getattr(view_class, "batchable", True) else None
+
+
+def header_key(name):
+    """The ``META`` key of the header ``name``."""
+    return "HTTP_" + name.upper().replace("-", "_")
+
+
+def is_denied_header(name):
+    key = header_key(name)
+    return key in DENIED_HEADERS or key.startswith(DENIED_HEADER_PREFIXES)
+
+
+def in_atomic_batch(request):
+    return getattr(request, "atomic_batch", False)
+
+
+def build_request(request, item, atomic):
+    """A request for ``item`` carrying the batch request's user and headers."""
+    url = urlsplit(item["path"])
+    body = json.dumps(item["body"]).encode() if "body" in item else b""
+    environ = {
+        key: value
+        for key, value in request.META.items()
+        if key not in BATCH_ONLY_META and not key.startswith(("HTTP_IF_", "wsgi."))
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": item["method"],
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "HTTP_ACCEPT": "application/json",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.url_scheme": request.scheme,
+        }
+    )
+    for name, value in item.get("headers", {}).items():
+        if not is_denied_header(name):
+            environ[header_key(name)] = value
+
+    sub_request = WSGIRequest(environ)
+    # Read by BatchAuthentication; only set here, never from the request.
+    sub_request.batch_auth = (request.user, request.auth)
+    sub_request.atomic_batch = atomic
+    profile = getattr(request, "profile", None)
+    if profile is not None:
+        sub_request.profile = profile
+    return sub_request
+
+
+def run_request(request, item, atomic):
+    match = resolve_view(item["path"])
+    sub_request = build_request(request, item, atomic)
+    sub_request.resolver_match = match
+    response = match.func(sub_request, *match.args, **match.kwargs)
+    if response.streaming:
+        response.close()
+        return {
+            "status": status.HTTP_406_NOT_ACCEPTABLE,
+            "headers": {},
+            "body": {"detail": "Streaming responses cannot be batched."},
+        }
+    if hasattr(response, "data"):
+        body = response.data
+    else:
+        body = response.content.decode() or None
+    # Bodies are embedded as data in the batch response, which is rendered once;
+    # the sub-response's own Content-Type is only set when rendered alone.
+    headers = {
+        name: value
+        for name, value in response.items()
+        if name.lower() not in ("content-type", "content-length")
+    }
+    return {"status": response.status_code, "headers": headers, "body": body}
+
+
+def run_batch(request, requests, atomic=False):
+    """Run ``requests`` in order and return the batch response data."""
+    if not atomic:
+        return {"responses": [run_request(request, item, False) for item in requests]}
+
+    aliases = ["default"]
+    shard = shard_for(request.user.pk)
+    if shard and shard != "default":
+        aliases.append(shard)
+    responses = []
+    committed = True
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(transaction.atomic(using=alias))
+        for item in requests:
+            responses.append(run_request(request, item, True))
+            if responses[-1]["status"] >= status.HTTP_400_BAD_REQUEST:
+                committed = False
+                for alias in aliases:
+                    transaction.set_rollback(True, using=alias)
+                break
+    return {"committed": committed, "responses": responses}
@@ -0,0 +1,83 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+from .models import Todo
+from .shards import on_shard
+
+
+def _version_key(user_id):
+    return f"todos:version:{user_id}"
+
+
+def bump_todo_version(user_id):
+    caches[settings.TODO_VERSION_CACHE].set(
+        _version_key(user_id), time.time_ns(), None
+    )
+
+
+def get_todo_version(user_id):
+    """
+    Return the user's current todo version.
+
+    The version changes on every write and also once one of the user's todos
+    passes its ``expires_at``, since that changes the computed status. Fresh
+    versions are nanosecond timestamps so an evicted version is never reused.
+    """
+    cache = caches[settings.TODO_VERSION_CACHE]
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+
+    expiry_key = f"{key}:{version}:next-expiry"
+    next_expiry = cache.get(expiry_key)
+    if next_expiry is None:
+        next_expiry = _next_expiry(user_id)
+        cache.set(expiry_key, next_expiry, settings.TODO_RESPONSE_CACHE_TIMEOUT)
+    if next_expiry and next_expiry <= time.time():
+        bump_todo_version(user_id)
+        return get_todo_version(user_id)
+    return version
+
+
+def _next_expiry(user_id):
+    next_expiry = (
+        on_shard(Todo.objects.filter(created_by_id=user_id), user_id)
+        .filter(expires_at__gt=timezone.now())
+        .exclude(status__in=("completed", "expired"))
+        .aggregate(next_expiry=Min("expires_at"))["next_expiry"]
+    )
+    return next_expiry.timestamp() if next_expiry else 0
+
+
+class TodoResponseCache:
+    """Serialized todo responses keyed on the user's todo version."""
+
+    def __init__(self, request):
+        user_id = request.user.pk
+        version = get_todo_version(user_id)
+        digest = hashlib.sha1(
+            f"{request.accepted_media_type}|{request.build_absolute_uri()}".encode()
+        ).hexdigest()
+        self.key = f"todos:response:{user_id}:{version}:{digest}"
+        self.etag = f'"{version:x}-{digest[:16]}"'
+
+    def matches(self, request):
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        return "*" in etags or self.etag in etags
+
+    def get(self):
+        return caches[settings.TODO_RESPONSE_CACHE].get(self.key)
+
+    def set(self, data):
+        caches[settings.TODO_RESPONSE_CACHE].set(
+            self.key, data, settings.TODO_RESPONSE_CACHE_TIMEOUT
+        )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_worker_caches(app_configs, **kwargs):
+    """Warn about features turned off because several workers share no cache."""
+    if settings.WEB_CONCURRENCY <= 1 or settings.TODO_RESPONSE_CACHING:
+        return []
+    return [
+        Warning(
+            "Todo response caching, ETags and the user cache are off: "
+            "WEB_CONCURRENCY > 1 without a shared cache.",
+            hint="Set SHARED_CACHE_URL so every worker sees each write.",
+            id="api.W001",
+        )
+    ]
+
+
+@register()
+def check_expiry_sweeper(app_configs, **kwargs):
+    """Warn that the in-process sweeper is off because several workers run."""
+    if settings.WEB_CONCURRENCY <= 1 or settings.TODO_EXPIRY_SWEEP_INTERVAL <= 0:
+        return []
+    return [
+        Warning(
+            "The in-process expiry sweeper is off: WEB_CONCURRENCY > 1.",
+            hint="Run manage.py expire_todos --interval N as one process instead.",
+            id="api.W002",
+        )
+    ]
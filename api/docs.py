@@ -0,0 +1,18 @@
+"""
+``swagger_auto_schema`` that only imports drf_yasg when the docs are enabled,
+so workers started with ``API_DOCS_ENABLED=false`` skip it entirely.
+"""
+from django.conf import settings
+
+if settings.API_DOCS_ENABLED:
+    from drf_yasg.utils import swagger_auto_schema
+else:
+
+    def swagger_auto_schema(*args, **kwargs):
+        def decorator(view):
+            return view
+
+        return decorator
+
+
+__all__ = ["swagger_auto_schema"]
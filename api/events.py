@@ -0,0 +1,88 @@
+"""
+Per-user fan-out of todo change events to streaming connections.
+
+``todos_changed`` is published to the broker named by ``TODO_EVENTS_BROKER``.
+``InProcessBroker`` only reaches connections served by the same process; a
+broker backed by Redis pub/sub or similar can replace it by implementing
+``subscribe()`` and ``publish()``.
+
+Every subscription has a bounded queue. When a client reads too slowly the
+queue fills up, further events are dropped and the client is sent a single
+``overflow`` event telling it to catch up through ``/todos/changes/``.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue ``event``; must run on the subscriber's event loop."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """Return the next event, or ``None`` if none arrives within ``timeout``."""
+        if self.overflowed:
+            self.overflowed = False
+            # Whatever is still queued is covered by the resync.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {"event": "overflow"}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id, maxsize):
+        """Subscribe from a running event loop; ``close()`` the result when done."""
+        subscription = Subscription(self, user_id, maxsize)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """Deliver ``event`` to ``user_id``'s connections; safe from any thread."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The connection's event loop has already shut down.
+                self.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.TODO_EVENTS_BROKER)()
@@ -0,0 +1,62 @@
+"""
+Streaming export of todos.
+
+Rows are read with ``values_list().iterator()`` (a server-side cursor on
+PostgreSQL) and encoded directly, bypassing ``TodoSerializer``, so memory stays
+flat regardless of how many rows are exported.
+"""
+import csv
+import io
+import json
+
+from .rows import COLUMNS, DATETIME_FIELDS, TODO_FIELDS, format_datetime
+
+EXPORT_COLUMNS = tuple(COLUMNS.get(field, field) for field in TODO_FIELDS)
+DATETIME_INDEXES = [
+    index for index, field in enumerate(TODO_FIELDS) if field in DATETIME_FIELDS
+]
+
+
+def export_rows(queryset, chunk_size):
+    for row in queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size):
+        row = list(row)
+        for index in DATETIME_INDEXES:
+            row[index] = format_datetime(row[index])
+        yield row
+
+
+def ndjson_lines(rows):
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for row in rows:
+        yield dumps(dict(zip(TODO_FIELDS, row))) + "\n"
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(TODO_FIELDS)
+    for row in rows:
+        yield line(row)
+
+
+ENCODERS = {"ndjson": ndjson_lines, "csv": csv_lines}
+
+
+def stream_export(queryset, format, chunk_size=2000):
+    """Yield the encoded export in blocks of roughly ``chunk_size`` rows."""
+    block = []
+    for line in ENCODERS[format](export_rows(queryset, chunk_size)):
+        block.append(line)
+        if len(block) >= chunk_size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
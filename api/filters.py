@@ -0,0 +1,104 @@
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from . import search
+from .models import Todo
+
+
+class TodoFilterBackend(BaseFilterBackend):
+    """
+    Query parameter filters for the todo list.
+
+    Every filter maps onto an index that starts with ``created_by``:
+    ``status`` and the expiry window use ``(created_by, status, expires_at)``,
+    ``updated_since`` uses ``(created_by, updated_at, id)``. ``q`` runs a
+    ranked full-text search over title and body.
+    """
+
+    datetime_params = {
+        "expires_before": "expires_at__lt",
+        "expires_after": "expires_at__gt",
+        "created_after": "created_at__gt",
+        "updated_since": "updated_at__gte",
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        errors = {}
+        now = timezone.now()
+
+        if params.get("status"):
+            try:
+                queryset = queryset.filter(self.status_q(params["status"], now))
+            except ValidationError as exc:
+                errors["status"] = exc.detail
+
+        field = serializers.DateTimeField()
+        for param, lookup in self.datetime_params.items():
+            if not params.get(param):
+                continue
+            try:
+                value = field.to_internal_value(params[param])
+            except ValidationError as exc:
+                errors[param] = exc.detail
+                continue
+            queryset = queryset.filter(**{lookup: value})
+
+        if errors:
+            raise ValidationError(errors)
+
+        if params.get("q", "").strip():
+            queryset = search.search(queryset, params["q"].strip())
+        return queryset
+
+    def status_q(self, value, now):
+        """Match the effective status, so overdue rows count as expired."""
+        statuses = [s.strip() for s in value.split(",") if s.strip()]
+        invalid = [s for s in statuses if s not in dict(Todo.STATUS_CHOICES)]
+        if invalid:
+            raise ValidationError([f"Invalid status value: {', '.join(invalid)}."])
+
+        overdue = Q(expires_at__lt=now) & ~Q(status="completed")
+        q = Q()
+        for status in statuses:
+            if status == "expired":
+                q |= Q(status="expired") | overdue
+            elif status == "completed":
+                q |= Q(status="completed")
+            else:
+                q |= Q(status=status) & (
+                    Q(expires_at__isnull=True) | Q(expires_at__gte=now)
+                )
+        return q
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                "name": "q",
+                "required": False,
+                "in": "query",
+                "description": "Full-text search over title and body.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": "status",
+                "required": False,
+                "in": "query",
+                "description": "Comma-separated list of statuses.",
+                "schema": {"type": "string"},
+            },
+        ]
+        for param in self.datetime_params:
+            parameters.append(
+                {
+                    "name": param,
+                    "required": False,
+                    "in": "query",
+                    "description": "ISO 8601 datetime.",
+                    "schema": {"type": "string", "format": "date-time"},
+                }
+            )
+        return parameters
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .cache import bump_todo_version
+from .events import get_broker
+from .metrics import TODOS_EXPIRED
+from .replicas import pin_to_primary
+from .shards import forget_user
+from .signals import notify_todos_changed, todos_changed, users_changed
+
+
+@receiver(post_save, sender="api.Todo")
+def todo_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    action = "create" if created else "update"
+    notify_todos_changed(
+        sender, instance.created_by_id, action, [instance.pk], using=using
+    )
+
+
+@receiver(todos_changed)
+def invalidate_todo_responses(sender, user_id, **kwargs):
+    if user_id is not None:
+        bump_todo_version(user_id)
+
+
+@receiver(todos_changed)
+def publish_todo_event(sender, user_id, action, ids, **kwargs):
+    if user_id is not None:
+        get_broker().publish(user_id, {"event": action, "ids": ids})
+
+
+@receiver(todos_changed)
+def pin_writer_to_primary(sender, user_id, action, **kwargs):
+    # Expiry and archiving are background writes the user did not make.
+    if user_id is not None and action not in ("expire", "archive"):
+        pin_to_primary(user_id)
+
+
+@receiver(todos_changed)
+def count_expired_todos(sender, action, ids, **kwargs):
+    if action == "expire":
+        TODOS_EXPIRED.inc(len(ids))
+
+
+@receiver(post_save, sender="api.User")
+@receiver(post_delete, sender="api.User")
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.delete(instance.pk)
+
+
+@receiver(users_changed)
+def evict_updated_users(sender, ids, **kwargs):
+    for user_id in ids:
+        user_cache.delete(user_id)
+
+
+@receiver(post_delete, sender="api.User")
+def clear_sharded_todos(sender, instance, **kwargs):
+    forget_user(instance.pk)
@@ -0,0 +1,75 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HashingQueueFull(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+def get_executor():
+    """
+    Return the shared process pool, or ``None`` to use the event loop's
+    default thread pool when ``PASSWORD_HASHING_WORKERS`` is 0.
+    """
+    global _executor
+    if settings.PASSWORD_HASHING_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # Spawn rather than fork: the parent may already be running
+            # threads (the expiry sweeper, the ASGI event loop).
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"),),
+            )
+    return _executor
+
+
+async def run_hasher(func, *args):
+    """
+    Run a hashing function off the event loop.
+
+    At most ``PASSWORD_HASHING_QUEUE_LIMIT`` calls may be running or queued
+    at once; beyond that ``HashingQueueFull`` is raised immediately instead
+    of letting requests pile up behind the pool.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.PASSWORD_HASHING_QUEUE_LIMIT:
+            raise HashingQueueFull
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def amake_password(password):
+    return await run_hasher(make_password, password)
+
+
+async def acheck_password(password, encoded):
+    return await run_hasher(check_password, password, encoded)
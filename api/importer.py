@@ -0,0 +1,166 @@
+"""
+Streaming import of todos from NDJSON or CSV.
+
+Input is parsed one record at a time, each record is validated with
+``TodoSerializer`` and valid rows are written in fixed-size batches, one
+transaction per batch. PostgreSQL batches are loaded with ``COPY`` into a
+temporary table and moved with ``INSERT ... RETURNING id``, so the new ids are
+known; other databases use ``bulk_create``. Invalid records are reported by line number and
+do not stop the load.
+"""
+import csv
+import json
+import time
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Todo, TodoStats
+from .serializers import TodoSerializer
+from .shards import shard_for
+from .signals import notify_todos_changed
+
+COPY_COLUMNS = (
+    "title",
+    "body",
+    "status",
+    "expires_at",
+    "created_at",
+    "updated_at",
+    "created_by_id",
+    "updated_by_id",
+)
+
+
+def invalid_record(message):
+    return ValidationError({"non_field_errors": [message]})
+
+
+def ndjson_records(lines):
+    """Yield ``(line number, record or error)`` for every non-blank line."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            record = invalid_record(f"Invalid JSON: {exc}")
+        if not isinstance(record, (dict, ValidationError)):
+            record = invalid_record("Expected a JSON object.")
+        yield number, record
+
+
+def csv_records(lines):
+    """Yield ``(line number, record)``; empty cells are treated as missing."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        record = {
+            key: value for key, value in row.items() if key is not None and value != ""
+        }
+        yield reader.line_num, record
+
+
+PARSERS = {"ndjson": ndjson_records, "csv": csv_records}
+
+
+class TodoImporter:
+    """Validate and insert todos for ``user``; see ``run()``."""
+
+    def __init__(self, user, batch_size, max_errors):
+        self.user = user
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.using = shard_for(user.pk) or router.db_for_write(Todo)
+
+    def run(self, lines, format):
+        """
+        Import the text ``lines`` in ``format`` ("ndjson" or "csv") and return
+        a report with the number of imported and failed rows, the first
+        ``max_errors`` errors and the throughput.
+        """
+        started = time.monotonic()
+        serializer = TodoSerializer()
+        imported = failed = 0
+        errors = []
+        batch = []
+
+        for number, record in PARSERS[format](lines):
+            try:
+                if isinstance(record, ValidationError):
+                    raise record
+                batch.append(serializer.run_validation(record))
+            except ValidationError as exc:
+                failed += 1
+                if len(errors) < self.max_errors:
+                    errors.append({"line": number, "errors": exc.detail})
+                continue
+            if len(batch) >= self.batch_size:
+                imported += self.write(batch)
+                batch = []
+        if batch:
+            imported += self.write(batch)
+
+        seconds = time.monotonic() - started
+        return {
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(imported / seconds) if seconds else imported,
+        }
+
+    def write(self, batch):
+        now = timezone.now()
+        todos = [
+            Todo(created_by=self.user, updated_by=self.user, **attrs) for attrs in batch
+        ]
+        for todo in todos:
+            todo.apply_expiry_rule(now)
+        with transaction.atomic(using=self.using):
+            if connections[self.using].vendor == "postgresql":
+                ids = self.copy(todos, now)
+                TodoStats.objects.using(self.using).apply(
+                    Counter(todo.stats_key for todo in todos)
+                )
+            else:
+                todos = Todo.objects.using(self.using).bulk_create(todos)
+                ids = [todo.pk for todo in todos]
+            notify_todos_changed(Todo, self.user.pk, "create", ids, using=self.using)
+        return len(todos)
+
+    def copy(self, todos, now):
+        """
+        Load ``todos`` with a single ``COPY ... FROM STDIN`` (psycopg 3) and
+        return their ids. Must run in a transaction.
+        """
+        table = Todo._meta.db_table
+        columns = ", ".join(COPY_COLUMNS)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE todo_import AS "
+                f"SELECT {columns} FROM {table} WITH NO DATA"
+            )
+            sql = f"COPY todo_import ({columns}) FROM STDIN"
+            with cursor.cursor.copy(sql) as copy:
+                for todo in todos:
+                    copy.write_row(
+                        (
+                            todo.title,
+                            todo.body,
+                            todo.status,
+                            todo.expires_at,
+                            now,
+                            now,
+                            self.user.pk,
+                            self.user.pk,
+                        )
+                    )
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM todo_import "
+                "RETURNING id"
+            )
+            ids = [pk for (pk,) in cursor.fetchall()]
+            cursor.execute("DROP TABLE todo_import")
+        return ids
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import TodoArchive
+from api.shards import all_shards
+
+
+class Command(BaseCommand):
+    help = "Move todos completed or expired long ago to the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.TODO_ARCHIVE_AFTER_DAYS,
+            help="Archive todos completed or expired more than N days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of todos moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        archived = sum(
+            TodoArchive.objects.db_manager(alias).archive(before, options["batch_size"])
+            for alias in all_shards()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} todos"))
@@ -0,0 +1,99 @@
+import itertools
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import TodoFilterBackend
+from api.models import Todo, User
+from api.pagination import KeysetPagination
+
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN api_todo\b(?! USING)"),
+    "postgresql": re.compile(r"\bSeq Scan on api_todo\b"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every supported todo list filter and ordering combination and "
+        "fail if any of them needs a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the plan of every combination, not only failures.",
+        )
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        failures = []
+        checked = 0
+        for params, ordering, with_cursor in self.combinations():
+            sql, plan = self.explain(params, ordering, with_cursor)
+            checked += 1
+            label = f"{params.urlencode() or '(no filters)'} ordering={ordering}"
+            if with_cursor:
+                label += " +cursor"
+            if options["verbose_plans"]:
+                self.stdout.write(f"{label}\n{plan}\n")
+            if pattern.search(plan):
+                failures.append(f"{label}\n  {sql}\n{plan}")
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} of {checked} query plans use a full table scan:\n\n"
+                + "\n\n".join(failures)
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"All {checked} todo list query plans use an index")
+        )
+
+    def combinations(self):
+        now = timezone.now().isoformat()
+        datetime_params = list(TodoFilterBackend.datetime_params)
+        statuses = [None] + [value for value, _ in Todo.STATUS_CHOICES]
+        orderings = [
+            prefix + field
+            for field in KeysetPagination.ordering_fields
+            for prefix in ("", "-")
+        ]
+        for query, status in itertools.product((None, "milk"), statuses):
+            for size in range(len(datetime_params) + 1):
+                for names in itertools.combinations(datetime_params, size):
+                    params = QueryDict(mutable=True)
+                    if query:
+                        params["q"] = query
+                    if status:
+                        params["status"] = status
+                    for name in names:
+                        params[name] = now
+                    for ordering in orderings + (["-search_rank"] if query else []):
+                        for with_cursor in (False, True):
+                            yield params, ordering, with_cursor
+
+    def explain(self, params, ordering, with_cursor):
+        request = Request(APIRequestFactory().get("/", params))
+        queryset = Todo.objects.owned_by(User(pk=1)).with_effective_status()
+        queryset = TodoFilterBackend().filter_queryset(request, queryset, None)
+
+        paginator = KeysetPagination()
+        value = 1.0 if ordering.endswith("search_rank") else timezone.now()
+        position = (value, 1) if with_cursor else None
+        queryset = paginator.get_page_queryset(queryset, ordering, position)
+
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # Tiny development tables make a sequential scan look cheaper.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            return str(queryset.query), queryset.explain()
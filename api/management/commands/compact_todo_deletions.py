@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import TodoDeletion
+from api.shards import all_shards
+
+
+class Command(BaseCommand):
+    help = "Delete todo deletion tombstones older than the sync retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.TODO_DELETION_RETENTION,
+            help="Keep tombstones from the last N days.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tombstones deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        batch_size = options["batch_size"]
+        deleted = sum(
+            TodoDeletion.objects.db_manager(alias).compact(before, batch_size)
+            for alias in all_shards()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Compacted {deleted} tombstones"))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import Todo
+from api.scheduler import ExpirySweeper
+
+
+class Command(BaseCommand):
+    help = "Mark overdue todos as expired using batched bulk UPDATEs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TODO_EXPIRY_BATCH_SIZE,
+            help="Number of rows updated per statement.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and sweep again every this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        expired = Todo.objects.expire_overdue(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} todos"))
+        if options["interval"] > 0:
+            ExpirySweeper(options["interval"], options["batch_size"]).run()
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Write the OpenAPI schema to API_SCHEMA_FILE so it is served statically."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.API_SCHEMA_FILE,
+            help="Where to write the schema (default: API_SCHEMA_FILE).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS_ENABLED:
+            raise CommandError("API_DOCS_ENABLED is off, so drf_yasg is not loaded.")
+        from api.schema import generate_schema
+
+        content = generate_schema()
+        with open(options["output"], "wb") as f:
+            f.write(content)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {len(content)} bytes to {options['output']}")
+        )
@@ -0,0 +1,63 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import PARSERS, TodoImporter
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = "Stream todos for a user from an NDJSON or CSV file into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin.")
+        parser.add_argument(
+            "--user", required=True, help="Email of the user who owns the todos."
+        )
+        parser.add_argument(
+            "--format",
+            choices=sorted(PARSERS),
+            help="Input format; defaults to the file extension.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TODO_IMPORT_BATCH_SIZE,
+            help="Number of rows written per transaction.",
+        )
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            default=settings.TODO_IMPORT_MAX_ERRORS,
+            help="Number of row errors to print.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if format not in PARSERS:
+            raise CommandError("Cannot tell the format from the path; pass --format.")
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+
+        importer = TodoImporter(
+            user, batch_size=options["batch_size"], max_errors=options["max_errors"]
+        )
+        if path == "-":
+            report = importer.run(sys.stdin, format)
+        else:
+            with open(path, newline="", encoding="utf-8") as lines:
+                report = importer.run(lines, format)
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report['imported']} todos ({report['failed']} failed) "
+                f"in {report['seconds']}s, {report['rows_per_second']} rows/s"
+            )
+        )
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User, UserShard
+from api.shards import hashed_shard, move_user, pin_users, shard_sizes
+
+
+class Command(BaseCommand):
+    help = "Pin users to todo shards and move users' todos between shards online."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Email or id of a user to move.")
+        parser.add_argument(
+            "--to",
+            help="Shard to move --user to, or to pin unpinned users to with --pin.",
+        )
+        parser.add_argument(
+            "--pin",
+            action="store_true",
+            help="Record the current shard of every user not yet in the directory.",
+        )
+        parser.add_argument(
+            "--from-default",
+            action="store_true",
+            help="Move every user pinned to the default database to their shard.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows copied or deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.TODO_SHARDS:
+            raise CommandError("Sharding is off; set TODO_SHARD_URLS.")
+        target = options["to"]
+        if target and target not in settings.TODO_SHARDS + ["default"]:
+            raise CommandError(
+                f"Unknown shard {target}; choose from {', '.join(settings.TODO_SHARDS)}"
+            )
+        batch_size = options["batch_size"]
+
+        if options["pin"]:
+            pinned = pin_users(target, batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Pinned {pinned} users"))
+        if options["user"]:
+            if not target or target == "default":
+                raise CommandError("Pass the shard to move the user to with --to.")
+            self.move(self.get_user(options["user"]).pk, target, batch_size)
+        if options["from_default"]:
+            user_ids = UserShard.objects.filter(shard="default").values_list(
+                "user_id", flat=True
+            )
+            for user_id in list(user_ids):
+                self.move(user_id, hashed_shard(user_id), batch_size)
+
+        for alias, count in shard_sizes().items():
+            self.stdout.write(f"{alias}: {count} todos")
+
+    def get_user(self, value):
+        lookup = {"pk": value} if value.isdigit() else {"email": value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {value}")
+
+    def move(self, user_id, target, batch_size):
+        self.stdout.write(f"Moving user {user_id} to {target}")
+        moved = move_user(
+            user_id, target, batch_size, log=lambda message: self.stdout.write(message)
+        )
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} rows for user {user_id}"))
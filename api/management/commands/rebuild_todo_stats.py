@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import TodoStats
+from api.shards import all_shards
+
+
+class Command(BaseCommand):
+    help = "Compare the per-user todo counters with the todo table and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drifted users; exit with an error if there are any.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = [
+            (alias, user_id)
+            for alias in all_shards()
+            for user_id in TodoStats.objects.using(alias).drifted()
+        ]
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Todo stats are consistent"))
+            return
+        if options["check"]:
+            raise CommandError(
+                f"Todo stats drifted for {len(drifted)} users: "
+                + ", ".join(str(user_id) for _, user_id in drifted[:20])
+            )
+        for alias, user_id in drifted:
+            TodoStats.objects.using(alias).repair(user_id)
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired todo stats for {len(drifted)} users")
+        )
@@ -0,0 +1,112 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: import the WSGI application the way a gunicorn
+# (``--preload``) master does, then serve two requests the way a worker does.
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from config.wsgi import application
+imported = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+
+def serve(path):
+    environ = {"PATH_INFO": path}
+    setup_testing_defaults(environ)
+    before = time.perf_counter()
+    body = application(environ, lambda status, headers: None)
+    b"".join(body)
+    getattr(body, "close", lambda: None)()
+    return time.perf_counter() - before
+
+first = serve(sys.argv[1])
+second = serve(sys.argv[1])
+print(json.dumps({"import": imported - started, "first": first, "second": second}))
+"""
+
+
+def parse_importtime(stderr):
+    """Sum ``-X importtime`` self time per top-level package, in seconds."""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us)
+    return {name: us / 1e6 for name, us in totals.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker boot: import time of the WSGI application broken down by "
+        "package, and the time to serve the first and second request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default="/api/v1/todos/",
+            help="Request path used for the first-request timing.",
+        )
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Fresh processes to average over."
+        )
+        parser.add_argument(
+            "--top", type=int, default=15, help="Number of packages to list."
+        )
+        parser.add_argument(
+            "--set",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Environment override, e.g. --set API_DOCS_ENABLED=false.",
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, TODO_EXPIRY_SWEEP_INTERVAL="0")
+        for item in options["set"]:
+            name, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Expected NAME=VALUE, got {item!r}")
+            env[name] = value
+
+        timings = defaultdict(list)
+        packages = defaultdict(list)
+        for _ in range(options["runs"]):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", CHILD, options["path"]],
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode:
+                raise CommandError(result.stderr.strip().splitlines()[-1])
+            for name, value in json.loads(result.stdout.splitlines()[-1]).items():
+                timings[name].append(value)
+            for name, value in parse_importtime(result.stderr).items():
+                packages[name].append(value)
+
+        median = {name: statistics.median(values) for name, values in timings.items()}
+        median["total"] = median["import"] + median["first"]
+        self.stdout.write(f"Median of {options['runs']} runs")
+        for label, name in (
+            ("import config.wsgi", "import"),
+            ("first request", "first"),
+            ("second request", "second"),
+            ("time to first request", "total"),
+        ):
+            self.stdout.write(f"  {label:<22} {median[name] * 1000:8.1f} ms")
+
+        self.stdout.write("\nImport time by package (self time)")
+        ranked = sorted(
+            ((statistics.median(values), name) for name, values in packages.items()),
+            reverse=True,
+        )
+        for seconds, name in ranked[: options["top"]]:
+            self.stdout.write(f"  {name:<30} {seconds * 1000:8.1f} ms")
@@ -0,0 +1,136 @@
+"""
+Prometheus metrics, served at ``/metrics``.
+
+``MetricsMiddleware`` records per-route latency histograms, response counts by
+status and database queries/time per route. The response and user caches
+count hits and misses, and expired todos are counted from ``todos_changed``.
+
+Updating a metric only takes that value's own lock. Under gunicorn, set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty directory before the workers start:
+each worker then writes its values to its own memory-mapped files and a scrape
+merges them, so scraping never blocks a request.
+"""
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .profiling import RequestProfile
+
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds",
+    "Request latency by route.",
+    ["route", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSES = Counter(
+    "api_responses",
+    "Responses by route and status code.",
+    ["route", "method", "status"],
+)
+DB_QUERIES = Counter(
+    "api_db_queries", "Database queries by route.", ["route", "method"]
+)
+DB_SECONDS = Counter(
+    "api_db_seconds", "Time spent in database queries by route.", ["route", "method"]
+)
+CACHE_REQUESTS = Counter(
+    "api_cache_requests",
+    "Cache lookups; result is hit, miss or not_modified (answered with a 304).",
+    ["cache", "result"],
+)
+TODOS_EXPIRED = Counter("api_todos_expired", "Todos moved to the expired status.")
+
+
+def record_cache(cache, result):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def route_name(request):
+    """``basename.action`` for viewset routes, else the URL name."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    actions = getattr(match.func, "actions", None)
+    if actions and request.method.lower() in actions:
+        basename = match.func.initkwargs.get("basename", match.view_name)
+        return f"{basename}.{actions[request.method.lower()]}"
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and database use per route. Reuses the
+    ``request.profile`` set by ``ProfilingMiddleware`` when it runs first.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        profile = getattr(request, "profile", None)
+        if profile is None:
+            profile = RequestProfile()
+            with profile.capture_queries():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        self.observe(request, response, profile, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        profile = getattr(request, "profile", None)
+        if profile is None:
+            profile = RequestProfile()
+            with profile.capture_queries():
+                response = await self.get_response(request)
+        else:
+            response = await self.get_response(request)
+        self.observe(request, response, profile, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, profile, seconds):
+        route = route_name(request)
+        if route == "metrics":
+            return
+        method = request.method
+        REQUEST_LATENCY.labels(route, method).observe(seconds)
+        RESPONSES.labels(route, method, str(response.status_code)).inc()
+        DB_QUERIES.labels(route, method).inc(profile.db_queries)
+        DB_SECONDS.labels(route, method).inc(profile.timings["db"])
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
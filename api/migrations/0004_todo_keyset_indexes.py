@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_remove_todo_due_at_todo_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='todo_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['created_by', 'updated_at', 'id'], name='todo_owner_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_todo_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['created_by', 'status', 'expires_at'], name='todo_owner_status_exp_idx'),
+        ),
+    ]
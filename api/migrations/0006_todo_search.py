@@ -0,0 +1,81 @@
+from django.db import migrations
+
+# Kept here rather than imported from api.search, so later changes to that
+# module do not change this migration.
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE api_todo ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX api_todo_search_idx ON api_todo USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS api_todo_search_idx",
+    "ALTER TABLE api_todo DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS api_todo_fts_insert AFTER INSERT ON api_todo BEGIN
+        INSERT INTO api_todo_fts (rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_todo_fts_delete AFTER DELETE ON api_todo BEGIN
+        INSERT INTO api_todo_fts (api_todo_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_todo_fts_update
+    AFTER UPDATE OF title, body ON api_todo BEGIN
+        INSERT INTO api_todo_fts (api_todo_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO api_todo_fts (rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_todo_fts USING fts5(
+        title, body, content='api_todo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    *SQLITE_TRIGGERS,
+    "INSERT INTO api_todo_fts (api_todo_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS api_todo_fts_insert",
+    "DROP TRIGGER IF EXISTS api_todo_fts_delete",
+    "DROP TRIGGER IF EXISTS api_todo_fts_update",
+    "DROP TABLE IF EXISTS api_todo_fts",
+]
+
+INSTALL = {"postgresql": POSTGRES_INSTALL, "sqlite": SQLITE_INSTALL}
+UNINSTALL = {"postgresql": POSTGRES_UNINSTALL, "sqlite": SQLITE_UNINSTALL}
+
+
+def install(apps, schema_editor):
+    for sql in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_todo_status_expiry_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 18:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_todos(apps, schema_editor):
+    Todo = apps.get_model("api", "Todo")
+    TodoStats = apps.get_model("api", "TodoStats")
+    db = schema_editor.connection.alias
+    stats = {}
+    rows = (
+        Todo.objects.using(db)
+        .exclude(created_by=None)
+        .order_by()
+        .values_list("created_by", "status")
+        .annotate(count=models.Count("pk"))
+    )
+    for user_id, status, count in rows:
+        stats.setdefault(user_id, TodoStats(user_id=user_id))
+        setattr(stats[user_id], status, count)
+    TodoStats.objects.using(db).bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_todo_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='todo_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pending', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('expired', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'todo stats',
+            },
+        ),
+        migrations.RunPython(count_todos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 6.0 on 2026-10-18 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Kept here rather than imported from api.search and api.shards, so later
+# changes to those modules do not change this migration.
+SQLITE_SEARCH_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_todo_fts USING fts5(
+        title, body, content='api_todo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_todo_fts_insert AFTER INSERT ON api_todo BEGIN
+        INSERT INTO api_todo_fts (rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_todo_fts_delete AFTER DELETE ON api_todo BEGIN
+        INSERT INTO api_todo_fts (api_todo_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_todo_fts_update
+    AFTER UPDATE OF title, body ON api_todo BEGIN
+        INSERT INTO api_todo_fts (api_todo_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO api_todo_fts (rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END
+    """,
+    "INSERT INTO api_todo_fts (api_todo_fts) VALUES ('rebuild')",
+]
+# Each shard allocates ids from its own range so rows can move between shards.
+ID_RANGE = 1 << 40
+ID_TABLES = ("api_todo", "api_tododeletion")
+
+
+def reinstall_sqlite_search_triggers(apps, schema_editor):
+    """Recreate the FTS triggers dropped when SQLite rebuilt ``api_todo``."""
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE_SEARCH_INSTALL:
+            schema_editor.execute(sql)
+
+
+def set_id_range(apps, schema_editor):
+    """Start a shard's id sequences at ``(index + 1) * ID_RANGE``."""
+    connection = schema_editor.connection
+    if connection.alias not in settings.TODO_SHARDS:
+        return
+    start = (settings.TODO_SHARDS.index(connection.alias) + 1) * ID_RANGE
+    with connection.cursor() as cursor:
+        for table in ID_TABLES:
+            cursor.execute(f"SELECT MAX(id) FROM {table}")
+            if (cursor.fetchone()[0] or 0) >= start:
+                continue
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)",
+                    [table, start],
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", [table])
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, start],
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_todo_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(max_length=100)),
+                ('moving_to', models.CharField(blank=True, max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='todo',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='todos_created', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='todo',
+            name='updated_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='todos_updated', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='todoarchive',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='todoarchive',
+            name='updated_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tododeletion',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='todo_deletions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='todostats',
+            name='user',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='todo_stats', serialize=False, to=settings.AUTH_USER_MODEL),
+        ),
+        # SQLite rebuilt api_todo above, dropping its search triggers.
+        migrations.RunPython(
+            reinstall_sqlite_search_triggers, migrations.RunPython.noop
+        ),
+        migrations.RunPython(set_id_range, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_revoked_token'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['status', 'id'], name='todo_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['expires_at'], name='todo_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 20:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_todo_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoSearchIndex',
+            fields=[
+                ('todo', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='api.todo')),
+                ('title', models.TextField()),
+                ('body', models.TextField()),
+            ],
+            options={
+                'db_table': 'api_todo_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# The admin searches users with email__istartswith, which Postgres runs as
+# UPPER(email::text) LIKE UPPER('prefix%'). Only an index on that expression
+# with a pattern operator class can serve the LIKE outside the C locale.
+POSTGRES_INSTALL = [
+    "CREATE INDEX user_email_search_idx ON api_user "
+    "(UPPER(email::text) text_pattern_ops)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS user_email_search_idx",
+]
+
+INSTALL = {"postgresql": POSTGRES_INSTALL}
+UNINSTALL = {"postgresql": POSTGRES_UNINSTALL}
+
+
+def install(apps, schema_editor):
+    for sql in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_todo_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Case, CharField, F, Q, Value, When
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -7,7 +11,24 @@ from django.contrib.auth.models import (
 
 from django.utils import timezone
 
-class UserManager(BaseUserManager):
+from .shards import all_shards, on_shard
+from .signals import notify_todos_changed, notify_users_changed
+
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """``update`` that evicts the changed users from the auth user cache."""
+        with transaction.atomic(using=self.db):
+            ids = list(self.select_for_update().order_by().values_list("pk", flat=True))
+            targets = self.model.objects.using(self.db).filter(pk__in=ids)
+            updated = super(UserQuerySet, targets).update(**kwargs)
+            notify_users_changed(self.model, ids, using=self.db)
+        return updated
+
+    update.alters_data = True
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None):
         if not email:
             raise ValueError("Email is required")
@@ -43,6 +64,213 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 
+class TodoQuerySet(models.QuerySet):
+    def owned_by(self, user):
+        queryset = self.filter(created_by=user)
+        return queryset if self._db else on_shard(queryset, user.pk)
+
+    def spans_shards(self):
+        """Whether this queryset is unscoped while todos are sharded."""
+        return self._db is None and bool(settings.TODO_SHARDS)
+
+    def create(self, **kwargs):
+        if self.spans_shards():
+            # Saved through the router, which places the todo by its owner.
+            todo = self.model(**kwargs)
+            todo.save(force_insert=True)
+            return todo
+        return super().create(**kwargs)
+
+    def overdue(self, now=None):
+        now = now or timezone.now()
+        return self.filter(expires_at__lt=now).exclude(
+            status__in=("completed", "expired")
+        )
+
+    def with_effective_status(self, now=None):
+        """Annotate ``effective_status``, applying the expiry rule at read time."""
+        now = now or timezone.now()
+        return self.annotate(
+            effective_status=Case(
+                When(
+                    Q(expires_at__lt=now) & ~Q(status="completed"),
+                    then=Value("expired"),
+                ),
+                default=F("status"),
+                output_field=CharField(),
+            )
+        )
+
+    def delete(self):
+        """
+        Delete the matching todos, leave a ``TodoDeletion`` for each and
+        update ``TodoStats``.
+        """
+        with transaction.atomic(using=self.db):
+            rows = list(
+                self.select_for_update()
+                .order_by()
+                .values_list("pk", "created_by_id", "status")
+            )
+            targets = self.model.objects.using(self.db).filter(
+                pk__in=[pk for pk, _, _ in rows]
+            )
+            result = super(TodoQuerySet, targets).delete()
+            TodoDeletion.objects.db_manager(self.db).record(
+                (pk, user_id) for pk, user_id, _ in rows
+            )
+            deltas = Counter((user_id, status) for _, user_id, status in rows)
+            TodoStats.objects.using(self.db).apply(negate(deltas))
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """``bulk_create`` that also counts the new todos in ``TodoStats``."""
+        objs = list(objs)
+        if self.spans_shards():
+            by_shard = defaultdict(list)
+            for todo in objs:
+                by_shard[router.db_for_write(Todo, instance=todo)].append(todo)
+            for alias, todos in by_shard.items():
+                self.using(alias).bulk_create(todos, *args, **kwargs)
+            return objs
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            TodoStats.objects.using(self.db).apply(
+                Counter(todo.stats_key for todo in objs)
+            )
+        return created
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        """``bulk_update`` that moves changed statuses between ``TodoStats``."""
+        objs = list(objs)
+        if self.spans_shards():
+            by_shard = defaultdict(list)
+            for todo in objs:
+                by_shard[router.db_for_write(Todo, instance=todo)].append(todo)
+            return sum(
+                self.using(alias).bulk_update(todos, fields, batch_size)
+                for alias, todos in by_shard.items()
+            )
+        with transaction.atomic(using=self.db):
+            previous = self.counted_as(objs)
+            rows = super().bulk_update(objs, fields, batch_size)
+            deltas = Counter()
+            for todo in objs:
+                # Rows deleted meanwhile are not updated.
+                if todo.pk in previous:
+                    deltas[previous[todo.pk]] -= 1
+                    deltas[todo.stats_key] += 1
+            TodoStats.objects.using(self.db).apply(deltas)
+        return rows
+
+    def counted_as(self, todos):
+        """
+        ``{pk: (owner id, status)}`` as stored for ``todos``. The rows stay
+        locked until the transaction ends, so concurrent writes cannot change
+        the status being moved out of ``TodoStats``; must run in one.
+        """
+        rows = (
+            self.model.objects.using(self.db)
+            .filter(pk__in=[todo.pk for todo in todos])
+            .select_for_update()
+            .order_by()
+            .values_list("pk", "created_by_id", "status")
+        )
+        return {pk: (user_id, status) for pk, user_id, status in rows}
+
+    def archivable(self, before):
+        """Todos completed, or expired, before ``before``."""
+        return self.filter(
+            Q(status="completed", updated_at__lt=before)
+            | (Q(expires_at__lt=before) & ~Q(status="completed"))
+        )
+
+    def expire_overdue(self, now=None, batch_size=1000):
+        """Persist the expiry rule with one UPDATE per batch of overdue rows."""
+        now = now or timezone.now()
+        return self.overdue(now).set_status(
+            "expired", now, batch_size, action="expire", skip_locked=True
+        )
+
+    def set_status(
+        self, status, now=None, batch_size=1000, action="update", skip_locked=False
+    ):
+        """
+        Set ``status`` on the matching todos with one UPDATE per batch, moving
+        their counts in ``TodoStats``; return the number changed.
+        """
+        now = now or timezone.now()
+        if self.spans_shards():
+            return sum(
+                self.using(alias).set_status(
+                    status, now, batch_size, action, skip_locked
+                )
+                for alias in all_shards()
+            )
+        changed = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                # Locked so the statuses moved in TodoStats are the ones replaced.
+                rows = list(
+                    self.exclude(status=status)
+                    .select_for_update(skip_locked=skip_locked)
+                    .order_by()
+                    .values_list("pk", "created_by_id", "status")[:batch_size]
+                )
+                if not rows:
+                    return changed
+                changed += self.filter(pk__in=[pk for pk, _, _ in rows]).update(
+                    status=status, updated_at=now
+                )
+                deltas = Counter()
+                by_user = defaultdict(list)
+                for pk, user_id, previous in rows:
+                    deltas[user_id, previous] -= 1
+                    deltas[user_id, status] += 1
+                    by_user[user_id].append(pk)
+                TodoStats.objects.using(self.db).apply(deltas)
+                for user_id, ids in by_user.items():
+                    notify_todos_changed(
+                        self.model, user_id, action, ids, using=self.db
+                    )
+
+    def delete_in_batches(self, batch_size=1000):
+        """
+        ``delete`` the matching todos ``batch_size`` at a time, one transaction
+        per batch, notifying their owners; return the number deleted.
+        """
+        if self.spans_shards():
+            return sum(
+                self.using(alias).delete_in_batches(batch_size)
+                for alias in all_shards()
+            )
+        deleted = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                rows = list(
+                    self.order_by().values_list("pk", "created_by_id")[:batch_size]
+                )
+                if not rows:
+                    return deleted
+                targets = self.model.objects.using(self.db).filter(
+                    pk__in=[pk for pk, _ in rows]
+                )
+                deleted += targets.delete()[0]
+                by_user = defaultdict(list)
+                for pk, user_id in rows:
+                    by_user[user_id].append(pk)
+                for user_id, ids in by_user.items():
+                    notify_todos_changed(
+                        self.model, user_id, "delete", ids, using=self.db
+                    )
+
+    delete_in_batches.alters_data = True
+    delete_in_batches.queryset_only = True
+
+
 class Todo(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -60,21 +288,363 @@ class Todo(models.Model):
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
 
+    # Users may live on another database than their todos (see api.shards).
     created_by = models.ForeignKey(
-        User, on_delete=models.SET_NULL, null=True, related_name="todos_created"
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="todos_created",
+        db_constraint=False,
     )
     updated_by = models.ForeignKey(
-        User, on_delete=models.SET_NULL, null=True, related_name="todos_updated"
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="todos_updated",
+        db_constraint=False,
     )
 
+    objects = TodoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_by", "created_at", "id"],
+                name="todo_owner_created_idx",
+            ),
+            models.Index(
+                fields=["created_by", "updated_at", "id"],
+                name="todo_owner_updated_idx",
+            ),
+            models.Index(
+                fields=["created_by", "status", "expires_at"],
+                name="todo_owner_status_exp_idx",
+            ),
+            # Admin filters across all owners, paged newest id first.
+            models.Index(fields=["status", "id"], name="todo_status_idx"),
+            models.Index(fields=["expires_at"], name="todo_expires_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} [{self.status}]"
 
-    def save(self, *args, **kwargs):
+    def apply_expiry_rule(self, now=None):
         if (
             self.expires_at
-            and self.expires_at < timezone.now()
+            and self.expires_at < (now or timezone.now())
             and self.status != "completed"
         ):
             self.status = "expired"
-        super().save(*args, **kwargs)
+
+    @property
+    def stats_key(self):
+        return (self.created_by_id, self.status)
+
+    def save(self, *args, **kwargs):
+        self.apply_expiry_rule()
+        using = kwargs.get("using") or router.db_for_write(Todo, instance=self)
+        with transaction.atomic(using=using):
+            if self._state.adding:
+                previous = None
+            else:
+                previous = Todo.objects.using(using).counted_as([self]).get(self.pk)
+            super().save(*args, **kwargs)
+            if previous != self.stats_key:
+                deltas = Counter({self.stats_key: 1})
+                if previous is not None:
+                    deltas[previous] -= 1
+                TodoStats.objects.using(using).apply(deltas)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(Todo, instance=self)
+        with transaction.atomic(using=using):
+            previous = Todo.objects.using(using).counted_as([self]).get(self.pk)
+            row = (self.pk, self.created_by_id)
+            result = super().delete(using=using, keep_parents=keep_parents)
+            TodoDeletion.objects.db_manager(using).record([row])
+            if previous is not None:
+                TodoStats.objects.using(using).apply({previous: -1})
+        return result
+
+
+def negate(deltas):
+    return {key: -delta for key, delta in deltas.items()}
+
+
+class TodoSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table indexing todos, created by migration 0006 and kept in
+    sync by triggers; ``api.search`` joins it to rank matches.
+    """
+
+    todo = models.OneToOneField(
+        Todo,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_index",
+    )
+    title = models.TextField()
+    body = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = "api_todo_fts"
+
+
+class TodoStatsQuerySet(models.QuerySet):
+    def apply(self, deltas):
+        """
+        Add ``{(user id, status): delta}`` to the counters with one
+        ``F()`` UPDATE per user, creating missing rows.
+        """
+        by_user = defaultdict(Counter)
+        for (user_id, status), delta in deltas.items():
+            if user_id is not None and delta:
+                by_user[user_id][status] += delta
+        now = timezone.now()
+        for user_id, changes in by_user.items():
+            values = {status: F(status) + delta for status, delta in changes.items()}
+            if self.filter(user_id=user_id).update(updated_at=now, **values):
+                continue
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(user_id=user_id, updated_at=now, **changes)
+            except IntegrityError:
+                # Created concurrently; it exists now.
+                self.filter(user_id=user_id).update(updated_at=now, **values)
+
+    def counts(self, user_ids=None):
+        """``{user id: {status: count}}`` counted from the todo table."""
+        queryset = Todo.objects.using(self.db).exclude(created_by=None)
+        if user_ids is not None:
+            queryset = queryset.filter(created_by__in=user_ids)
+        counts = defaultdict(lambda: dict.fromkeys(TodoStats.STATUSES, 0))
+        rows = queryset.order_by().values_list("created_by", "status")
+        for user_id, status, count in rows.annotate(count=models.Count("pk")):
+            counts[user_id][status] = count
+        return counts
+
+    def drifted(self):
+        """Users whose counters differ from the todo table."""
+        expected = self.counts()
+        stored = {
+            row.pop("user_id"): row
+            for row in self.values("user_id", *TodoStats.STATUSES)
+        }
+        empty = dict.fromkeys(TodoStats.STATUSES, 0)
+        return sorted(
+            user_id
+            for user_id in expected.keys() | stored.keys()
+            if expected.get(user_id, empty) != stored.get(user_id, empty)
+        )
+
+    def repair(self, user_id):
+        """Recount one user's todos while their counters are locked."""
+        with transaction.atomic(using=self.db):
+            stats, _ = self.select_for_update().get_or_create(user_id=user_id)
+            for status, count in self.counts([user_id])[user_id].items():
+                setattr(stats, status, count)
+            stats.save()
+
+
+class TodoStats(models.Model):
+    """Per-user todo counts by stored status, kept current on every write."""
+
+    STATUSES = ("pending", "in_progress", "completed", "expired")
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="todo_stats",
+        db_constraint=False,
+    )
+    pending = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    expired = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = TodoStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "todo stats"
+
+    def __str__(self):
+        return f"Todo stats for user {self.user_id}"
+
+
+class TodoDeletionManager(models.Manager):
+    def record(self, rows, now=None):
+        """Store tombstones for ``(todo id, owner id)`` pairs."""
+        now = now or timezone.now()
+        self.bulk_create(
+            [
+                TodoDeletion(todo_id=pk, user_id=user_id, deleted_at=now)
+                for pk, user_id in rows
+                if user_id is not None
+            ]
+        )
+
+    def compact(self, before, batch_size=1000):
+        """Delete tombstones older than ``before`` in batches; return the count."""
+        deleted = 0
+        while True:
+            ids = list(
+                self.filter(deleted_at__lt=before).values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not ids:
+                return deleted
+            deleted += self.filter(pk__in=ids).delete()[0]
+
+
+class TodoDeletion(models.Model):
+    """Tombstone for a deleted todo, read by the delta sync endpoint."""
+
+    todo_id = models.BigIntegerField()
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="todo_deletions",
+        db_constraint=False,
+    )
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TodoDeletionManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "deleted_at", "id"],
+                name="todo_deletion_user_idx",
+            ),
+            models.Index(fields=["deleted_at"], name="todo_deletion_compact_idx"),
+        ]
+
+    def __str__(self):
+        return f"Deleted todo {self.todo_id}"
+
+
+class TodoArchiveManager(models.Manager):
+    def archive(self, before, batch_size=1000, now=None):
+        """
+        Move todos completed or expired before ``before`` into the archive,
+        one short transaction per batch; return the count.
+
+        Rows are deleted through ``TodoQuerySet.delete``, so sync clients see
+        archived todos as deleted from the active set.
+        """
+        now = now or timezone.now()
+        fields = [field.attname for field in TodoArchive._meta.concrete_fields]
+        fields.remove("archived_at")
+        todos = Todo.objects.using(self.db)
+        archived = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                rows = list(
+                    todos.archivable(before)
+                    .filter(pk__gt=last_pk)
+                    .select_for_update(skip_locked=True)
+                    .order_by("pk")
+                    .values(*fields)[:batch_size]
+                )
+                if not rows:
+                    return archived
+                for row in rows:
+                    if row["status"] != "completed":
+                        row["status"] = "expired"
+                self.bulk_create(TodoArchive(archived_at=now, **row) for row in rows)
+                todos.filter(pk__in=[row["id"] for row in rows]).delete()
+                by_user = defaultdict(list)
+                for row in rows:
+                    by_user[row["created_by_id"]].append(row["id"])
+                for user_id, ids in by_user.items():
+                    notify_todos_changed(Todo, user_id, "archive", ids, using=self.db)
+            archived += len(rows)
+            last_pk = rows[-1]["id"]
+
+
+class TodoArchive(models.Model):
+    """A todo moved out of the active table by ``archive_todos``."""
+
+    # The todo's original id.
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=Todo.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+",
+        db_constraint=False,
+    )
+    updated_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+",
+        db_constraint=False,
+    )
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = TodoArchiveManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_by", "created_at", "id"],
+                name="todo_archive_created_idx",
+            ),
+            models.Index(
+                fields=["created_by", "updated_at", "id"],
+                name="todo_archive_updated_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} [archived]"
+
+
+class UserShard(models.Model):
+    """
+    The shard holding a user's todo data, for users pinned or moved there;
+    other users are placed by hashing their id (see ``api.shards``).
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="shard"
+    )
+    shard = models.CharField(max_length=100)
+    # Set while ``rebalance_shards`` moves the user's data there.
+    moving_to = models.CharField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"User {self.user_id} on {self.shard}"
+
+
+class RevokedToken(models.Model):
+    """A JWT revoked before it expires, kept until then (see ``api.revocation``)."""
+
+    # Workers sync by the auto-incrementing id, which unlike ``revoked_at``
+    # does not depend on any host's clock.
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"], name="revoked_token_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
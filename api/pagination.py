@@ -0,0 +1,244 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import DateTimeField, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on ``(ordering field, id)``.
+
+    Unlike ``CursorPagination`` the position is the full key of the last row
+    rather than a value plus an offset, so every page is a single index range
+    scan no matter how deep the client goes. ``COUNT(*)`` only runs when the
+    client passes ``?count=true``.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering_query_param = "ordering"
+    ordering_fields = ("created_at", "updated_at")
+    ordering = "-created_at"
+    count_query_param = "count"
+    # Search results (see ``api.search``) default to best match first.
+    search_rank_field = "search_rank"
+
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        prepared = self.prepare_page(queryset, request, view)
+        if prepared is None:
+            return None
+        page_queryset, count_queryset = prepared
+        self.count = count_queryset.count() if count_queryset is not None else None
+        return self.finish_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` using the async ORM."""
+        prepared = self.prepare_page(queryset, request, view)
+        if prepared is None:
+            return None
+        page_queryset, count_queryset = prepared
+        if count_queryset is not None:
+            self.count = await count_queryset.acount()
+        else:
+            self.count = None
+        return self.finish_page([row async for row in page_queryset])
+
+    def prepare_page(self, queryset, request, view=None):
+        """
+        Resolve the cursor and return ``(page queryset, count queryset)``
+        without running any query. The count queryset is ``None`` unless the
+        client asked for a count.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            ordering = self.get_ordering(request, queryset, view)
+            position, reverse = None, False
+        else:
+            ordering, position, reverse = cursor
+            requested = request.query_params.get(self.ordering_query_param)
+            if (
+                ordering.lstrip("-") not in self.get_ordering_fields(queryset)
+                or requested not in (None, ordering)
+                or not self.valid_value(queryset, ordering.lstrip("-"), position[0])
+            ):
+                raise NotFound(self.invalid_cursor_message)
+
+        self.ordering = ordering
+        self.key = ordering.lstrip("-")
+        self.position, self.reverse = position, reverse
+
+        count_queryset = queryset if self._wants_count(request) else None
+        page_queryset = self.get_page_queryset(queryset, ordering, position, reverse)
+        return page_queryset, count_queryset
+
+    def finish_page(self, results):
+        position, reverse = self.position, self.reverse
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.next_position = self._position(self.page[-1]) if self.page else position
+        self.previous_position = self._position(self.page[0]) if self.page else position
+        return self.page
+
+    def get_page_queryset(self, queryset, ordering, position=None, reverse=False):
+        """Return the sliced queryset for the page after (or before) ``position``."""
+        key = ordering.lstrip("-")
+        scan_descending = ordering.startswith("-") != reverse
+        lookup = "lt" if scan_descending else "gt"
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f"{key}__{lookup}e": value})
+                & (Q(**{f"{key}__{lookup}": value}) | Q(**{f"pk__{lookup}": pk}))
+            )
+        if scan_descending:
+            queryset = queryset.order_by(f"-{key}", "-pk")
+        else:
+            queryset = queryset.order_by(key, "pk")
+        return queryset[: self.page_size + 1]
+
+    def get_ordering_fields(self, queryset):
+        if self.search_rank_field in queryset.query.annotations:
+            return (*self.ordering_fields, self.search_rank_field)
+        return self.ordering_fields
+
+    def valid_value(self, queryset, key, value):
+        """Whether a cursor ``value`` has the type of the ``key`` it orders by."""
+        if key == self.search_rank_field:
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+        field = queryset.model._meta.get_field(key)
+        if isinstance(field, DateTimeField):
+            return isinstance(value, datetime)
+        try:
+            field.to_python(value)
+        except DjangoValidationError:
+            return False
+        return True
+
+    def get_ordering(self, request, queryset, view):
+        ordering_fields = self.get_ordering_fields(queryset)
+        default = self.ordering
+        if self.search_rank_field in ordering_fields:
+            default = f"-{self.search_rank_field}"
+        ordering = request.query_params.get(self.ordering_query_param, default)
+        if ordering.lstrip("-") not in ordering_fields:
+            allowed = ", ".join(ordering_fields)
+            raise ValidationError(
+                {self.ordering_query_param: f"Ordering must be one of: {allowed}."}
+            )
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self._link(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        payload = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            payload["count"] = self.count
+        return payload
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count"] = {
+            "type": "integer",
+            "description": f"Only present with ?{self.count_query_param}=true.",
+        }
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append(
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the total number of results.",
+                "schema": {"type": "boolean"},
+            }
+        )
+        return parameters
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            ordering = data["o"]
+            value, pk = data["p"]
+            pk = int(pk)
+            if data.get("t") == "dt":
+                value = parse_datetime(value)
+            reverse = bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None or not isinstance(ordering, str):
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, (value, pk), reverse
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        data = {"o": self.ordering, "p": [value, pk]}
+        if isinstance(value, datetime):
+            data["p"][0] = value.isoformat()
+            data["t"] = "dt"
+        if reverse:
+            data["r"] = 1
+        return base64.urlsafe_b64encode(
+            json.dumps(data, separators=(",", ":")).encode("utf-8")
+        ).decode("ascii")
+
+    def _link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.ordering_query_param)
+        if position is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position, reverse)
+        )
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return row[self.key], row["id"]
+        return getattr(row, self.key), row.pk
+
+    def _wants_count(self, request):
+        value = request.query_params.get(self.count_query_param, "")
+        return value.lower() in ("1", "true", "yes")
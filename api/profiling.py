@@ -0,0 +1,191 @@
+"""
+Per-request profiling.
+
+``ProfilingMiddleware`` attaches a ``RequestProfile`` to ``request.profile``.
+Every database query is timed through connection execute wrappers, code
+paths can time themselves with ``profile_timer(request, name)``, and the
+result goes out as one JSON log line on the ``api.profiling`` logger. The
+timings are also returned in a ``Server-Timing`` header, but only to staff
+users or when ``DEBUG`` is on, as they describe the database and cache.
+
+A ``SAMPLE_RATE`` share of requests also runs under cProfile (and optionally
+tracemalloc). Their dumps are written to ``DUMP_DIR`` when they take longer
+than ``SLOW_MS``, or always if it is 0; load them with ``pstats`` or
+``tracemalloc.Snapshot.load``. tracemalloc traces the whole process, so it is
+started for one sampled request at a time, and not at all if something else
+already started it; allocations made by concurrent requests still show up.
+"""
+import cProfile
+import contextlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Held by the sampled request that has tracemalloc running.
+_tracing = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.db_queries = 0
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def time_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings["db"] += time.perf_counter() - start
+            self.db_queries += 1
+
+    @contextlib.contextmanager
+    def capture_queries(self):
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                wrapper = connections[alias].execute_wrapper(self.time_query)
+                stack.enter_context(wrapper)
+            yield
+
+    def finish(self):
+        self.timings["total"] = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """``Server-Timing`` header value, durations in milliseconds."""
+        metrics = []
+        for name, seconds in self.timings.items():
+            metric = f"{name};dur={seconds * 1000:.1f}"
+            if name == "db":
+                metric += f';desc="{self.db_queries} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+    def as_dict(self):
+        data = {f"{name}_ms": round(s * 1000, 2) for name, s in self.timings.items()}
+        data["db_queries"] = self.db_queries
+        return data
+
+
+def profile_timer(request, name):
+    """Time a block under ``name`` if ``request`` is being profiled."""
+    profile = getattr(request, "profile", None)
+    return profile.timer(name) if profile else contextlib.nullcontext()
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @property
+    def config(self):
+        return settings.REQUEST_PROFILING
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.config["ENABLED"]:
+            return self.get_response(request)
+        profile = request.profile = RequestProfile()
+        with self.sample(request) as sampler, profile.capture_queries():
+            response = self.get_response(request)
+        return self.finish(request, response, profile, sampler)
+
+    async def __acall__(self, request):
+        if not self.config["ENABLED"]:
+            return await self.get_response(request)
+        profile = request.profile = RequestProfile()
+        with self.sample(request) as sampler, profile.capture_queries():
+            response = await self.get_response(request)
+        return self.finish(request, response, profile, sampler)
+
+    @contextlib.contextmanager
+    def sample(self, request):
+        """Run the block under cProfile/tracemalloc for sampled requests."""
+        if random.random() >= self.config["SAMPLE_RATE"]:
+            yield None
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another request on this thread is already being profiled.
+            yield None
+            return
+        trace = (
+            self.config["TRACEMALLOC"]
+            and not tracemalloc.is_tracing()
+            and _tracing.acquire(blocking=False)
+        )
+        if trace:
+            tracemalloc.start()
+        sampler = {"profiler": profiler, "snapshot": None}
+        try:
+            yield sampler
+        finally:
+            profiler.disable()
+            if trace:
+                sampler["snapshot"] = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                _tracing.release()
+
+    def show_timing(self, request):
+        """Server-Timing is only sent to staff, unless ``DEBUG`` is on."""
+        user = getattr(request, "user", None)
+        return settings.DEBUG or getattr(user, "is_staff", False)
+
+    def finish(self, request, response, profile, sampler):
+        profile.finish()
+        if self.show_timing(request):
+            response["Server-Timing"] = profile.server_timing()
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **profile.as_dict(),
+        }
+        slow_ms = self.config["SLOW_MS"]
+        if sampler and (not slow_ms or record["total_ms"] >= slow_ms):
+            record["dumps"] = self.dump(request, record, sampler)
+        logger.info(json.dumps(record))
+        return response
+
+    def dump(self, request, record, sampler):
+        directory = Path(self.config["DUMP_DIR"])
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root"
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}"
+        stem += f"-{record['total_ms']:.0f}ms-{uuid.uuid4().hex[:6]}"
+
+        paths = [directory / f"{stem}.prof"]
+        sampler["profiler"].dump_stats(paths[0])
+        if sampler["snapshot"] is not None:
+            paths.append(directory / f"{stem}.tracemalloc")
+            sampler["snapshot"].dump(paths[1])
+        return [str(path) for path in paths]
@@ -0,0 +1,76 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .profiling import profile_timer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes with orjson when it is installed.
+
+    Indented (browsable) output and anything orjson does not know natively,
+    such as datetimes and lazy strings, still go through DRF's encoder.
+    """
+
+    options = (
+        (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get("request")
+        with profile_timer(request, "render"):
+            if orjson is None or data is None:
+                return super().render(data, accepted_media_type, renderer_context)
+            if self.get_indent(accepted_media_type, renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            return orjson.dumps(
+                data, default=self.encoder_class().default, option=self.options
+            )
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON. Exports are streamed by the view; this renders the
+    other responses, such as errors, as a single line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return JSONRenderer().render(data) + b"\n"
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV. Exports are streamed by the view; this renders the other responses,
+    such as errors, as a header row of the keys and one row of their values.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not isinstance(data, dict):
+            data = {"detail": data}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(data)
+        writer.writerow(
+            " ".join(map(str, value)) if isinstance(value, list) else value
+            for value in data.values()
+        )
+        return buffer.getvalue().encode(self.charset)
@@ -0,0 +1,133 @@
+"""
+Read replicas for todo reads.
+
+``ReplicaRouter`` only sends reads to a replica inside ``use_replica()``, which
+``TodoViewSet`` enters for safe requests; everything else, including reads made
+while handling a write, stays on the primary. Replicas are picked by weight
+among those that passed their last health check, and a user who just wrote is
+kept on the primary for ``DATABASE_REPLICA_PIN_SECONDS`` so they always read
+their own writes. The pin lives in ``TODO_VERSION_CACHE``, which is the shared
+cache outside single-process development, so every worker sees it.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+_read_alias = contextvars.ContextVar("replica_read_alias", default=None)
+
+
+class ReplicaPool:
+    """Weighted choice among replicas, re-checking their health periodically."""
+
+    def __init__(self, weights, check_interval, max_lag):
+        self.weights = dict(weights)
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.healthy = set(self.weights)
+        self.checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """Return a healthy replica alias, or None to read from the primary."""
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            # One thread re-checks; the others keep using the last result.
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.refresh()
+                finally:
+                    self._lock.release()
+        aliases = [alias for alias in self.weights if alias in self.healthy]
+        if not aliases:
+            return None
+        weights = [self.weights[alias] for alias in aliases]
+        return random.choices(aliases, weights)[0]
+
+    def refresh(self):
+        self.healthy = {alias for alias in self.weights if self.check(alias)}
+        self.checked_at = time.monotonic()
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                lag = self.lag(connections[alias], cursor)
+        except DatabaseError:
+            logger.warning("Replica %s failed its health check", alias, exc_info=True)
+            return False
+        if lag is not None and lag > self.max_lag:
+            logger.warning("Replica %s is %.1fs behind the primary", alias, lag)
+            return False
+        return True
+
+    def lag(self, connection, cursor):
+        """Replication lag in seconds, or None if the backend cannot tell."""
+        if connection.vendor != "postgresql":
+            cursor.execute("SELECT 1")
+            return None
+        cursor.execute(
+            "SELECT CASE WHEN pg_is_in_recovery() THEN "
+            "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+
+
+@lru_cache(maxsize=None)
+def get_pool():
+    return ReplicaPool(
+        settings.DATABASE_REPLICAS,
+        settings.DATABASE_REPLICA_CHECK_INTERVAL,
+        settings.DATABASE_REPLICA_MAX_LAG,
+    )
+
+
+def _pin_key(user_id):
+    return f"db:pinned:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Read ``user_id``'s requests from the primary for the pin window."""
+    if settings.DATABASE_REPLICAS:
+        caches[settings.TODO_VERSION_CACHE].set(
+            _pin_key(user_id), True, settings.DATABASE_REPLICA_PIN_SECONDS
+        )
+
+
+def use_replica(user):
+    """
+    Route this context's reads to a replica unless ``user`` is pinned to the
+    primary. Returns a token for ``release_replica``, or None.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if caches[settings.TODO_VERSION_CACHE].get(_pin_key(user.pk)):
+        return None
+    alias = get_pool().choose()
+    return _read_alias.set(alias) if alias else None
+
+
+def release_replica(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,201 @@
+"""
+Revoked JWTs.
+
+Logout and refresh token rotation store the token's ``jti`` in
+``RevokedToken`` until the token would have expired anyway. Every process
+keeps its own copy of the unexpired revocations, so checking a token during
+authentication never touches the database or a cache:
+
+* a Bloom filter answers "not revoked" for almost every token with a few bit
+  lookups;
+* the few tokens it may have seen are confirmed against an expiring set of
+  ``{jti: exp}``, which rules out false positives and drops expired entries.
+
+Each process pulls revocations made elsewhere at most every
+``SYNC_INTERVAL`` seconds, so a token revoked by another worker stops working
+within that window; the revoking worker rejects it immediately. Syncs read the
+rows past the highest id already loaded. Ids are allocated before commit, so
+ids skipped over are looked for again for ``MAX_COMMIT_DELAY`` seconds in case
+their row is committed late.
+
+Refreshing and rotating refresh tokens are rare, so they check ``RevokedToken``
+itself rather than this eventually consistent copy.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+MAX_COMMIT_DELAY = 60
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    """Per-process view of ``RevokedToken``; see the module docs."""
+
+    def __init__(self, capacity, error_rate, sync_interval):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.tokens = {}
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.added = 0
+        self.last_id = None
+        self.gaps = {}
+        self.checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def due(self):
+        return time.monotonic() - self.checked_at >= self.sync_interval
+
+    def refresh(self):
+        """Sync if the interval has passed. Uses the sync ORM."""
+        # One thread syncs; the others keep using the current copy.
+        if self.due() and self._lock.acquire(blocking=False):
+            try:
+                self.sync()
+            finally:
+                self._lock.release()
+
+    def is_revoked(self, jti):
+        if not self.tokens or jti is None or jti not in self.bloom:
+            return False
+        exp = self.tokens.get(jti)
+        return exp is not None and exp > time.time()
+
+    def add(self, jti, exp):
+        self.tokens[jti] = exp
+        self.bloom.add(jti)
+        self.added += 1
+
+    def sync(self):
+        """Load revocations made since the last sync and drop expired ones."""
+        from .models import RevokedToken
+
+        rows = RevokedToken.objects.using("default")
+        try:
+            if self.last_id is None:
+                newest = rows.aggregate(newest=Max("pk"))["newest"] or 0
+                rows = rows.filter(pk__lte=newest, expires_at__gt=timezone.now())
+            else:
+                start = min(self.gaps, default=self.last_id + 1)
+                rows = rows.filter(pk__gte=start)
+            rows = list(rows.values_list("pk", "jti", "expires_at"))
+        except DatabaseError:
+            logger.warning("Could not sync revoked tokens", exc_info=True)
+            return
+        finally:
+            self.checked_at = time.monotonic()
+        now = time.time()
+        for _, jti, expires_at in rows:
+            exp = expires_at.timestamp()
+            if exp > now and jti not in self.tokens:
+                self.add(jti, exp)
+        if self.last_id is None:
+            self.last_id = newest
+        else:
+            self.track_gaps({pk for pk, _, _ in rows})
+        self.prune()
+
+    def track_gaps(self, loaded):
+        """Remember ids below the newest loaded one whose rows were not seen."""
+        clock = time.monotonic()
+        newest = max(loaded, default=self.last_id)
+        for pk in range(self.last_id + 1, newest):
+            if pk not in loaded:
+                self.gaps[pk] = clock
+        self.gaps = {
+            pk: seen
+            for pk, seen in self.gaps.items()
+            if pk not in loaded and clock - seen < MAX_COMMIT_DELAY
+        }
+        self.last_id = max(self.last_id, newest)
+
+    def prune(self):
+        """Drop expired tokens; rebuild the filter once it is full."""
+        cutoff = time.time()
+        self.tokens = {jti: exp for jti, exp in self.tokens.items() if exp > cutoff}
+        if self.added > self.capacity:
+            # Expired tokens leave their bits set, so rebuild from live ones.
+            self.capacity = max(self.capacity, 2 * len(self.tokens))
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            for jti in self.tokens:
+                self.bloom.add(jti)
+            self.added = len(self.tokens)
+
+    def clear(self):
+        with self._lock:
+            self.tokens = {}
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            self.added = 0
+            self.last_id = None
+            self.gaps = {}
+            self.checked_at = float("-inf")
+
+
+revocations = RevocationList(
+    capacity=settings.TOKEN_REVOCATION["CAPACITY"],
+    error_rate=settings.TOKEN_REVOCATION["ERROR_RATE"],
+    sync_interval=settings.TOKEN_REVOCATION["SYNC_INTERVAL"],
+)
+
+
+def revoke(token):
+    """
+    Revoke a validated simplejwt token until it expires. Returns False if it
+    had already been revoked, by this or a concurrent request.
+    """
+    from .models import RevokedToken
+
+    jti = token[api_settings.JTI_CLAIM]
+    exp = token["exp"]
+    _, created = RevokedToken.objects.using("default").get_or_create(
+        jti=jti,
+        defaults={"expires_at": datetime.fromtimestamp(exp, tz=dt_timezone.utc)},
+    )
+    revocations.add(jti, exp)
+    return created
+
+
+def is_revoked(token):
+    return revocations.is_revoked(token.get(api_settings.JTI_CLAIM))
+
+
+def is_revoked_exactly(token):
+    """``is_revoked`` checked against the database rather than this process."""
+    from .models import RevokedToken
+
+    jti = token.get(api_settings.JTI_CLAIM)
+    return RevokedToken.objects.using("default").filter(jti=jti).exists()
@@ -0,0 +1,87 @@
+"""
+Background expiry sweeps.
+
+The preferred way to persist expired statuses is one dedicated process,
+``manage.py expire_todos --interval N``, or cron. For single-process
+deployments (``WEB_CONCURRENCY`` of 1) the WSGI/ASGI application can also run
+an in-process sweeper when ``TODO_EXPIRY_SWEEP_INTERVAL`` is set. It is started
+by the first request a process serves rather than at import, because threads
+do not survive a fork (gunicorn ``--preload``), and a forked child starts its
+own.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections
+
+from .models import Todo
+
+logger = logging.getLogger(__name__)
+
+_sweeper = None
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+class ExpirySweeper(threading.Thread):
+    """Background thread that periodically persists expired todo statuses."""
+
+    def __init__(self, interval, batch_size):
+        super().__init__(name="todo-expiry-sweeper", daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                expired = Todo.objects.expire_overdue(batch_size=self.batch_size)
+                if expired:
+                    logger.info("Expired %d overdue todos", expired)
+            except Exception:
+                logger.exception("Todo expiry sweep failed")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_expiry_sweeper():
+    """Start this process's sweeper unless it is disabled or already running."""
+    global _sweeper, _sweeper_pid
+    interval = settings.TODO_EXPIRY_SWEEP_INTERVAL
+    if interval <= 0 or settings.WEB_CONCURRENCY > 1:
+        return None
+    pid = os.getpid()
+    if _sweeper_pid == pid:
+        return _sweeper
+    with _sweeper_lock:
+        # A sweeper recorded under another pid was started before a fork and
+        # its thread did not survive it.
+        if _sweeper_pid != pid:
+            _sweeper = ExpirySweeper(interval, settings.TODO_EXPIRY_BATCH_SIZE)
+            _sweeper.start()
+            _sweeper_pid = pid
+    return _sweeper
+
+
+def _start_on_request(sender, **kwargs):
+    start_expiry_sweeper()
+
+
+def _reset_after_fork():
+    global _sweeper_lock
+    # The lock may have been held by another thread when the process forked.
+    _sweeper_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def install_expiry_sweeper():
+    """Start the sweeper with the first request each process serves."""
+    request_started.connect(_start_on_request, dispatch_uid="todo-expiry-sweeper")
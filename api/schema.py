@@ -0,0 +1,93 @@
+"""
+OpenAPI schema served from a file generated at build time.
+
+``manage.py generate_api_schema`` writes the drf_yasg schema to
+``API_SCHEMA_FILE``. ``/swagger.json`` serves that file with a strong ETag,
+and the Swagger and ReDoc pages load it instead of introspecting every view on
+each hit. Without the file the schema is generated on first use and kept in
+memory. Only imported when ``API_DOCS_ENABLED`` is set.
+"""
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import get_conditional_response, patch_cache_control
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+API_INFO = openapi.Info(
+    title="Todo API",
+    default_version="v1",
+    description="Simple CRUD Todo API using Django REST Framework",
+)
+
+
+def generate_schema():
+    """Return the schema of every public endpoint as JSON bytes."""
+    generator = OpenAPISchemaGenerator(API_INFO)
+    schema = generator.get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+@lru_cache(maxsize=1)
+def _load(path, mtime):
+    if mtime is None:
+        content = generate_schema()
+    else:
+        content = path.read_bytes()
+    return content, '"%s"' % hashlib.sha1(content).hexdigest()
+
+
+def load_schema():
+    """Return ``(content, etag)``, re-reading the file only when it changes."""
+    path = settings.API_SCHEMA_FILE
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    return _load(path, mtime)
+
+
+def schema_json(request):
+    content, etag = load_schema()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+class SchemaUIView(APIView):
+    """Swagger UI or ReDoc page; the schema itself is fetched from ``schema_json``."""
+
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    swagger_schema = None
+
+    def get(self, request):
+        # The page template only needs the title and version.
+        swagger = openapi.Swagger(info=API_INFO, _prefix="/", paths=openapi.Paths({}))
+        return Response(swagger)
+
+
+urlpatterns = [
+    path("swagger.json", schema_json, name="schema-json"),
+    path(
+        "swagger/",
+        SchemaUIView.as_view(renderer_classes=[SwaggerUIRenderer]),
+        name="schema-swagger-ui",
+    ),
+    path(
+        "redoc/",
+        SchemaUIView.as_view(renderer_classes=[ReDocRenderer]),
+        name="schema-redoc",
+    ),
+]
@@ -0,0 +1,65 @@
+"""
+Full-text search over ``Todo.title`` and ``Todo.body``.
+
+PostgreSQL uses a stored, generated ``tsvector`` column with a GIN index.
+SQLite uses an external-content FTS5 table kept in sync by triggers, so every
+write path (``save``, bulk operations, ``QuerySet.update``) updates it. Both
+annotate matches with ``search_rank``, where higher ranks are better.
+
+Migration 0006 creates both. SQLite drops the triggers whenever a migration
+rebuilds ``api_todo``, so such migrations must recreate them, as 0010 does.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+def fts5_query(text):
+    """Quote each term so user input can't use FTS5 syntax; prefix-match the last."""
+    terms = [f'"{term}"' for term in re.findall(r"\w+", text)]
+    if not terms:
+        return None
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(queryset, text):
+    """Filter ``queryset`` to todos matching ``text`` and annotate ``search_rank``."""
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return queryset.filter(
+            RawSQL(
+                f"api_todo.search_vector @@ {tsquery}",
+                [text],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank(api_todo.search_vector, {tsquery})",
+                [text],
+                output_field=FloatField(),
+            )
+        )
+    if vendor == "sqlite":
+        match = fts5_query(text)
+        if match is None:
+            return queryset.none()
+        # bm25() only works in the query that matches the FTS table, so the
+        # table is joined once and matched and ranked there.
+        matches = RawSQL(
+            "api_todo_fts MATCH %s", [match], output_field=BooleanField()
+        )
+        return (
+            queryset.filter(search_index__isnull=False)
+            .filter(matches)
+            .annotate(
+                search_rank=RawSQL("-bm25(api_todo_fts)", [], output_field=FloatField())
+            )
+        )
+    # Other backends get an unranked substring match.
+    return queryset.filter(
+        Q(title__icontains=text) | Q(body__icontains=text)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -1,6 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .batch import BATCH_METHODS, is_denied_header, resolve_view
 from .models import Todo, User
+from .revocation import is_revoked_exactly
 from django.utils import timezone
 
 
@@ -15,10 +22,12 @@ class RegisterSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
-class LoginSerializer(serializers.Serializer):
+class CredentialsSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+class LoginSerializer(CredentialsSerializer):
     def validate(self, data):
         user = authenticate(
             email=data["email"],
@@ -32,6 +41,75 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        """Return the ``RefreshToken``; invalid or revoked tokens get a 401."""
+        try:
+            token = RefreshToken(value)
+        except TokenError as exc:
+            raise InvalidToken(exc.args[0])
+        if is_revoked_exactly(token):
+            raise InvalidToken("Token has been revoked")
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if not User.objects.filter(pk=user_id, is_active=True).exists():
+            raise InvalidToken("No active account found for the given token")
+        return token
+
+
+class TodoListSerializer(serializers.ListSerializer):
+    """
+    Bulk create/update for todos.
+
+    ``bulk_create``/``bulk_update`` skip ``Todo.save``, so the expiry rule and
+    the completed status guard are applied here explicitly. For updates the
+    serializer is given a ``{id: Todo}`` mapping as its instance.
+    """
+
+    def run_validation(self, data=serializers.empty):
+        self._targets = []
+        self._target_ids = set()
+        return super().run_validation(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            pk = data.get("id") if isinstance(data, dict) else None
+            todo = self.instance.get(pk) if isinstance(pk, int) else None
+            if todo is None:
+                raise serializers.ValidationError({"id": ["Todo not found."]})
+            if pk in self._target_ids:
+                raise serializers.ValidationError({"id": ["Duplicate id."]})
+            self.child.instance = todo
+            self.child.initial_data = data
+            self._targets.append(todo)
+            self._target_ids.add(pk)
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        now = timezone.now()
+        todos = [Todo(**attrs) for attrs in validated_data]
+        for todo in todos:
+            todo.apply_expiry_rule(now)
+        with transaction.atomic():
+            return Todo.objects.bulk_create(todos)
+
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        fields = {"status", "updated_at"}
+        for todo, attrs in zip(self._targets, validated_data):
+            self.child.keep_completed_status(todo, attrs)
+            for attr, value in attrs.items():
+                setattr(todo, attr, value)
+                fields.add(attr)
+            todo.updated_at = now
+            todo.apply_expiry_rule(now)
+            todo.__dict__.pop("effective_status", None)
+        with transaction.atomic():
+            Todo.objects.bulk_update(self._targets, sorted(fields))
+        return self._targets
+
+
 class TodoSerializer(serializers.ModelSerializer):
     status = serializers.ChoiceField(
         choices=[
@@ -45,6 +123,7 @@ class TodoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Todo
         fields = "__all__"
+        list_serializer_class = TodoListSerializer
         read_only_fields = (
             "id",
             "created_at",
@@ -65,8 +144,57 @@ class TodoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid status value.")
         return value
 
-    def update(self, instance, validated_data):
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        effective_status = getattr(instance, "effective_status", None)
+        if effective_status:
+            data["status"] = effective_status
+        return data
+
+    def keep_completed_status(self, instance, validated_data):
         if "status" in validated_data:
             if instance.status == "completed" and validated_data["status"] == "expired":
                 validated_data["status"] = "completed"
+
+    def update(self, instance, validated_data):
+        self.keep_completed_status(instance, validated_data)
+        # The read-time annotation is stale once the row is saved again.
+        instance.__dict__.pop("effective_status", None)
         return super().update(instance, validated_data)
+
+
+class TodoBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.TODO_BULK_MAX_ITEMS,
+    )
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=BATCH_METHODS)
+    path = serializers.CharField()
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if resolve_view(value) is None:
+            raise serializers.ValidationError(f"{value} is not an API endpoint.")
+        return value
+
+    def validate_headers(self, value):
+        denied = sorted(name for name in value if is_denied_header(name))
+        if denied:
+            raise serializers.ValidationError(
+                f"Sub-requests cannot set: {', '.join(denied)}."
+            )
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(default=False)
+    requests = serializers.ListField(
+        child=BatchRequestSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
@@ -0,0 +1,300 @@
+"""
+Sharding of todo data by owner.
+
+With ``TODO_SHARD_URLS`` set, every user's todos, tombstones, archived todos
+and stats live on one shard database; users and everything else stay on
+``default``. A user's shard is recorded in ``UserShard`` when they have been
+pinned or moved, and otherwise picked by hashing their id.
+
+Queries reach the right shard either through ``ShardRouter``, which places
+model instances by their owner, or explicitly with ``on_shard()``, which
+``TodoQuerySet.owned_by`` applies to every per-user query.
+
+``move_user`` moves a user between shards online: their writes are refused
+with 503 while rows are copied, reads keep being served from the source until
+the directory points at the target, and the source rows are removed last.
+Workers cache directory entries for ``TODO_SHARD_DIRECTORY_TIMEOUT`` seconds,
+so each step waits that long before relying on the previous one.
+"""
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Sharded models and the field holding their owner's id.
+SHARD_KEYS = {
+    "todo": "created_by_id",
+    "todoarchive": "created_by_id",
+    "tododeletion": "user_id",
+    "todostats": "user_id",
+}
+# Each shard allocates ids from its own range so rows can move between shards.
+ID_RANGE = 1 << 40
+
+
+class ShardMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Your todos are being moved; try again shortly."
+    default_code = "shard_moving"
+
+    def __init__(self):
+        super().__init__()
+        # Sent as Retry-After by DRF's exception handler.
+        self.wait = settings.TODO_SHARD_DIRECTORY_TIMEOUT
+
+
+def is_sharded(model):
+    return model._meta.app_label == "api" and model._meta.model_name in SHARD_KEYS
+
+
+def all_shards():
+    """
+    Every database holding todo data: the shards, and ``default`` while it
+    still holds rows of users who have not been moved off it.
+    """
+    shards = list(settings.TODO_SHARDS)
+    if not shards:
+        return ["default"]
+    if "default" not in shards and _holds_todo_data("default"):
+        shards.append("default")
+    return shards
+
+
+def _holds_todo_data(alias):
+    from django.apps import apps
+
+    return any(
+        apps.get_model("api", name)._base_manager.using(alias).exists()
+        for name in SHARD_KEYS
+    )
+
+
+def hashed_shard(user_id):
+    shards = settings.TODO_SHARDS
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def _directory_key(user_id):
+    return f"shards:user:{user_id}"
+
+
+def directory(user_id):
+    """``(shard, moving_to)`` for ``user_id``, cached briefly."""
+    cache = caches[settings.TODO_VERSION_CACHE]
+    key = _directory_key(user_id)
+    entry = cache.get(key)
+    if entry is None:
+        from .models import UserShard
+
+        row = (
+            UserShard.objects.using("default")
+            .filter(user_id=user_id)
+            .values_list("shard", "moving_to")
+            .first()
+        )
+        entry = row or (hashed_shard(user_id), "")
+        cache.set(key, entry, settings.TODO_SHARD_DIRECTORY_TIMEOUT)
+    return entry
+
+
+def shard_for(user_id):
+    """The shard holding ``user_id``'s todos, or None when not sharding."""
+    if not settings.TODO_SHARDS or user_id is None:
+        return None
+    return directory(user_id)[0]
+
+
+def on_shard(queryset, user_id):
+    """``queryset`` on ``user_id``'s shard (unchanged when not sharding)."""
+    alias = shard_for(user_id)
+    return queryset.using(alias) if alias else queryset
+
+
+def check_writable(user):
+    """Raise ``ShardMoving`` while ``user``'s todos are being moved."""
+    if settings.TODO_SHARDS and directory(user.pk)[1]:
+        raise ShardMoving()
+
+
+class ShardRouter:
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def _db_for(self, model, hints):
+        if model._meta.app_label == "api" and model._meta.model_name == "usershard":
+            return "default"
+        if not is_sharded(model):
+            return None
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+        # Assigning a user to an unsaved todo sets its database to the user's.
+        if instance._state.db and not instance._state.adding:
+            return instance._state.db
+        return shard_for(getattr(instance, SHARD_KEYS[model._meta.model_name]))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todos reference users on another database, without constraints.
+        return True
+
+
+def _owner_rows(model, alias, user_id):
+    key = SHARD_KEYS[model._meta.model_name].removesuffix("_id")
+    return model._base_manager.using(alias).filter(**{key: user_id})
+
+
+def _batches(queryset, batch_size):
+    """Yield ``queryset`` in primary key order, ``batch_size`` rows at a time."""
+    queryset = queryset.order_by("pk")
+    batch = list(queryset[:batch_size])
+    while batch:
+        yield batch
+        batch = list(queryset.filter(pk__gt=batch[-1].pk)[:batch_size])
+
+
+def _delete(model, alias, pks, batch_size):
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic(using=alias):
+            model._base_manager.using(alias).filter(
+                pk__in=pks[start : start + batch_size]
+            ).delete()
+
+
+def copy_rows(user_id, source, target, batch_size=1000, since=None):
+    """
+    Copy ``user_id``'s rows from ``source`` to ``target``, keeping their ids;
+    return the number copied. With ``since``, todos updated since then are
+    copied again and rows no longer on the source are removed from the target.
+    The target's ``TodoStats`` row is recounted.
+    """
+    from .models import Todo, TodoArchive, TodoDeletion, TodoStats
+
+    copied = 0
+    for model in (Todo, TodoArchive, TodoDeletion):
+        existing = set(
+            _owner_rows(model, target, user_id).values_list("pk", flat=True)
+        )
+        seen = set()
+        for batch in _batches(_owner_rows(model, source, user_id), batch_size):
+            seen.update(obj.pk for obj in batch)
+            if since is not None and model is Todo:
+                stale = {
+                    obj.pk
+                    for obj in batch
+                    if obj.pk in existing and obj.updated_at >= since
+                }
+                _delete(model, target, stale, batch_size)
+                existing -= stale
+            batch = [obj for obj in batch if obj.pk not in existing]
+            model._base_manager.using(target).bulk_create(batch)
+            copied += len(batch)
+        if since is not None:
+            _delete(model, target, existing - seen, batch_size)
+    TodoStats.objects.using(target).repair(user_id)
+    return copied
+
+
+def delete_rows(user_id, alias, batch_size=1000):
+    """Remove all of ``user_id``'s todo data from ``alias``."""
+    from .models import Todo, TodoArchive, TodoDeletion, TodoStats
+
+    for model in (Todo, TodoArchive, TodoDeletion, TodoStats):
+        pks = _owner_rows(model, alias, user_id).values_list("pk", flat=True)
+        _delete(model, alias, pks, batch_size)
+
+
+def forget_user(user_id):
+    """
+    Apply the owner foreign keys' ``on_delete`` rules on every shard for a
+    deleted user; the default database's cascades do not reach the shards.
+    """
+    from .models import Todo, TodoArchive, TodoDeletion, TodoStats
+
+    for alias in settings.TODO_SHARDS:
+        for model in (Todo, TodoArchive):
+            rows = model._base_manager.using(alias)
+            rows.filter(created_by_id=user_id).update(created_by=None)
+            rows.filter(updated_by_id=user_id).update(updated_by=None)
+        for model in (TodoDeletion, TodoStats):
+            model._base_manager.using(alias).filter(user_id=user_id).delete()
+
+
+def _set_directory(user_id, shard, moving_to=""):
+    from .models import UserShard
+
+    UserShard.objects.update_or_create(
+        user_id=user_id, defaults={"shard": shard, "moving_to": moving_to}
+    )
+    caches[settings.TODO_VERSION_CACHE].delete(_directory_key(user_id))
+
+
+def pin_users(shard=None, batch_size=1000):
+    """
+    Record the current shard, or ``shard``, of every user not yet in the
+    directory, so that changing the shard list does not move them. Return the
+    number pinned.
+    """
+    from .models import User, UserShard
+
+    cache = caches[settings.TODO_VERSION_CACHE]
+    unpinned = User.objects.exclude(
+        pk__in=UserShard.objects.values("user_id")
+    ).values_list("pk", flat=True)
+    pinned = 0
+    while True:
+        user_ids = list(unpinned.order_by("pk")[:batch_size])
+        if not user_ids:
+            return pinned
+        UserShard.objects.bulk_create(
+            UserShard(user_id=user_id, shard=shard or hashed_shard(user_id))
+            for user_id in user_ids
+        )
+        cache.delete_many([_directory_key(user_id) for user_id in user_ids])
+        pinned += len(user_ids)
+
+
+def move_user(user_id, target, batch_size=1000, source=None, log=None):
+    """Move ``user_id``'s todo data to the ``target`` shard; see the module docs."""
+    log = log or (lambda message: None)
+    wait = settings.TODO_SHARD_DIRECTORY_TIMEOUT
+    if target not in settings.TODO_SHARDS:
+        raise ValueError(f"Unknown shard {target!r}")
+    source = source or shard_for(user_id)
+    if source == target:
+        return 0
+
+    _set_directory(user_id, source, moving_to=target)
+    log(f"Writes paused; waiting {wait}s for workers to notice")
+    time.sleep(wait)
+
+    started = timezone.now()
+    copied = copy_rows(user_id, source, target, batch_size)
+    # Catch up with background writes (expiry, archiving) made while copying.
+    copy_rows(user_id, source, target, batch_size, since=started)
+    log(f"Copied {copied} rows from {source} to {target}")
+
+    _set_directory(user_id, target)
+    log(f"Now served from {target}; waiting {wait}s before cleaning up {source}")
+    time.sleep(wait)
+    delete_rows(user_id, source, batch_size)
+    return copied
+
+
+def shard_sizes():
+    """``{shard: todo count}``."""
+    from .models import Todo
+
+    return {
+        alias: Todo._base_manager.using(alias).count()
+        for alias in all_shards()
+        if alias in connections
+    }
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.dispatch import Signal
+
+# Sent after commit whenever a user's todos change. Provides ``user_id``,
+# ``action`` ("create", "update", "delete", "expire" or "archive") and the
+# affected ``ids``.
+todos_changed = Signal()
+
+# Sent after commit when users are changed by ``User.objects.update()``, which
+# sends no ``post_save``. Provides the affected ``ids``.
+users_changed = Signal()
+
+
+def notify_todos_changed(sender, user_id, action, ids, using=None):
+    """Send ``todos_changed`` once the current transaction on ``using`` commits."""
+    ids = list(ids)
+    transaction.on_commit(
+        lambda: todos_changed.send(
+            sender=sender, user_id=user_id, action=action, ids=ids
+        ),
+        using=using,
+    )
+
+
+def notify_users_changed(sender, ids, using=None):
+    """Send ``users_changed`` once the current transaction on ``using`` commits."""
+    ids = list(ids)
+    transaction.on_commit(
+        lambda: users_changed.send(sender=sender, ids=ids), using=using
+    )
@@ -0,0 +1,151 @@
+"""
+Delta sync for todo lists.
+
+A sync cursor holds three positions:
+
+* ``u`` — the last ``(updated_at, id)`` returned from the todo table, read in
+  that order through the ``(created_by, updated_at, id)`` index;
+* ``d`` — the last ``(deleted_at, id)`` returned from the ``TodoDeletion`` log;
+* ``x`` — the last ``(expires_at, id)`` of the overdue todos reported. Expiry
+  does not touch ``updated_at`` until the sweeper runs, so once ``u`` and ``d``
+  are exhausted, todos expired after ``x`` fill the rest of the page, and
+  further pages if there are more than fit.
+
+Only rows at least ``TODO_SYNC_LAG`` seconds old are returned, so a
+transaction that commits late cannot slip in behind a cursor. Each sync
+therefore costs O(changes) rather than O(todos).
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from .models import TodoDeletion
+from .shards import on_shard
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Sync cursor is too old; start a full sync without ?since=."
+    default_code = "cursor_expired"
+
+
+def after(key, position):
+    """Rows strictly after ``position`` in ``(key, id)`` order."""
+    value, pk = position
+    return Q(**{f"{key}__gt": value}) | Q(**{key: value, "pk__gt": pk})
+
+
+def encode_cursor(cursor):
+    data = {
+        "d": [cursor["d"][0].isoformat(), cursor["d"][1]],
+        "x": [cursor["x"][0].isoformat(), cursor["x"][1]],
+    }
+    if cursor["u"] is not None:
+        data["u"] = [cursor["u"][0].isoformat(), cursor["u"][1]]
+    return base64.urlsafe_b64encode(
+        json.dumps(data, separators=(",", ":")).encode("utf-8")
+    ).decode("ascii")
+
+
+def decode_position(data):
+    value, pk = data
+    value = parse_datetime(value)
+    if value is None:
+        raise ValueError(data)
+    return value, int(pk)
+
+
+def decode_cursor(encoded):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        # Older cursors hold only the time expiry was reported up to.
+        if isinstance(data["x"], str):
+            data["x"] = [data["x"], 0]
+        return {
+            "u": decode_position(data["u"]) if "u" in data else None,
+            "d": decode_position(data["d"]),
+            "x": decode_position(data["x"]),
+        }
+    except (TypeError, ValueError, KeyError, binascii.Error, UnicodeError):
+        raise NotFound("Invalid cursor")
+
+
+class TodoChanges:
+    """
+    One page of changes for ``user`` after ``cursor`` (``None`` starts a full
+    sync). ``get()`` takes a ``values()`` queryset that includes ``id``,
+    ``updated_at`` and ``expires_at`` and returns its rows unencoded.
+    """
+
+    def __init__(self, user, page_size):
+        self.user = user
+        self.page_size = page_size
+
+    def get(self, queryset, cursor):
+        now = timezone.now()
+        horizon = now - timedelta(seconds=settings.TODO_SYNC_LAG)
+        if cursor is None:
+            # Nothing a new client holds can have been deleted yet.
+            cursor = {"u": None, "d": (horizon, 0), "x": (horizon, 0)}
+        elif cursor["d"][0] < now - timedelta(days=settings.TODO_DELETION_RETENTION):
+            raise CursorExpired()
+
+        todos = queryset.filter(updated_at__lte=horizon)
+        if cursor["u"] is not None:
+            todos = todos.filter(after("updated_at", cursor["u"]))
+        todos = list(todos.order_by("updated_at", "pk")[: self.page_size + 1])
+
+        deletions = (
+            on_shard(TodoDeletion.objects.filter(user=self.user), self.user.pk)
+            .filter(deleted_at__lte=horizon)
+            .filter(after("deleted_at", cursor["d"]))
+            .order_by("deleted_at", "pk")
+            .values_list("deleted_at", "pk", "todo_id")[: self.page_size + 1]
+        )
+        deletions = list(deletions)
+
+        has_more = len(todos) > self.page_size or len(deletions) > self.page_size
+        todos, deletions = todos[: self.page_size], deletions[: self.page_size]
+        next_cursor = dict(cursor)
+        if todos:
+            next_cursor["u"] = (todos[-1]["updated_at"], todos[-1]["id"])
+        if deletions:
+            next_cursor["d"] = deletions[-1][:2]
+
+        if not has_more:
+            room = self.page_size - len(todos)
+            expired = list(
+                queryset.filter(expires_at__lte=horizon)
+                .filter(after("expires_at", cursor["x"]))
+                .exclude(status="completed")
+                .order_by("expires_at", "pk")[: room + 1]
+            )
+            has_more = len(expired) > room
+            expired = expired[:room]
+            seen = {todo["id"] for todo in todos}
+            todos.extend(todo for todo in expired if todo["id"] not in seen)
+            if expired:
+                next_cursor["x"] = (expired[-1]["expires_at"], expired[-1]["id"])
+
+        if not has_more:
+            # Everything up to the horizon has been delivered.
+            next_cursor.update(
+                u=max(next_cursor["u"] or (horizon, 0), (horizon, 0)),
+                d=max(next_cursor["d"], (horizon, 0)),
+                x=max(next_cursor["x"], (horizon, 0)),
+            )
+
+        return {
+            "changes": todos,
+            "deleted": [todo_id for _, _, todo_id in deletions],
+            "cursor": encode_cursor(next_cursor),
+            "has_more": has_more,
+        }
@@ -1,10 +1,86 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.conf import settings
 from django.urls import reverse
-from .models import User, Todo
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from benchmarks.compare import compare
+from benchmarks.http import latency_summary, percentile
+from . import scheduler
+from .admin import TodoAdmin
+from .authentication import CachedJWTAuthentication, UserCache
+from .checks import check_expiry_sweeper, check_worker_caches
+from .events import get_broker
+from .models import RevokedToken, User, Todo, TodoDeletion, TodoStats, UserShard
+from .replicas import ReplicaPool, ReplicaRouter, release_replica, use_replica
+from .revocation import BloomFilter, RevocationList, revocations
+from .shards import (
+    ID_RANGE,
+    ShardRouter,
+    all_shards,
+    hashed_shard,
+    move_user,
+    on_shard,
+    shard_for,
+)
+from .search import search
+from .serializers import TodoSerializer
+from .signals import todos_changed
 from django.utils import timezone
+from prometheus_client import REGISTRY
 
+import asyncio
+import base64
+import contextlib
+import csv
+import json
+import pstats
+import tempfile
+import time
 from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+
+class AuthenticatedAPITestCase(APITestCase):
+    """Clears the caches and authenticates the client as a new ``self.user``."""
+
+    email = "user@example.com"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email=self.email, password="strongpassword123"
+        )
+        self.client.force_authenticate(self.user)
+
+
+@contextlib.contextmanager
+def sqlite_test_databases(*aliases):
+    """Throwaway in-memory SQLite test databases for ``aliases`` not configured."""
+    added = [alias for alias in aliases if alias not in connections.settings]
+    for alias in added:
+        connections.settings[alias] = settings.DATABASES[alias] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+    connections.configure_settings(connections.settings)
+    try:
+        for alias in added:
+            connections[alias].creation.create_test_db(verbosity=0, autoclobber=True)
+        yield
+    finally:
+        for alias in added:
+            connections[alias].creation.destroy_test_db(":memory:", verbosity=0)
+            del connections[alias]
+            connections.settings.pop(alias)
+            settings.DATABASES.pop(alias, None)
 
 
 class AuthTests(APITestCase):
@@ -47,8 +123,237 @@ class AuthTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+@override_settings(PASSWORD_HASHING_WORKERS=0)
+class AsyncAuthTests(APITestCase):
+    def setUp(self):
+        self.user_data = {
+            "email": "async@example.com",
+            "password": "strongpassword123",
+        }
+
+    def test_async_signup_and_login(self):
+        response = self.client.post(
+            reverse("async-signup"), self.user_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(email=self.user_data["email"])
+        self.assertTrue(user.check_password(self.user_data["password"]))
+
+        response = self.client.post(
+            reverse("async-login"), self.user_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.json())
+
+        response = self.client.post(
+            reverse("async-signup"), self.user_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_async_login_invalid_credentials(self):
+        User.objects.create_user(**self.user_data)
+
+        for email, password in (
+            (self.user_data["email"], "wrongpass"),
+            ("nobody@example.com", "strongpassword123"),
+        ):
+            response = self.client.post(
+                reverse("async-login"),
+                {"email": email, "password": password},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_async_login_in_process_pool(self):
+        User.objects.create_user(**self.user_data)
+
+        response = self.client.post(
+            reverse("async-login"), self.user_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASHING_QUEUE_LIMIT=0)
+    def test_async_login_rejects_when_queue_is_full(self):
+        response = self.client.post(
+            reverse("async-login"), self.user_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="cached@example.com", password="strongpassword123"
+        )
+        response = self.client.post(
+            reverse("login"),
+            {"email": "cached@example.com", "password": "strongpassword123"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def _user_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("todo-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q for q in ctx.captured_queries if 'FROM "api_user"' in q["sql"]]
+
+    def test_warm_token_skips_user_query(self):
+        self.assertEqual(len(self._user_queries()), 1)
+        self.assertEqual(self._user_queries(), [])
+
+    def test_deactivated_user_is_evicted(self):
+        self._user_queries()
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse("todo-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_eviction_reaches_every_process(self):
+        # Two workers' caches backed by one shared cache.
+        first, second = (UserCache(10, 60, shared_cache="default") for _ in "ab")
+        first.set(self.user.pk, self.user)
+        self.assertEqual(second.get(self.user.pk), self.user)
+
+        first.delete(self.user.pk)
+        self.assertIsNone(second.get(self.user.pk))
+
+        local = UserCache(10, 0)
+        local.set(self.user.pk, self.user)
+        self.assertIsNone(local.get(self.user.pk))
+
+    def test_user_deactivated_by_update_is_evicted(self):
+        self._user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.get(reverse("todo-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        revocations.clear()
+        User.objects.create_user(
+            email="tokens@example.com", password="strongpassword123"
+        )
+        response = self.client.post(
+            reverse("login"),
+            {"email": "tokens@example.com", "password": "strongpassword123"},
+            format="json",
+        )
+        self.access, self.refresh = response.data["access"], response.data["refresh"]
+
+    def get_todos(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return self.client.get(reverse("todo-list"))
+
+    def test_refresh_rotate_and_logout(self):
+        response = self.client.post(reverse("token-refresh"), {"refresh": self.refresh})
+        self.assertEqual(self.get_todos(response.data["access"]).status_code, 200)
+
+        self.client.credentials()
+        response = self.client.post(reverse("token-rotate"), {"refresh": self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access, refresh = response.data["access"], response.data["refresh"]
+        self.assertNotEqual(refresh, self.refresh)
+        response = self.client.post(reverse("token-refresh"), {"refresh": self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.post(reverse("logout"), {"refresh": refresh})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_todos(access).status_code, 401)
+        response = self.client.get(reverse("async-todo-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post(reverse("token-refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(RevokedToken.objects.count(), 3)
+
+    def test_revocation_check_skips_database_between_syncs(self):
+        self.assertEqual(self.get_todos(self.access).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get_todos(self.access).status_code, 200)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "api_revokedtoken" in q["sql"]]
+        )
+
+    def test_revocations_sync_from_database_and_expire(self):
+        other = RevocationList(capacity=10, error_rate=0.01, sync_interval=0)
+        now = timezone.now()
+        RevokedToken.objects.create(jti="live", expires_at=now + timedelta(hours=1))
+        RevokedToken.objects.create(jti="old", expires_at=now - timedelta(hours=1))
+        other.refresh()
+        self.assertTrue(other.is_revoked("live"))
+        self.assertFalse(other.is_revoked("old"))
+        self.assertFalse(other.is_revoked("unknown"))
+
+        other.add("expired", time.time() - 1)
+        self.assertIn("expired", other.bloom)
+        self.assertFalse(other.is_revoked("expired"))
+        for n in range(20):
+            other.add(f"extra-{n}", time.time() - 1)
+        other.refresh()
+        self.assertEqual(set(other.tokens), {"live"})
+        self.assertNotIn("expired", other.bloom)
+
+    def test_sync_follows_ids_and_finds_late_commits(self):
+        other = RevocationList(capacity=10, error_rate=0.01, sync_interval=0)
+        later = timezone.now() + timedelta(hours=1)
+        RevokedToken.objects.create(jti="first", expires_at=later)
+        other.refresh()
+        # "late" gets the next id but commits after "skewed", whose host clock
+        # puts its revocation a day in the past.
+        late_id = RevokedToken.objects.create(jti="late", expires_at=later).pk
+        RevokedToken.objects.filter(pk=late_id).delete()
+        RevokedToken.objects.create(
+            jti="skewed", expires_at=later, revoked_at=timezone.now() - timedelta(1)
+        )
+        other.refresh()
+        self.assertTrue(other.is_revoked("skewed"))
+        self.assertFalse(other.is_revoked("late"))
+        self.assertEqual(set(other.gaps), {late_id})
+
+        RevokedToken.objects.create(pk=late_id, jti="late", expires_at=later)
+        other.refresh()
+        self.assertTrue(other.is_revoked("late"))
+        self.assertEqual(other.gaps, {})
+
+    def test_refresh_checks_the_database_and_rotates_once(self):
+        # Revoked by another worker this process has not synced with yet.
+        token = RefreshToken(self.refresh)
+        RevokedToken.objects.create(
+            jti=token["jti"], expires_at=timezone.now() + timedelta(days=1)
+        )
+        for name in ("token-refresh", "token-rotate"):
+            response = self.client.post(reverse(name), {"refresh": self.refresh})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # A concurrent rotation passed validation but revoked the token first.
+        with mock.patch("api.serializers.is_revoked_exactly", return_value=False):
+            response = self.client.post(
+                reverse("token-rotate"), {"refresh": self.refresh}
+            )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f"jti-{n}" for n in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f"other-{n}" in bloom for n in range(10000))
+        self.assertLess(false_positives, 300)
+
+
 class TodoTests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             email="todo@example.com",
             password="strongpassword123",
@@ -95,7 +400,7 @@ class TodoTests(APITestCase):
 
         response = self.client.get(self.todo_list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_update_todo_status(self):
         future_time = timezone.now() + timedelta(days=1)
@@ -153,6 +458,1393 @@ class TodoTests(APITestCase):
         self.assertEqual(Todo.objects.count(), 0)
 
 
+    def _create_todos(self, count, expires_at):
+        Todo.objects.bulk_create(
+            Todo(
+                title=f"Todo {i}",
+                body="Body",
+                expires_at=expires_at,
+                status="pending",
+                created_by=self.user,
+                updated_by=self.user,
+            )
+            for i in range(count)
+        )
+
+    def test_list_reports_expired_status_without_writing(self):
+        self._create_todos(3, timezone.now() - timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.todo_list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(t["status"] == "expired" for t in response.data["results"]))
+        self.assertFalse(
+            any(q["sql"].startswith("UPDATE") for q in ctx.captured_queries)
+        )
+        self.assertEqual(Todo.objects.filter(status="pending").count(), 3)
+
+    def test_list_query_count_is_constant(self):
+        past_time = timezone.now() - timedelta(days=1)
+        self._create_todos(2, past_time)
+        self.client.get(self.todo_list_url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.todo_list_url)
+
+        self._create_todos(50, past_time)
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.todo_list_url)
+
+        self.assertEqual(len(small), len(large))
+
+    def test_expire_todos_command(self):
+        past_time = timezone.now() - timedelta(days=1)
+        self._create_todos(5, past_time)
+        completed = Todo.objects.create(
+            title="Done",
+            body="Body",
+            expires_at=past_time,
+            status="completed",
+            created_by=self.user,
+        )
+
+        call_command("expire_todos", batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Todo.objects.filter(status="expired").count(), 5)
+        completed.refresh_from_db()
+        self.assertEqual(completed.status, "completed")
+
+    @override_settings(TODO_EXPIRY_SWEEP_INTERVAL=3600)
+    def test_expiry_sweeper_starts_once_per_process(self):
+        with mock.patch.object(scheduler, "_sweeper", None), mock.patch.object(
+            scheduler, "_sweeper_pid", None
+        ):
+            sweeper = scheduler.start_expiry_sweeper()
+            self.addCleanup(sweeper.stop)
+            self.assertTrue(sweeper.is_alive())
+            self.assertIs(scheduler.start_expiry_sweeper(), sweeper)
+
+            # After a fork the parent's thread is gone; the child starts its own.
+            with mock.patch("api.scheduler.os.getpid", return_value=-1):
+                forked = scheduler.start_expiry_sweeper()
+            self.addCleanup(forked.stop)
+            self.assertIsNot(forked, sweeper)
+
+        with override_settings(WEB_CONCURRENCY=2):
+            self.assertIsNone(scheduler.start_expiry_sweeper())
+            self.assertEqual(
+                [w.id for w in check_expiry_sweeper(None)], ["api.W002"]
+            )
+
+    def test_list_cursor_pagination(self):
+        self._create_todos(5, timezone.now() + timedelta(days=1))
+        expected = list(
+            Todo.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        seen = []
+        url = f"{self.todo_list_url}?page_size=2"
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn("count", response.data)
+                seen.extend(t["id"] for t in response.data["results"])
+                url = response.data["next"]
+
+        self.assertEqual(seen, expected)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+        response = self.client.get(response.wsgi_request.get_full_path())
+        previous = self.client.get(response.data["previous"])
+        self.assertEqual([t["id"] for t in previous.data["results"]], expected[2:4])
+
+    def test_list_rejects_tampered_cursors(self):
+        self._create_todos(1, timezone.now() + timedelta(days=1))
+
+        def cursor(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        now = timezone.now().isoformat()
+        for data, params in (
+            ({"o": "-created_at", "p": [{"a": 1}, 5]}, {}),
+            ({"o": "-created_at", "p": [1.5, 5]}, {}),
+            ({"o": "-created_at", "p": [now, 5]}, {}),
+            ({"o": ["-created_at"], "p": [now, 5], "t": "dt"}, {}),
+            ({"o": "-search_rank", "p": [1.5, 5]}, {}),
+            (
+                {"o": "-created_at", "p": [now, 5], "t": "dt"},
+                {"ordering": "updated_at"},
+            ),
+        ):
+            response = self.client.get(
+                self.todo_list_url, {"cursor": cursor(data), **params}
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, data)
+
+        valid = cursor({"o": "-created_at", "p": [now, 5], "t": "dt"})
+        response = self.client.get(self.todo_list_url, {"cursor": valid})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_count_and_ordering(self):
+        self._create_todos(3, timezone.now() + timedelta(days=1))
+
+        response = self.client.get(
+            self.todo_list_url, {"count": "true", "ordering": "updated_at"}
+        )
+        self.assertEqual(response.data["count"], 3)
+        ids = [t["id"] for t in response.data["results"]]
+        self.assertEqual(ids, sorted(ids))
+
+        response = self.client.get(self.todo_list_url, {"ordering": "title"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_filters(self):
+        now = timezone.now()
+        self._create_todos(2, now - timedelta(days=1))
+        self._create_todos(3, now + timedelta(days=2))
+
+        response = self.client.get(self.todo_list_url, {"status": "expired"})
+        self.assertEqual(len(response.data["results"]), 2)
+
+        response = self.client.get(self.todo_list_url, {"status": "pending"})
+        self.assertEqual(len(response.data["results"]), 3)
+
+        response = self.client.get(
+            self.todo_list_url,
+            {"expires_after": now.isoformat(), "created_after": "2000-01-01T00:00Z"},
+        )
+        self.assertEqual(len(response.data["results"]), 3)
+
+        response = self.client.get(
+            self.todo_list_url, {"status": "done", "updated_since": "yesterday"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("status", response.data)
+        self.assertIn("updated_since", response.data)
+
+    def test_list_search(self):
+        for title, body in (
+            ("Buy milk", "From the corner shop"),
+            ("Call mom", "About the milk delivery, milk milk"),
+            ("Write report", "Quarterly numbers"),
+        ):
+            Todo.objects.create(title=title, body=body, created_by=self.user)
+        Todo.objects.create(title="Other milk", body="Body")
+        Todo.objects.filter(title="Write report").update(body="Milkshake recipe")
+
+        response = self.client.get(self.todo_list_url, {"q": "milk"})
+        titles = [t["title"] for t in response.data["results"]]
+        self.assertEqual(sorted(titles), ["Buy milk", "Call mom", "Write report"])
+
+        response = self.client.get(self.todo_list_url, {"q": "milk", "page_size": 1})
+        pages = [response.data["results"][0]["title"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            pages.extend(t["title"] for t in response.data["results"])
+        self.assertEqual(pages, titles)
+
+        Todo.objects.filter(title="Buy milk").delete()
+        response = self.client.get(self.todo_list_url, {"q": "corner"})
+        self.assertEqual(response.data["results"], [])
+
+    def create_search_todos(self):
+        for title, body in (
+            ("Buy milk", "From the corner shop"),
+            ("Call mom", "About the milk delivery, milk milk"),
+            ("Write report", "Quarterly numbers"),
+        ):
+            Todo.objects.create(title=title, body=body, created_by=self.user)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite FTS5 search")
+    def test_sqlite_search_ranks_in_one_fts_join(self):
+        self.create_search_todos()
+        results = search(Todo.objects.owned_by(self.user), "milk")
+        with CaptureQueriesContext(connection) as ctx:
+            ranked = list(results.order_by("-search_rank"))
+        self.assertEqual([todo.title for todo in ranked], ["Call mom", "Buy milk"])
+        (query,) = ctx.captured_queries
+        self.assertEqual(query["sql"].count("api_todo_fts MATCH"), 1)
+        self.assertIn('INNER JOIN "api_todo_fts"', query["sql"])
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL full-text search")
+    def test_postgres_search_ranks_matches(self):
+        self.create_search_todos()
+        results = search(Todo.objects.owned_by(self.user), "milk delivery")
+        self.assertEqual([todo.title for todo in results], ["Call mom"])
+        results = search(Todo.objects.owned_by(self.user), "milk")
+        ranked = results.order_by("-search_rank")
+        self.assertEqual([todo.title for todo in ranked], ["Call mom", "Buy milk"])
+
+    def test_list_query_plans_use_indexes(self):
+        out = StringIO()
+        call_command("check_todo_query_plans", stdout=out)
+        self.assertIn("use an index", out.getvalue())
+
+    def test_list_matches_serializer_and_supports_sparse_fields(self):
+        past = timezone.now() - timedelta(days=1)
+        for i in range(3):
+            Todo.objects.create(title=f"Todo {i}", body="Body", created_by=self.user)
+        Todo.objects.filter(title="Todo 2").update(expires_at=past)
+        todos = Todo.objects.with_effective_status().order_by("-created_at", "-pk")
+        expected = json.loads(
+            JSONRenderer().render(TodoSerializer(todos, many=True).data)
+        )
+        self.assertIn("expired", [row["status"] for row in expected])
+
+        response = self.client.get(self.todo_list_url)
+        self.assertEqual(response.json()["results"], expected)
+        self.assertEqual(list(response.json()["results"][0]), list(expected[0]))
+
+        detail_url = reverse("todo-detail", args=[expected[0]["id"]])
+        self.assertEqual(self.client.get(detail_url).json(), expected[0])
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.todo_list_url, {"fields": "id,status", "page_size": 2}
+            )
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": row["id"], "status": row["status"]} for row in expected[:2]],
+        )
+        self.assertNotIn('"body"', queries[-1]["sql"])
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": expected[2]["id"], "status": expected[2]["status"]}],
+        )
+
+        response = self.client.get(self.todo_list_url, {"fields": "title,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("todo-detail", args=["x"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(TODO_SYNC_LAG=0)
+    def test_changes_since_cursor(self):
+        todos = [
+            Todo.objects.create(title=f"Todo {i}", body="Body", created_by=self.user)
+            for i in range(3)
+        ]
+        url = reverse("todo-changes")
+
+        response = self.client.get(url, {"page_size": 2})
+        self.assertTrue(response.data["has_more"])
+        ids = [todo["id"] for todo in response.data["changes"]]
+        response = self.client.get(url, {"since": response.data["cursor"]})
+        self.assertFalse(response.data["has_more"])
+        ids += [todo["id"] for todo in response.data["changes"]]
+        self.assertEqual(ids, [todo.pk for todo in todos])
+        cursor = response.data["cursor"]
+
+        response = self.client.get(url, {"since": cursor})
+        self.assertEqual((response.data["changes"], response.data["deleted"]), ([], []))
+
+        detail = reverse("todo-detail", args=[todos[0].pk])
+        self.client.patch(detail, {"title": "Renamed"}, format="json")
+        self.client.delete(reverse("todo-detail", args=[todos[1].pk]))
+        Todo.objects.filter(pk=todos[2].pk).update(expires_at=timezone.now())
+
+        response = self.client.get(url, {"since": cursor, "fields": "id,title,status"})
+        self.assertEqual(
+            response.data["changes"],
+            [
+                {"id": todos[0].pk, "title": "Renamed", "status": "pending"},
+                {"id": todos[2].pk, "title": "Todo 2", "status": "expired"},
+            ],
+        )
+        self.assertEqual(response.data["deleted"], [todos[1].pk])
+
+        response = self.client.get(url, {"since": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        later = timezone.now() + timedelta(days=31)
+        with mock.patch("api.sync.timezone.now", return_value=later):
+            response = self.client.get(url, {"since": cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    @override_settings(TODO_SYNC_LAG=0)
+    def test_changes_pages_expired_todos(self):
+        todos = [
+            Todo.objects.create(title=f"Todo {i}", body="Body", created_by=self.user)
+            for i in range(5)
+        ]
+        url = reverse("todo-changes")
+        cursor = self.client.get(url, {"page_size": 10}).data["cursor"]
+        now = timezone.now()
+        for i, todo in enumerate(todos):
+            Todo.objects.filter(pk=todo.pk).update(
+                expires_at=now + timedelta(milliseconds=5 - i)
+            )
+        time.sleep(0.01)
+
+        pages = []
+        while True:
+            response = self.client.get(url, {"since": cursor, "page_size": 2})
+            pages.append([todo["id"] for todo in response.data["changes"]])
+            cursor = response.data["cursor"]
+            if not response.data["has_more"]:
+                break
+        self.assertEqual(
+            pages,
+            [[todos[4].pk, todos[3].pk], [todos[2].pk, todos[1].pk], [todos[0].pk]],
+        )
+        response = self.client.get(url, {"since": cursor})
+        self.assertEqual(response.data["changes"], [])
+
+    def test_compact_todo_deletions_command(self):
+        Todo.objects.create(title="Old", body="Body", created_by=self.user).delete()
+        Todo.objects.create(title="New", body="Body", created_by=self.user).delete()
+        TodoDeletion.objects.filter(pk=TodoDeletion.objects.earliest("pk").pk).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        out = StringIO()
+        call_command("compact_todo_deletions", stdout=out)
+        self.assertIn("Compacted 1 tombstones", out.getvalue())
+        self.assertEqual(TodoDeletion.objects.count(), 1)
+
+    def test_archive_todos_moves_cold_todos(self):
+        old = timezone.now() - timedelta(days=100)
+        recent = timezone.now() - timedelta(days=1)
+        todos = {
+            name: Todo.objects.create(
+                title=name, body="Body", status=todo_status, created_by=self.user
+            )
+            for name, todo_status in [
+                ("old-completed", "completed"),
+                ("old-expired", "pending"),
+                ("recent-completed", "completed"),
+                ("old-pending", "pending"),
+            ]
+        }
+        Todo.objects.filter(title__startswith="old").update(updated_at=old)
+        Todo.objects.filter(title="recent-completed").update(updated_at=recent)
+        Todo.objects.filter(title="old-expired").update(expires_at=old)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("archive_todos", "--batch-size", "1", stdout=out)
+        self.assertIn("Archived 2 todos", out.getvalue())
+
+        archived_ids = {todos["old-completed"].pk, todos["old-expired"].pk}
+        self.assertEqual(
+            set(TodoDeletion.objects.values_list("todo_id", flat=True)), archived_ids
+        )
+        response = self.client.get(self.todo_list_url)
+        self.assertEqual(
+            {todo["title"] for todo in response.data["results"]},
+            {"recent-completed", "old-pending"},
+        )
+
+        response = self.client.get(reverse("todo-archived"), {"ordering": "created_at"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([todo["id"] for todo in results], sorted(archived_ids))
+        self.assertEqual(results[0]["status"], "completed")
+        self.assertEqual(results[0]["title"], "old-completed")
+        self.assertEqual(results[1]["status"], "expired")
+        self.assertIn("archived_at", results[0])
+
+        other = User.objects.create_user(email="other@example.com", password="x")
+        self.client.force_authenticate(other)
+        response = self.client.get(reverse("todo-archived"))
+        self.assertEqual(response.data["results"], [])
+
+    @override_settings(
+        REQUEST_PROFILING=dict(settings.REQUEST_PROFILING, ENABLED=True)
+    )
+    def test_profiling_headers_log_and_sampled_dumps(self):
+        Todo.objects.create(title="Profiled", body="Body", created_by=self.user)
+        with self.assertLogs("api.profiling", "INFO"):
+            response = self.client.get(self.todo_list_url)
+        self.assertNotIn("Server-Timing", response)
+
+        self.user.is_staff = True
+        self.user.save()
+        cache.clear()
+        with self.assertLogs("api.profiling", "INFO") as logs:
+            response = self.client.get(self.todo_list_url)
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "serialize;dur=", "render;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["path"], self.todo_list_url)
+        self.assertGreater(record["db_queries"], 0)
+        self.assertNotIn("dumps", record)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            config = dict(
+                settings.REQUEST_PROFILING,
+                SAMPLE_RATE=1,
+                TRACEMALLOC=True,
+                DUMP_DIR=tmp,
+            )
+            with override_settings(REQUEST_PROFILING=config):
+                with self.assertLogs("api.profiling", "INFO") as logs:
+                    self.client.get(self.todo_list_url, {"page_size": 1})
+            dumps = json.loads(logs.records[-1].getMessage())["dumps"]
+            self.assertEqual(
+                sorted(Path(path).suffix for path in dumps), [".prof", ".tracemalloc"]
+            )
+            pstats.Stats(dumps[0])
+
+    @override_settings(TODO_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_ndjson_and_csv(self):
+        past = timezone.now() - timedelta(days=1)
+        for i in range(5):
+            Todo.objects.create(title=f"Todo {i}", body="Body", created_by=self.user)
+        Todo.objects.filter(title="Todo 4").update(expires_at=past)
+        Todo.objects.create(title="Other", body="Body")
+        listed = self.client.get(self.todo_list_url, {"ordering": "created_at"})
+        url = reverse("todo-export")
+
+        response = self.client.get(url, {"format": "ndjson"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        content = b"".join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows, json.loads(json.dumps(listed.data["results"])))
+        self.assertEqual(rows[-1]["status"], "expired")
+
+        response = self.client.get(url, {"format": "csv", "status": "expired"})
+        self.assertIn('filename="todos.csv"', response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row["title"] for row in rows], ["Todo 4"])
+        expired = listed.data["results"][-1]
+        self.assertEqual(rows[0]["expires_at"], expired["expires_at"])
+
+    def test_export_errors_are_encoded_in_the_requested_format(self):
+        url = reverse("todo-export")
+        response = self.client.get(url, {"format": "ndjson", "status": "bogus"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("status", json.loads(response.content.decode().strip()))
+
+        response = self.client.get(url, {"format": "json"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url, {"format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        rows = list(csv.DictReader(StringIO(response.content.decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertIn("credentials", rows[0]["detail"])
+
+    @override_settings(TODO_IMPORT_BATCH_SIZE=2)
+    def test_import_ndjson_reports_line_errors(self):
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        lines = [
+            json.dumps(record)
+            for record in (
+                {"title": "One", "body": "Body"},
+                {"title": "Two", "body": "Body", "status": "done"},
+                {"title": "Three", "body": "Body", "expires_at": future},
+                {"title": "Four", "body": "Body", "status": "completed"},
+            )
+        ]
+        body = "\n".join(lines[:3] + ["", lines[3], "not json", ""])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("todo-import"), body, content_type="application/x-ndjson"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["imported"], 3)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual([e["line"] for e in response.data["errors"]], [2, 6])
+        self.assertIn("status", response.data["errors"][0]["errors"])
+        todos = Todo.objects.owned_by(self.user).order_by("pk")
+        self.assertEqual(
+            list(todos.values_list("title", "status")),
+            [("One", "pending"), ("Three", "pending"), ("Four", "completed")],
+        )
+
+        response = self.client.post(
+            reverse("todo-import"), "title", content_type="text/plain"
+        )
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_import_todos_command_reads_csv(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write('title,body,status,expires_at\n"Multi\nline",Body,,\nBad,,,\n')
+            f.flush()
+            out, err = StringIO(), StringIO()
+            call_command(
+                "import_todos", f.name, user=self.user.email, stdout=out, stderr=err
+            )
+        self.assertIn("Imported 1 todos (1 failed)", out.getvalue())
+        self.assertIn("line 4:", err.getvalue())
+        self.assertEqual(Todo.objects.get(created_by=self.user).title, "Multi\nline")
+
+
+class TodoStatsTests(AuthenticatedAPITestCase):
+    email = "stats@example.com"
+
+    def setUp(self):
+        super().setUp()
+        self.list_url = reverse("todo-list")
+        self.stats_url = reverse("todo-stats")
+
+    def counted(self):
+        rows = Todo.objects.filter(created_by=self.user).values_list("status")
+        counts = dict.fromkeys(TodoStats.STATUSES, 0)
+        for (todo_status,) in rows:
+            counts[todo_status] += 1
+        return {**counts, "total": sum(counts.values())}
+
+    def test_every_write_path_keeps_counters_in_sync(self):
+        self.assertEqual(self.client.get(self.stats_url).data["total"], 0)
+
+        first = self.client.post(self.list_url, {"title": "One", "body": "Body"}).data
+        second = self.client.post(self.list_url, {"title": "Two", "body": "Body"}).data
+        self.client.patch(
+            reverse("todo-detail", args=[first["id"]]), {"status": "in_progress"}
+        )
+        bulk = self.client.post(
+            reverse("todo-bulk"),
+            [{"title": f"Bulk {i}", "body": "Body"} for i in range(3)],
+            format="json",
+        ).data
+        self.client.patch(
+            reverse("todo-bulk"),
+            [{"id": bulk[0]["id"], "status": "completed"}],
+            format="json",
+        )
+        self.client.post(
+            reverse("todo-import"),
+            '{"title": "Imported", "body": "Body", "status": "completed"}\n',
+            content_type="application/x-ndjson",
+        )
+        Todo.objects.filter(pk=bulk[1]["id"]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        Todo.objects.expire_overdue()
+        self.client.delete(reverse("todo-detail", args=[second["id"]]))
+        self.client.delete(
+            reverse("todo-bulk"), {"ids": [bulk[2]["id"]]}, format="json"
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any("api_todo\"" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(
+            response.data,
+            {
+                "pending": 0,
+                "in_progress": 1,
+                "completed": 2,
+                "expired": 1,
+                "total": 4,
+            },
+        )
+        self.assertEqual(response.data, self.counted())
+
+    def test_stale_instances_move_the_stored_status(self):
+        todo = Todo.objects.create(
+            title="One",
+            body="Body",
+            created_by=self.user,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        first, second = Todo.objects.get(pk=todo.pk), Todo.objects.get(pk=todo.pk)
+        first.status = "completed"
+        first.save()
+        second.status = "in_progress"
+        second.save()
+        stale = Todo.objects.get(pk=todo.pk)
+        Todo.objects.filter(pk=todo.pk).expire_overdue(
+            timezone.now() + timedelta(days=365)
+        )
+        stale.status = "pending"
+        Todo.objects.bulk_update([stale], ["status"])
+
+        self.assertEqual(TodoStats.objects.drifted(), [])
+        self.assertEqual(self.client.get(self.stats_url).data, self.counted())
+
+    def test_rebuild_todo_stats_repairs_drift(self):
+        Todo.objects.create(title="One", body="Body", created_by=self.user)
+        Todo.objects.filter(created_by=self.user).update(status="completed")
+        with self.assertRaisesMessage(CommandError, str(self.user.pk)):
+            call_command("rebuild_todo_stats", "--check", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_todo_stats", stdout=out)
+        self.assertIn("Repaired todo stats for 1 users", out.getvalue())
+        self.assertEqual(self.client.get(self.stats_url).data, self.counted())
+        call_command("rebuild_todo_stats", "--check", stdout=out)
+
+
+class TodoCacheTests(AuthenticatedAPITestCase):
+    email = "cache@example.com"
+
+    def setUp(self):
+        super().setUp()
+        self.todo = Todo.objects.create(
+            title="Cached", body="Body", created_by=self.user, updated_by=self.user
+        )
+        self.list_url = reverse("todo-list")
+        self.detail_url = reverse("todo-detail", args=[self.todo.id])
+
+    def test_etag_not_modified_without_todo_queries(self):
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(any("api_todo" in q["sql"] for q in ctx.captured_queries))
+
+    @override_settings(WEB_CONCURRENCY=2, TODO_RESPONSE_CACHING=False)
+    def test_several_workers_without_shared_cache_do_not_cache(self):
+        self.assertEqual([w.id for w in check_worker_caches(None)], ["api.W001"])
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+        Todo.objects.filter(pk=self.todo.pk).update(title="Changed elsewhere")
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["title"], "Changed elsewhere")
+
+    def test_cached_read_skips_database(self):
+        first = self.client.get(self.detail_url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.detail_url)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertFalse(any("api_todo" in q["sql"] for q in ctx.captured_queries))
+
+    def test_write_changes_version(self):
+        etag = self.client.get(self.list_url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.detail_url, {"title": "Changed"}, format="json")
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["results"][0]["title"], "Changed")
+
+    def test_expiry_changes_version(self):
+        expires_at = timezone.now() + timedelta(minutes=5)
+        Todo.objects.filter(pk=self.todo.pk).update(expires_at=expires_at)
+        etag = self.client.get(self.list_url)["ETag"]
+        self.assertEqual(self.client.get(self.list_url)["ETag"], etag)
+
+        # Simulate the clock passing expires_at without any write.
+        Todo.objects.filter(pk=self.todo.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        with mock.patch("api.cache.time.time", return_value=expires_at.timestamp()):
+            response = self.client.get(self.list_url)
+
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["results"][0]["status"], "expired")
+
+
+class AsyncTodoTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="asynctodo@example.com", password="strongpassword123"
+        )
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.list_url = reverse("async-todo-list")
+
+    def test_async_crud(self):
+        response = self.client.post(
+            self.list_url, {"title": "Async", "body": "Body"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        todo_id = response.json()["id"]
+        todo = Todo.objects.get(pk=todo_id)
+        self.assertEqual(todo.created_by, self.user)
+
+        detail_url = reverse("async-todo-detail", args=[todo_id])
+        response = self.client.patch(detail_url, {"status": "completed"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["status"], "completed")
+
+        response = self.client.get(self.list_url, {"status": "completed"})
+        self.assertEqual([t["id"] for t in response.json()["results"]], [todo_id])
+
+        response = self.client.delete(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+
+    def test_async_validation_and_auth_errors(self):
+        response = self.client.post(
+            self.list_url,
+            {"title": "Bad", "body": "Body", "status": "nope"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("status", response.json())
+
+        other = Todo.objects.create(title="Other", body="Body")
+        response = self.client.get(reverse("async-todo-detail", args=[other.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.credentials()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TodoEventStreamTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="events@example.com", password="strongpassword123"
+        )
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.url = reverse("todo-events")
+
+    @override_settings(TODO_EVENTS_QUEUE_SIZE=2)
+    async def test_stream_pushes_events_and_overflows(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+
+        todos_changed.send(Todo, user_id=self.user.pk, action="create", ids=[7])
+        todos_changed.send(Todo, user_id=self.user.pk + 1, action="create", ids=[8])
+        self.assertEqual(
+            await anext(stream), b'event: create\ndata: {"ids": [7]}\n\n'
+        )
+
+        for pk in range(4):
+            get_broker().publish(self.user.pk, {"event": "update", "ids": [pk]})
+        await asyncio.sleep(0)
+        self.assertEqual(await anext(stream), b"event: overflow\ndata: {}\n\n")
+
+        get_broker().publish(self.user.pk, {"event": "delete", "ids": [1]})
+        self.assertEqual(
+            await anext(stream), b'event: delete\ndata: {"ids": [1]}\n\n'
+        )
+        # A client disconnect cancels the task that is waiting for events.
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertNotIn(self.user.pk, get_broker().subscriptions)
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TodoBulkTests(AuthenticatedAPITestCase):
+    email = "bulk@example.com"
+
+    def setUp(self):
+        super().setUp()
+        self.bulk_url = reverse("todo-bulk")
+
+    def test_bulk_create(self):
+        future_time = (timezone.now() + timedelta(days=1)).isoformat()
+        data = [
+            {"title": f"Todo {i}", "body": "Body", "expires_at": future_time}
+            for i in range(3)
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.bulk_url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(t["id"] for t in response.data))
+        self.assertEqual(Todo.objects.filter(created_by=self.user).count(), 3)
+        inserts = [
+            q
+            for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "api_todo"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        data = [
+            {"title": "Good", "body": "Body"},
+            {"title": "Bad", "body": "Body", "status": "unknown"},
+        ]
+
+        response = self.client.post(self.bulk_url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("status", response.data[1])
+        self.assertEqual(Todo.objects.count(), 0)
+
+    def test_bulk_update_applies_status_rules(self):
+        past_time = timezone.now() - timedelta(days=1)
+        completed = Todo.objects.create(
+            title="Done", body="Body", status="completed", created_by=self.user
+        )
+        overdue = Todo.objects.create(title="Late", body="Body", created_by=self.user)
+        Todo.objects.filter(pk=overdue.pk).update(expires_at=past_time)
+        other = Todo.objects.create(title="Other", body="Body")
+
+        response = self.client.patch(
+            self.bulk_url,
+            [
+                {"id": completed.id, "status": "expired"},
+                {"id": overdue.id, "title": "Still late"},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        completed.refresh_from_db()
+        overdue.refresh_from_db()
+        self.assertEqual(completed.status, "completed")
+        self.assertEqual(overdue.status, "expired")
+        self.assertEqual(overdue.title, "Still late")
+        self.assertEqual(overdue.updated_by, self.user)
+
+        response = self.client.patch(
+            self.bulk_url,
+            [{"id": other.id, "title": "Not mine"}, {"id": completed.id}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data[0])
+
+    def test_bulk_delete(self):
+        mine = Todo.objects.create(title="Mine", body="Body", created_by=self.user)
+        other = Todo.objects.create(title="Other", body="Body")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.delete(
+                self.bulk_url, {"ids": [mine.id, other.id]}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"deleted": [mine.id], "not_found": [other.id]})
+        self.assertTrue(Todo.objects.filter(pk=other.pk).exists())
+        deletes = [q for q in ctx.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+
+
+class SchemaTests(APITestCase):
+    def test_precomputed_schema_is_served_with_etag(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            schema_file = Path(tmp) / "openapi.json"
+            call_command("generate_api_schema", output=schema_file, stdout=StringIO())
+            with override_settings(API_SCHEMA_FILE=schema_file):
+                response = self.client.get(reverse("schema-json"))
+                self.assertEqual(response.content, schema_file.read_bytes())
+                self.assertIn("/todos/changes/", response.json()["paths"])
+
+                response = self.client.get(
+                    reverse("schema-json"), HTTP_IF_NONE_MATCH=response["ETag"]
+                )
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(reverse("schema-swagger-ui"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(reverse("schema-json"), response.content.decode())
+
+
+class MetricsTests(AuthenticatedAPITestCase):
+    email = "metrics@example.com"
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_route_latency_cache_and_expiry_metrics(self):
+        route = {"route": "todo.list", "method": "GET"}
+        requests = self.sample("api_request_duration_seconds_count", **route)
+        ok = self.sample("api_responses_total", status="200", **route)
+        queries = self.sample("api_db_queries_total", **route)
+        cache_hit = {"cache": "todo_response", "result": "hit"}
+        hits = self.sample("api_cache_requests_total", **cache_hit)
+        expired = self.sample("api_todos_expired_total")
+
+        self.client.get(reverse("todo-list"))
+        self.client.get(reverse("todo-list"))
+        todo = Todo.objects.create(title="Overdue", body="Body", created_by=self.user)
+        Todo.objects.filter(pk=todo.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.expire_overdue()
+
+        self.assertEqual(
+            self.sample("api_request_duration_seconds_count", **route), requests + 2
+        )
+        self.assertEqual(
+            self.sample("api_responses_total", status="200", **route), ok + 2
+        )
+        self.assertGreater(self.sample("api_db_queries_total", **route), queries)
+        self.assertEqual(self.sample("api_cache_requests_total", **cache_hit), hits + 1)
+        self.assertEqual(self.sample("api_todos_expired_total"), expired + 1)
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'api_request_duration_seconds_bucket{le="0.005",method="GET",'
+            'route="todo.list"}',
+            response.content.decode(),
+        )
+
+    def test_login_errors_are_counted_by_status(self):
+        labels = {"route": "login", "method": "POST", "status": "400"}
+        before = self.sample("api_responses_total", **labels)
+        self.client.post(
+            reverse("login"),
+            {"email": "metrics@example.com", "password": "wrong-password"},
+            format="json",
+        )
+        self.assertEqual(self.sample("api_responses_total", **labels), before + 1)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_token_required_when_configured(self):
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-secret"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ReplicaTests(AuthenticatedAPITestCase):
+    email = "replica@example.com"
+
+    def test_pool_picks_healthy_replicas_by_weight(self):
+        pool = ReplicaPool({"replica_0": 3, "replica_1": 1}, 0, 5)
+        with mock.patch.object(ReplicaPool, "check", return_value=True):
+            with mock.patch("api.replicas.random.choices") as choices:
+                choices.return_value = ["replica_0"]
+                self.assertEqual(pool.choose(), "replica_0")
+        choices.assert_called_once_with(["replica_0", "replica_1"], [3, 1])
+
+        with mock.patch.object(
+            ReplicaPool, "check", side_effect=lambda alias: alias == "replica_1"
+        ):
+            self.assertEqual(pool.choose(), "replica_1")
+        with mock.patch.object(ReplicaPool, "check", return_value=False):
+            self.assertIsNone(pool.choose())
+
+    @override_settings(DATABASE_REPLICAS={"replica_0": 1})
+    def test_router_reads_from_replica_until_user_writes(self):
+        router = ReplicaRouter()
+        with mock.patch("api.replicas.get_pool") as get_pool:
+            get_pool.return_value.choose.return_value = "replica_0"
+            token = use_replica(self.user)
+            self.assertEqual(router.db_for_read(Todo), "replica_0")
+            self.assertEqual(router.db_for_write(Todo), "default")
+            release_replica(token)
+            self.assertIsNone(router.db_for_read(Todo))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Todo.objects.create(title="Write", body="Body", created_by=self.user)
+            self.assertIsNone(use_replica(self.user))
+        self.assertFalse(router.allow_migrate("replica_0", "api"))
+        self.assertTrue(router.allow_migrate("default", "api"))
+
+    @override_settings(DATABASE_REPLICAS={"default": 1})
+    def test_only_safe_todo_requests_use_replicas(self):
+        with mock.patch("api.replicas.get_pool") as get_pool:
+            choose = get_pool.return_value.choose
+            choose.return_value = "default"
+            self.client.get(reverse("todo-list"))
+            self.assertEqual(choose.call_count, 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("todo-list"), {"title": "New", "body": "Body"}
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            detail = self.client.get(reverse("todo-detail", args=[response.data["id"]]))
+            self.assertEqual(detail.status_code, status.HTTP_200_OK)
+            self.assertEqual(choose.call_count, 1)
+
+    @override_settings(
+        DATABASE_REPLICAS={"replica_0": 1},
+        DATABASE_ROUTERS=["api.replicas.ReplicaRouter"],
+    )
+    def test_export_streams_from_the_pinned_replica(self):
+        with (
+            mock.patch("api.replicas.get_pool") as get_pool,
+            mock.patch("api.views.stream_export", return_value=iter([])) as stream,
+        ):
+            get_pool.return_value.choose.return_value = "replica_0"
+            response = self.client.get(reverse("todo-export"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(Todo.objects.db, "default")
+            self.assertEqual(stream.call_args.args[0].db, "replica_0")
+
+
+class ShardTests(AuthenticatedAPITestCase):
+    email = "shard@example.com"
+
+    @override_settings(TODO_SHARDS=["shard_0", "shard_1"])
+    def test_directory_and_router_place_todos_by_owner(self):
+        self.assertEqual(shard_for(self.user.pk), hashed_shard(self.user.pk))
+        UserShard.objects.create(user=self.user, shard="shard_0")
+        cache.clear()
+        self.assertEqual(shard_for(self.user.pk), "shard_0")
+
+        router = ShardRouter()
+        todo = Todo(title="New", body="Body", created_by=self.user)
+        self.assertEqual(router.db_for_write(Todo, instance=todo), "shard_0")
+        todo = Todo.objects.using("default").create(title="Saved", body="Body")
+        self.assertEqual(router.db_for_write(Todo, instance=todo), "default")
+        self.assertIsNone(router.db_for_read(Todo))
+        self.assertIsNone(router.db_for_read(User))
+        self.assertEqual(router.db_for_read(UserShard), "default")
+
+    @override_settings(TODO_SHARDS=["default"], TODO_SHARD_DIRECTORY_TIMEOUT=5)
+    def test_writes_are_refused_while_moving(self):
+        Todo.objects.create(title="Todo", body="Body", created_by=self.user)
+        UserShard.objects.create(user=self.user, shard="default", moving_to="shard_1")
+        cache.clear()
+
+        response = self.client.get(reverse("todo-list"))
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.post(reverse("todo-list"), {"title": "t", "body": "b"})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertEqual(response.data["detail"].code, "shard_moving")
+
+
+class ShardMoveTests(AuthenticatedAPITestCase):
+    shards = ["shard_0", "shard_1"]
+    # Test runners only set up configured databases; the rest are added below.
+    databases = {"default", *(alias for alias in shards if alias in connections)}
+    email = "mover@example.com"
+
+    @classmethod
+    def setUpClass(cls):
+        # Shards on the first two TODO_SHARD_URLS, or on two in-memory
+        # databases. Sharding is on while they are migrated, so each gets its
+        # id range.
+        cls.enterClassContext(
+            override_settings(
+                TODO_SHARDS=cls.shards,
+                DATABASE_ROUTERS=["api.shards.ShardRouter"],
+                TODO_SHARD_DIRECTORY_TIMEOUT=0,
+            )
+        )
+        cls.enterClassContext(sqlite_test_databases(*cls.shards))
+        cls.databases = {"default", *cls.shards}
+        super().setUpClass()
+
+    def test_move_user_keeps_endpoints_unchanged(self):
+        source = shard_for(self.user.pk)
+        target = next(alias for alias in settings.TODO_SHARDS if alias != source)
+        response = self.client.post(
+            reverse("todo-bulk"),
+            [{"title": f"Todo {n}", "body": "Body"} for n in range(3)],
+            format="json",
+        )
+        ids = [todo["id"] for todo in response.data]
+        start = (settings.TODO_SHARDS.index(source) + 1) * ID_RANGE
+        self.assertTrue(all(start < pk < start + ID_RANGE for pk in ids))
+        self.client.delete(
+            reverse("todo-bulk"), {"ids": ids[:1]}, format="json"
+        )
+        self.assertEqual(Todo.objects.using(source).count(), 2)
+
+        move_user(self.user.pk, target)
+
+        self.assertEqual(shard_for(self.user.pk), target)
+        self.assertFalse(Todo.objects.using(source).exists())
+        self.assertFalse(TodoDeletion.objects.using(source).exists())
+        self.assertEqual(TodoDeletion.objects.using(target).count(), 1)
+        response = self.client.get(reverse("todo-list"))
+        self.assertEqual([todo["id"] for todo in response.data["results"]], ids[:0:-1])
+        response = self.client.get(reverse("todo-stats"))
+        self.assertEqual(response.data["pending"], 2)
+        response = self.client.patch(
+            reverse("todo-detail", args=[ids[1]]), {"status": "completed"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Todo.objects.using(target).get(pk=ids[1]).status, "completed")
+
+    def test_maintenance_covers_users_left_on_default(self):
+        self.assertEqual(all_shards(), self.shards)
+        past = timezone.now() - timedelta(days=1)
+        legacy = User.objects.create_user(email="legacy@example.com", password="x")
+        # Written before sharding was turned on, with no directory row.
+        Todo.objects.using("default").create(
+            title="Legacy", body="Body", expires_at=past, created_by=legacy
+        )
+        Todo.objects.create(
+            title="Sharded", body="Body", expires_at=past, created_by=self.user
+        )
+        self.assertEqual(all_shards(), [*self.shards, "default"])
+
+        call_command("expire_todos", stdout=StringIO())
+
+        legacy_todo = Todo.objects.using("default").get(created_by=legacy)
+        self.assertEqual(legacy_todo.status, "expired")
+        sharded = on_shard(Todo.objects.filter(created_by=self.user), self.user.pk)
+        self.assertEqual(sharded.get().status, "expired")
+
+
+class AdminTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser("admin@example.com", "strongpass123")
+        self.owner = User.objects.create_user("owner@example.com", "strongpass123")
+        self.client.force_login(self.admin)
+        now = timezone.now()
+        self.todos = Todo.objects.bulk_create(
+            Todo(
+                title=f"Todo {n}",
+                body="Body",
+                status="completed" if n == 0 else "pending",
+                expires_at=now + timedelta(hours=2 * n - 3),
+                created_by=self.owner if n % 2 else self.admin,
+            )
+            for n in range(5)
+        )
+        self.url = reverse("admin:api_todo_changelist")
+
+    def ids(self, response):
+        return [todo.pk for todo in response.context["cl"].result_list]
+
+    def next_page(self, response):
+        return self.client.get(self.url + response.context["cl"].next_page_url)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_change_list_pages_by_keyset_with_estimated_count(self):
+        newest_first = sorted((todo.pk for todo in self.todos), reverse=True)
+        with mock.patch.object(TodoAdmin, "list_per_page", 2):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(self.url)
+            self.assertEqual(self.ids(response), newest_first[:2])
+            self.assertContains(response, "~3 todos")
+            self.assertFalse(
+                [q for q in ctx.captured_queries if "OFFSET" in q["sql"]]
+            )
+            queries = len(ctx.captured_queries)
+
+            response = self.next_page(response)
+            self.assertEqual(self.ids(response), newest_first[2:4])
+            response = self.next_page(response)
+            self.assertEqual(self.ids(response), newest_first[4:])
+            self.assertIsNone(response.context["cl"].next_page_url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["cl"].result_list), 5)
+        self.assertEqual(len(ctx.captured_queries), queries)
+
+    def test_filters_use_status_owner_and_expiry(self):
+        response = self.client.get(self.url, {"status": "completed"})
+        self.assertEqual(self.ids(response), [self.todos[0].pk])
+        response = self.client.get(self.url, {"owner": self.owner.pk})
+        self.assertEqual(self.ids(response), [self.todos[3].pk, self.todos[1].pk])
+        response = self.client.get(self.url, {"expiry": "overdue"})
+        self.assertEqual(self.ids(response), [self.todos[1].pk])
+        response = self.client.get(self.url, {"expiry": "day"})
+        self.assertEqual(
+            self.ids(response), [todo.pk for todo in self.todos[4:1:-1]]
+        )
+
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "api",
+                "model_name": "todo",
+                "field_name": "created_by",
+                "term": "own",
+            },
+        )
+        self.assertEqual(
+            [result["text"] for result in response.json()["results"]],
+            ["owner@example.com"],
+        )
+
+    @override_settings(ADMIN_ACTION_BATCH_SIZE=2)
+    def test_batched_actions_keep_stats_and_tombstones(self):
+        def run(action, **data):
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(
+                    self.url, {"action": action, "_selected_action": [0], **data}
+                )
+
+        run("expire", select_across=1)
+        self.assertEqual(
+            Todo.objects.filter(status="expired").count(), 4
+        )
+        run("mark_completed", _selected_action=[self.todos[1].pk])
+        self.assertEqual(Todo.objects.get(pk=self.todos[1].pk).status, "completed")
+        run("delete_todos", select_across=1)
+        self.assertFalse(Todo.objects.exists())
+        self.assertEqual(TodoDeletion.objects.count(), 5)
+        self.assertEqual(TodoStats.objects.drifted(), [])
+        self.assertNotIn("delete_selected", self.client.get(self.url).content.decode())
+
+    def test_user_admin_searches_email_prefix_and_sets_passwords(self):
+        response = self.client.get(reverse("admin:api_user_changelist"), {"q": "OWN"})
+        self.assertEqual(self.ids(response), [self.owner.pk])
+
+        change = reverse("admin:api_user_change", args=[self.owner.pk])
+        self.assertContains(self.client.get(change), "Reset password")
+        response = self.client.post(
+            reverse("admin:auth_user_password_change", args=[self.owner.pk]),
+            {"password1": "newstrongpass456", "password2": "newstrongpass456"},
+        )
+        self.assertRedirects(response, change)
+        self.owner.refresh_from_db()
+        self.assertTrue(self.owner.check_password("newstrongpass456"))
+
+        response = self.client.post(
+            reverse("admin:api_user_add"),
+            {
+                "email": "added@example.com",
+                "usable_password": "true",
+                "password1": "addedstrongpass789",
+                "password2": "addedstrongpass789",
+            },
+        )
+        added = User.objects.get(email="added@example.com")
+        self.assertRedirects(
+            response, reverse("admin:api_user_change", args=[added.pk])
+        )
+        self.assertTrue(added.check_password("addedstrongpass789"))
+
+
+class BatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("batch@example.com", "strongpass123")
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.todo = Todo.objects.create(
+            title="Existing", body="Body", created_by=self.user
+        )
+        self.url = reverse("batch")
+        self.list_path = reverse("todo-list")
+
+    def batch(self, requests, **data):
+        with self.captureOnCommitCallbacks(execute=True) as self.callbacks:
+            return self.client.post(
+                self.url, {"requests": requests, **data}, format="json"
+            )
+
+    def create(self, title):
+        body = {"title": title, "body": "Body"}
+        return {"method": "POST", "path": self.list_path, "body": body}
+
+    def test_runs_sub_requests_in_order_authenticating_once(self):
+        detail = reverse("todo-detail", args=[self.todo.pk])
+        with mock.patch.object(
+            CachedJWTAuthentication,
+            "get_validated_token",
+            autospec=True,
+            side_effect=CachedJWTAuthentication.get_validated_token,
+        ) as validate:
+            response = self.batch(
+                [
+                    self.create("New"),
+                    {"method": "PATCH", "path": detail, "body": {"title": "Renamed"}},
+                    {"method": "GET", "path": f"http://testserver{self.list_path}"},
+                    {"method": "DELETE", "path": detail},
+                    {"method": "GET", "path": detail},
+                ]
+            )
+        self.assertEqual(validate.call_count, 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = response.data["responses"]
+        self.assertEqual(
+            [sub["status"] for sub in responses], [201, 200, 200, 204, 404]
+        )
+        self.assertEqual(responses[1]["body"]["title"], "Renamed")
+        self.assertEqual(
+            [todo["title"] for todo in responses[2]["body"]["results"]],
+            ["New", "Renamed"],
+        )
+        self.assertIn("ETag", responses[2]["headers"])
+        self.assertNotIn("Content-Type", responses[2]["headers"])
+        self.assertEqual(
+            list(Todo.objects.values_list("title", flat=True)), ["New"]
+        )
+
+    def test_atomic_batch_reads_its_writes_and_rolls_back_on_error(self):
+        list_request = {"method": "GET", "path": self.list_path}
+        # Caches the list under the current version.
+        self.batch([list_request])
+
+        response = self.batch([self.create("Kept"), list_request], atomic=True)
+        self.assertTrue(response.data["committed"])
+        self.assertEqual(len(response.data["responses"][1]["body"]["results"]), 2)
+
+        response = self.batch(
+            [self.create("Dropped"), self.create(""), list_request], atomic=True
+        )
+        self.assertFalse(response.data["committed"])
+        self.assertEqual(
+            [sub["status"] for sub in response.data["responses"]], [201, 400]
+        )
+        self.assertFalse(Todo.objects.filter(title="Dropped").exists())
+        self.assertEqual(self.callbacks, [])
+        self.assertEqual(TodoStats.objects.drifted(), [])
+
+    def test_limits(self):
+        response = self.batch([{"method": "GET", "path": self.list_path}] * 21)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        refused = (
+            self.url,
+            reverse("login"),
+            reverse("signup"),
+            reverse("token-refresh"),
+            reverse("token-rotate"),
+            reverse("async-todo-list"),
+            "/admin/",
+            "/nowhere/",
+        )
+        for path in refused:
+            response = self.batch([{"method": "GET", "path": path}])
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with override_settings(BATCH_MAX_BYTES=100):
+            response = self.batch([self.create("x" * 100)])
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        response = self.batch(
+            [{"method": "GET", "path": reverse("todo-export")}], atomic=True
+        )
+        self.assertEqual(
+            response.data["responses"][0]["status"], status.HTTP_406_NOT_ACCEPTABLE
+        )
+
+    def test_sub_requests_cannot_set_host_proxy_or_credential_headers(self):
+        for name in ("Host", "X-Forwarded-Host", "x-forwarded-proto", "Cookie"):
+            response = self.batch(
+                [{"method": "GET", "path": self.list_path, "headers": {name: "x"}}]
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(name, str(response.data["requests"][0]["headers"]))
+
+        response = self.batch(
+            [
+                {
+                    "method": "GET",
+                    "path": self.list_path,
+                    "headers": {"Accept-Language": "de"},
+                }
+            ]
+        )
+        self.assertEqual(response.data["responses"][0]["status"], status.HTTP_200_OK)
+
+
 class TodoPermissionTests(APITestCase):
     def test_unauthenticated_access_denied(self):
         response = self.client.get(reverse("todo-list"))
@@ -168,3 +1860,56 @@ class TodoPermissionTests(APITestCase):
         }
         response = self.client.post(reverse("todo-list"), data, format="json")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_percentiles_use_the_nearest_rank(self):
+        values = [n / 1000 for n in range(100, 0, -1)]
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 95), 0.095)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile(values, 100), 0.1)
+        self.assertEqual(percentile(values, 0), 0.001)
+        self.assertEqual(percentile([0.2, 0.1, 0.3], 50), 0.2)
+        self.assertIsNone(percentile([], 95))
+        self.assertEqual(
+            latency_summary([0.01, 0.03, 0.02]),
+            {
+                "count": 3,
+                "p50_ms": 20.0,
+                "p95_ms": 30.0,
+                "p99_ms": 30.0,
+                "max_ms": 30.0,
+            },
+        )
+
+    def test_compare_flags_only_changes_beyond_the_thresholds(self):
+        def report(p95, rps, queries):
+            return {
+                "list": {
+                    "latency": {"p95_ms": p95},
+                    "requests_per_s": rps,
+                    "queries_per_request": queries,
+                }
+            }
+
+        baseline = report(100, 200, 3)
+        rows, regressions = compare(baseline, report(110, 180, 3), 0.1, 0.1, 0)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(regressions, [])
+
+        _, regressions = compare(baseline, report(110.5, 179, 3.5), 0.1, 0.1, 0)
+        self.assertEqual(
+            [metric for _, metric, _, _ in regressions],
+            ["p95_ms", "requests_per_s", "queries_per_request"],
+        )
+        _, regressions = compare(baseline, report(100, 200, 3.5), 0.1, 0.1, 0.5)
+        self.assertEqual(regressions, [])
+
+        rows, _ = compare(baseline, report(None, 200, 3), 0.1, 0.1, 0)
+        self.assertEqual(
+            [metric for _, metric, *_ in rows],
+            ["requests_per_s", "queries_per_request"],
+        )
+        rows, _ = compare(baseline, {"other": baseline["list"]}, 0.1, 0.1, 0)
+        self.assertEqual(rows, [])
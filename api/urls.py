@@ -1,10 +1,38 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import TodoViewSet, RegisterView, LoginView
+from .async_views import (
+    AsyncLoginView,
+    AsyncRegisterView,
+    AsyncTodoDetailView,
+    AsyncTodoListView,
+    TodoEventStreamView,
+)
+from .views import (
+    BatchView,
+    TodoViewSet,
+    RegisterView,
+    LoginView,
+    LogoutView,
+    TokenRefreshView,
+    TokenRotateView,
+)
 
 urlpatterns = [
     path("auth/signup/", RegisterView.as_view(), name="signup"),
     path("auth/login/", LoginView.as_view(), name="login"),
+    path("auth/refresh/", TokenRefreshView.as_view(), name="token-refresh"),
+    path("auth/rotate/", TokenRotateView.as_view(), name="token-rotate"),
+    path("auth/logout/", LogoutView.as_view(), name="logout"),
+    path("auth/async/signup/", AsyncRegisterView.as_view(), name="async-signup"),
+    path("auth/async/login/", AsyncLoginView.as_view(), name="async-login"),
+    path("async/todos/", AsyncTodoListView.as_view(), name="async-todo-list"),
+    path(
+        "async/todos/<int:pk>/",
+        AsyncTodoDetailView.as_view(),
+        name="async-todo-detail",
+    ),
+    path("events/todos/", TodoEventStreamView.as_view(), name="todo-events"),
+    path("batch/", BatchView.as_view(), name="batch"),
 ]
 router = DefaultRouter()
 router.register(r"todos", TodoViewSet, basename="todo")
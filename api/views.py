@@ -1,17 +1,54 @@
+import codecs
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import (
+    ParseError,
+    PermissionDenied,
+    UnsupportedMediaType,
+)
+from rest_framework.generics import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Todo
-from django.utils import timezone
-from drf_yasg.utils import swagger_auto_schema
+from .batch import check_batch_size, in_atomic_batch, run_batch
+from .cache import TodoResponseCache
+from .export import stream_export
+from .filters import TodoFilterBackend
+from .importer import TodoImporter
+from .metrics import record_cache
+from .models import Todo, TodoArchive, TodoStats
+from .pagination import KeysetPagination
+from .profiling import profile_timer
+from .renderers import CSVRenderer, NDJSONRenderer
+from .replicas import release_replica, use_replica
+from .revocation import revoke
+from .shards import check_writable, on_shard
+from .rows import TodoRows, format_datetime
+from .signals import notify_todos_changed
+from .sync import TodoChanges, decode_cursor
+from .docs import swagger_auto_schema
 
 
-from .serializers import RegisterSerializer, LoginSerializer, TodoSerializer
+from .serializers import (
+    BatchSerializer,
+    RegisterSerializer,
+    LoginSerializer,
+    RefreshTokenSerializer,
+    TodoSerializer,
+    TodoBulkDeleteSerializer,
+)
 
 
 class RegisterView(APIView):
     serializer_class = RegisterSerializer
+    batchable = False
 
     @swagger_auto_schema(request_body=RegisterSerializer)
     def post(self, request):
@@ -32,6 +69,8 @@ class RegisterView(APIView):
 
 
 class LoginView(APIView):
+    batchable = False
+
     @swagger_auto_schema(request_body=LoginSerializer)
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -49,10 +88,99 @@ class LoginView(APIView):
         )
 
 
+class TokenView(APIView):
+    # An expired access token in the header must not block refreshing.
+    authentication_classes = []
+    batchable = False
+
+    def get_authenticate_header(self, request):
+        # Keeps invalid refresh tokens a 401 rather than a 403.
+        return f'{api_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+
+
+class TokenRefreshView(TokenView):
+    """A new access token for a refresh token, without logging in again."""
+
+    @swagger_auto_schema(request_body=RefreshTokenSerializer)
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data["refresh"]
+        return Response({"access": str(refresh.access_token)})
+
+
+class TokenRotateView(TokenView):
+    """A new access and refresh token pair; the old refresh token is revoked."""
+
+    @swagger_auto_schema(request_body=RefreshTokenSerializer)
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data["refresh"]
+        if not revoke(refresh):
+            # Rotated concurrently; only one rotation may get a new pair.
+            raise InvalidToken("Token has been revoked")
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        return Response({"access": str(refresh.access_token), "refresh": str(refresh)})
+
+
+class LogoutView(APIView):
+    """Revoke the access token used and, if given, the user's refresh token."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(request_body=RefreshTokenSerializer)
+    def post(self, request):
+        if "refresh" in request.data:
+            serializer = RefreshTokenSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            refresh = serializer.validated_data["refresh"]
+            if str(refresh[api_settings.USER_ID_CLAIM]) != str(request.user.pk):
+                raise PermissionDenied("The refresh token belongs to another user.")
+            revoke(refresh)
+        revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BatchView(APIView):
+    """Run several API requests in one; see ``api.batch``."""
+
+    permission_classes = [permissions.IsAuthenticated]
+    batchable = False
+
+    @swagger_auto_schema(request_body=BatchSerializer)
+    def post(self, request):
+        check_batch_size(request)
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(run_batch(request, **serializer.validated_data))
+
+
 class TodoViewSet(viewsets.ModelViewSet):
     queryset = Todo.objects.all()
     serializer_class = TodoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [TodoFilterBackend]
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            # An atomic batch reads its own writes, which replicas lack.
+            if not in_atomic_batch(request):
+                self.replica_token = use_replica(request.user)
+        else:
+            check_writable(request.user)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.replica_token is not None:
+                release_replica(self.replica_token)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user, updated_by=self.request.user)
@@ -60,14 +188,245 @@ class TodoViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(updated_by=self.request.user)
 
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        instance.delete()
+        notify_todos_changed(Todo, self.request.user.pk, "delete", [pk])
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.list_rows, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(self.retrieve_row, request, *args, **kwargs)
+
+    def list_rows(self, request, *args, **kwargs):
+        """
+        ``list()`` over ``values()`` dicts encoded by ``TodoRows``, producing
+        the serializer's output (or the ``?fields=`` subset) without building
+        model instances or DRF fields per row.
+        """
+        rows = TodoRows.from_request(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        queryset = rows.values(
+            queryset, "id", *paginator.get_ordering_fields(queryset)
+        )
+        page = self.paginate_queryset(queryset)
+        with profile_timer(request, "serialize"):
+            data = [rows.encode(row) for row in (queryset if page is None else page)]
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve_row(self, request, *args, **kwargs):
+        rows = TodoRows.from_request(request)
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        row = get_object_or_404(rows.values(self.get_queryset()), **lookup)
+        with profile_timer(request, "serialize"):
+            return Response(rows.encode(row))
+
+    def cached_response(self, view, request, *args, **kwargs):
+        """
+        Serve reads from the per-user versioned cache.
+
+        A matching ``If-None-Match`` is answered with 304 from the version
+        alone, without touching the todo table.
+        """
+        if in_atomic_batch(request):
+            # Writes earlier in the batch have not bumped the version yet.
+            return view(request, *args, **kwargs)
+        if not settings.TODO_RESPONSE_CACHING:
+            return view(request, *args, **kwargs)
+        cached = TodoResponseCache(request)
+        if cached.matches(request):
+            record_cache("todo_response", "not_modified")
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": cached.etag}
+            )
+
+        data = cached.get()
+        record_cache("todo_response", "miss" if data is None else "hit")
+        if data is not None:
+            response = Response(data)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached.set(response.data)
+        response["ETag"] = cached.etag
+        return response
+
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Todo.objects.none()
 
-        queryset = Todo.objects.filter(created_by=self.request.user)
-        now = timezone.now()
-        for todo in queryset:
-            if todo.expires_at and todo.expires_at < now and todo.status != "completed":
-                todo.status = "expired"
-                todo.save()
-        return queryset
+        return Todo.objects.owned_by(self.request.user).with_effective_status()
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        kwargs.update(
+            many=True, allow_empty=False, max_length=settings.TODO_BULK_MAX_ITEMS
+        )
+        return self.get_serializer(*args, **kwargs)
+
+    @action(detail=False, methods=["get"], url_path="changes")
+    def changes(self, request):
+        """
+        Todos created, updated or expired since the ``?since=`` cursor, the ids
+        deleted since then, and the cursor for the next sync.
+        """
+        since = request.query_params.get("since")
+        cursor = decode_cursor(since) if since else None
+        rows = TodoRows.from_request(request)
+        queryset = rows.values(
+            self.get_queryset(), "id", "updated_at", "expires_at"
+        )
+        page_size = self.paginator.get_page_size(request)
+        data = TodoChanges(request.user, page_size).get(queryset, cursor)
+        with profile_timer(request, "serialize"):
+            data["changes"] = [rows.encode(row) for row in data["changes"]]
+        return Response(data)
+
+    @action(detail=False, methods=["get"], url_path="stats")
+    def stats(self, request):
+        """
+        The user's todo counts by status, read from ``TodoStats`` with a single
+        primary key lookup. Overdue todos count as expired once the expiry
+        sweep has persisted their status.
+        """
+        counts = (
+            on_shard(TodoStats.objects.filter(user=request.user), request.user.pk)
+            .values(*TodoStats.STATUSES)
+            .first()
+        ) or dict.fromkeys(TodoStats.STATUSES, 0)
+        return Response({**counts, "total": sum(counts.values())})
+
+    @action(detail=False, methods=["get"], url_path="archived")
+    def archived(self, request):
+        """
+        Todos moved to the archive by ``archive_todos``, keyset paginated like
+        the todo list, with ``archived_at`` added to each todo.
+        """
+        return self.cached_response(self.archived_rows, request)
+
+    def archived_rows(self, request):
+        rows = TodoRows.from_request(request)
+        queryset = on_shard(
+            TodoArchive.objects.filter(created_by=request.user), request.user.pk
+        ).annotate(effective_status=F("status"))
+        queryset = rows.values(
+            queryset, "id", "archived_at", *self.paginator.get_ordering_fields(queryset)
+        )
+        page = self.paginate_queryset(queryset)
+        with profile_timer(request, "serialize"):
+            data = [
+                {**rows.encode(row), "archived_at": format_datetime(row["archived_at"])}
+                for row in page
+            ]
+        return self.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        """
+        Stream every todo of the user (filters apply) as NDJSON or CSV.
+
+        Rows come from a server-side cursor and are encoded without the
+        serializer, so memory use does not grow with the number of todos.
+        """
+        renderer = request.accepted_renderer
+        queryset = self.filter_queryset(self.get_queryset()).order_by("pk")
+        # The rows are read after dispatch() has released the replica, so
+        # bind the stream to the database routed to now.
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(
+            stream_export(queryset, renderer.format, settings.TODO_EXPORT_CHUNK_SIZE),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="todos.{renderer.format}"'
+        )
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import", url_name="import")
+    def import_todos(self, request):
+        """
+        Import NDJSON (``application/x-ndjson``) or CSV (``text/csv``) todos.
+
+        The body is read line by line rather than parsed up front; rows are
+        written in batches and invalid rows are reported without aborting.
+        """
+        formats = {r.media_type: r.format for r in (NDJSONRenderer, CSVRenderer)}
+        format = formats.get(request.content_type.split(";")[0].strip())
+        if format is None:
+            raise UnsupportedMediaType(request.content_type)
+
+        importer = TodoImporter(
+            request.user,
+            batch_size=settings.TODO_IMPORT_BATCH_SIZE,
+            max_errors=settings.TODO_IMPORT_MAX_ERRORS,
+        )
+        try:
+            lines = codecs.iterdecode(request.stream or [], "utf-8")
+            report = importer.run(lines, format)
+        except UnicodeDecodeError:
+            raise ParseError("Import body must be UTF-8.")
+        return Response(report, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(request_body=TodoSerializer(many=True))
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        serializer = self.get_bulk_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        notify_todos_changed(
+            Todo, request.user.pk, "create", [todo.pk for todo in serializer.instance]
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(request_body=TodoSerializer(many=True))
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        items = request.data if isinstance(request.data, list) else []
+        ids = [
+            item["id"]
+            for item in items
+            if isinstance(item, dict) and isinstance(item.get("id"), int)
+        ]
+        queryset = self.get_queryset()
+        with transaction.atomic(using=queryset.db):
+            todos = queryset.select_for_update().in_bulk(ids)
+            serializer = self.get_bulk_serializer(todos, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+            notify_todos_changed(
+                Todo,
+                request.user.pk,
+                "update",
+                [todo.pk for todo in serializer.instance],
+                using=queryset.db,
+            )
+        return Response(serializer.data)
+
+    @swagger_auto_schema(request_body=TodoBulkDeleteSerializer)
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        serializer = TodoBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        queryset = self.get_queryset().filter(pk__in=ids)
+        with transaction.atomic(using=queryset.db):
+            deleted = set(queryset.values_list("pk", flat=True))
+            queryset.filter(pk__in=deleted).delete()
+            notify_todos_changed(
+                Todo, request.user.pk, "delete", deleted, using=queryset.db
+            )
+        return Response(
+            {
+                "deleted": sorted(deleted),
+                "not_found": sorted(set(ids) - deleted),
+            }
+        )
@@ -0,0 +1,97 @@
+"""
+Compare a benchmark report against a stored baseline and fail on regressions.
+
+Works with the JSON written by ``benchmarks.scenarios`` and
+``benchmarks.replay``. Exits with status 1 when any scenario got slower,
+lost throughput or ran more queries than the thresholds allow:
+
+    python -m benchmarks.compare baseline.json results.json --latency 0.15
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)["scenarios"]
+
+
+def compare(baseline, current, latency, throughput, queries):
+    """Return ``(rows, regressions)`` where rows describe every checked metric."""
+    rows, regressions = [], []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        checks = [
+            (
+                "p95_ms",
+                before["latency"]["p95_ms"],
+                after["latency"]["p95_ms"],
+                lambda old, new: new > old * (1 + latency),
+            ),
+            (
+                "requests_per_s",
+                before["requests_per_s"],
+                after["requests_per_s"],
+                lambda old, new: new < old * (1 - throughput),
+            ),
+            (
+                "queries_per_request",
+                before["queries_per_request"],
+                after["queries_per_request"],
+                lambda old, new: new > old + queries,
+            ),
+        ]
+        for metric, old, new, regressed in checks:
+            if old is None or new is None:
+                continue
+            failed = regressed(old, new)
+            rows.append((name, metric, old, new, failed))
+            if failed:
+                regressions.append((name, metric, old, new))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.10,
+        help="Allowed p95 latency increase as a fraction (default 0.10).",
+    )
+    parser.add_argument(
+        "--throughput",
+        type=float,
+        default=0.10,
+        help="Allowed throughput drop as a fraction (default 0.10).",
+    )
+    parser.add_argument(
+        "--queries",
+        type=float,
+        default=0,
+        help="Allowed increase in queries per request (default 0).",
+    )
+    args = parser.parse_args()
+
+    rows, regressions = compare(
+        load(args.baseline),
+        load(args.current),
+        args.latency,
+        args.throughput,
+        args.queries,
+    )
+    for name, metric, old, new, failed in rows:
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        flag = "REGRESSION" if failed else "ok"
+        print(f"{name:<24} {metric:<20} {old:>10} -> {new:<10} {change:>8}  {flag}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
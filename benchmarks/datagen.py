@@ -0,0 +1,97 @@
+"""
+Generate synthetic users and todos quickly with batched inserts.
+
+Todos get a mix of statuses and expiry times (none, past and future). All
+users share one password, hashed once. Writes to the configured database:
+
+    DATABASE_URL=postgres://... python -m benchmarks.datagen --users 100 --todos 1000
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from .inprocess import setup_django
+
+PASSWORD = "benchmark-password-123"
+STATUS_WEIGHTS = {"pending": 50, "in_progress": 25, "completed": 20, "expired": 5}
+WORDS = (
+    "buy milk call mom write report fix bug plan trip book flight pay rent "
+    "review pull request water plants renew passport clean kitchen"
+).split()
+
+
+def email(index, prefix="bench"):
+    return f"{prefix}-{index}@example.com"
+
+
+def generate(users, todos_per_user, seed=0, batch_size=5000, prefix="bench"):
+    """Create ``users`` users with ``todos_per_user`` todos each; return the users."""
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.utils import timezone
+
+    from api.models import Todo, User
+
+    # SQLite sizes bulk_create batches from the open connection's limits.
+    connection.ensure_connection()
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        [User(email=email(i, prefix), password=password) for i in range(users)],
+        batch_size=batch_size,
+    )
+    created = list(User.objects.filter(email__in=[user.email for user in created]))
+
+    now = timezone.now()
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+    batch = []
+    for user in created:
+        for i in range(todos_per_user):
+            roll = rng.random()
+            if roll < 0.4:
+                expires_at = None
+            elif roll < 0.6:
+                expires_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+            else:
+                expires_at = now + timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+            batch.append(
+                Todo(
+                    title=" ".join(rng.sample(WORDS, 3)).capitalize(),
+                    body=" ".join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    status=rng.choices(statuses, weights)[0],
+                    expires_at=expires_at,
+                    created_by=user,
+                    updated_by=user,
+                )
+            )
+            if len(batch) >= batch_size:
+                Todo.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        Todo.objects.bulk_create(batch)
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--todos", type=int, default=1000, help="Todos per user.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--prefix", default="bench", help="Email prefix of the users.")
+    args = parser.parse_args()
+
+    setup_django()
+    start = time.perf_counter()
+    generate(args.users, args.todos, args.seed, args.batch_size, args.prefix)
+    elapsed = time.perf_counter() - start
+    rows = args.users * args.todos
+    print(
+        f"Created {args.users} users and {rows} todos in {elapsed:.1f}s "
+        f"({rows / elapsed:,.0f} todos/s); password {PASSWORD!r}"
+    )
+
+
+if __name__ == "__main__":
+    main()
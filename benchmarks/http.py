@@ -0,0 +1,52 @@
+import json
+import math
+import time
+import urllib.error
+import urllib.request
+
+
+def request(base_url, method, path, data=None, token=None, timeout=30):
+    """Send a JSON request and return ``(status, parsed body, seconds)``."""
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(base_url.rstrip("/") + path, data=body, method=method)
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as exc:
+        status, payload = exc.code, exc.read()
+    except (urllib.error.URLError, OSError):
+        status, payload = 0, b""
+    elapsed = time.perf_counter() - start
+
+    try:
+        parsed = json.loads(payload) if payload else None
+    except ValueError:
+        parsed = None
+    return status, parsed, elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def latency_summary(seconds):
+    return {
+        "count": len(seconds),
+        "p50_ms": _ms(percentile(seconds, 50)),
+        "p95_ms": _ms(percentile(seconds, 95)),
+        "p99_ms": _ms(percentile(seconds, 99)),
+        "max_ms": _ms(max(seconds) if seconds else None),
+    }
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 2)
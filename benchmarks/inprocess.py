@@ -0,0 +1,77 @@
+"""
+Helpers for benchmarks that drive the Django app in-process through the test
+client, so every request can also report the queries it ran.
+"""
+import contextlib
+import os
+import time
+from collections import defaultdict
+
+from .http import latency_summary
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    # Lets the test client through ALLOWED_HOSTS.
+    setup_test_environment()
+
+
+@contextlib.contextmanager
+def scratch_database():
+    """Run against a throwaway copy of the default database, like the tests do."""
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class Recorder:
+    """Collect ``(status, seconds, queries)`` per request name."""
+
+    def __init__(self):
+        self.results = defaultdict(list)
+        self.elapsed = defaultdict(float)
+
+    def request(self, name, client, method, path, data=None, expect=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        send = getattr(client, method.lower())
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            if data is None:
+                response = send(path)
+            else:
+                response = send(path, data, format="json")
+            seconds = time.perf_counter() - start
+        if expect is None:
+            ok = response.status_code < 400
+        else:
+            ok = response.status_code == expect
+        self.results[name].append((ok, seconds, len(queries)))
+        self.elapsed[name] += seconds
+        return response
+
+    def summary(self):
+        report = {}
+        for name, results in self.results.items():
+            ok = [seconds for passed, seconds, _ in results if passed]
+            elapsed = self.elapsed[name]
+            report[name] = {
+                "requests": len(results),
+                "errors": len(results) - len(ok),
+                "requests_per_s": round(len(results) / elapsed, 2) if elapsed else None,
+                "queries_per_request": round(
+                    sum(queries for _, _, queries in results) / len(results), 2
+                ),
+                "latency": latency_summary(ok),
+            }
+        return report
@@ -0,0 +1,116 @@
+"""
+Compare requests/sec and tail latency of the WSGI and ASGI todo endpoints.
+
+Start the server(s) separately, e.g. gunicorn with sync workers for
+``config.wsgi`` and with ``uvicorn_worker.UvicornWorker`` for ``config.asgi``,
+then run one target per path:
+
+    python -m benchmarks.load_test \\
+        --target wsgi=http://127.0.0.1:8000/api/v1/todos/ \\
+        --target asgi=http://127.0.0.1:8001/api/v1/async/todos/
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+import uuid
+
+from .http import latency_summary, request
+
+
+def login(base_url, email, password):
+    credentials = {"email": email, "password": password}
+    request(base_url, "POST", "/api/v1/auth/signup/", credentials)
+    status, body, _ = request(base_url, "POST", "/api/v1/auth/login/", credentials)
+    if status != 200:
+        raise SystemExit(f"Could not log in to {base_url}: HTTP {status}")
+    return body["access"]
+
+
+def seed(base_url, token, todos):
+    for start in range(0, todos, 500):
+        batch = [
+            {"title": f"Load test {i}", "body": "Body"}
+            for i in range(start, min(start + 500, todos))
+        ]
+        request(base_url, "POST", "/api/v1/todos/bulk/", batch, token=token)
+
+
+def worker(base_url, path, token, deadline, results):
+    while time.monotonic() < deadline:
+        status, _, elapsed = request(base_url, "GET", path, token=token)
+        results.append((status, elapsed))
+
+
+def run_target(name, url, args):
+    parts = urllib.parse.urlsplit(url)
+    base_url = f"{parts.scheme}://{parts.netloc}"
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    token = login(base_url, email, args.password)
+    seed(base_url, token, args.todos)
+
+    # Warm up connections, caches and lazily imported code.
+    for _ in range(10):
+        request(base_url, "GET", path, token=token)
+
+    results = []
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker, args=(base_url, path, token, deadline, results), daemon=True
+        )
+        for _ in range(args.concurrency)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    ok = [seconds for status, seconds in results if status == 200]
+    return {
+        "target": name,
+        "url": url,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "requests_per_s": round(len(ok) / elapsed, 2),
+        "latency": latency_summary(ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        metavar="NAME=URL",
+        help="Endpoint to load, e.g. asgi=http://127.0.0.1:8001/api/v1/async/todos/",
+    )
+    parser.add_argument("--password", default="benchmark-password-123")
+    parser.add_argument("--todos", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    reports = []
+    for target in args.target:
+        name, _, url = target.partition("=")
+        reports.append(run_target(name, url, args))
+
+    text = json.dumps(reports, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
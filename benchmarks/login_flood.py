@@ -0,0 +1,115 @@
+"""
+Measure login throughput and todo tail latency while logins flood the server.
+
+Run against a server started separately, once per login path, for example:
+
+    python -m benchmarks.login_flood --login-path /api/v1/auth/login/
+    python -m benchmarks.login_flood --login-path /api/v1/auth/async/login/
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+from .http import latency_summary, request
+
+
+def ensure_user(base_url, email, password):
+    credentials = {"email": email, "password": password}
+    request(base_url, "POST", "/api/v1/auth/signup/", credentials)
+    status, body, _ = request(base_url, "POST", "/api/v1/auth/login/", credentials)
+    if status != 200:
+        raise SystemExit(f"Could not log in as {email}: HTTP {status}")
+    return body["access"]
+
+
+def probe_todos(base_url, token, duration, interval):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        status, _, elapsed = request(base_url, "GET", "/api/v1/todos/", token=token)
+        if status == 200:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+        time.sleep(interval)
+    return latencies, errors
+
+
+def flood_logins(base_url, login_path, credentials, stop, results):
+    while not stop.is_set():
+        status, _, elapsed = request(base_url, "POST", login_path, credentials)
+        results.append((status, elapsed))
+
+
+def run(args):
+    email = args.email or f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    credentials = {"email": email, "password": args.password}
+    token = ensure_user(args.base_url, email, args.password)
+
+    baseline, baseline_errors = probe_todos(
+        args.base_url, token, args.baseline_seconds, args.probe_interval
+    )
+
+    stop = threading.Event()
+    results = []
+    flooders = [
+        threading.Thread(
+            target=flood_logins,
+            args=(args.base_url, args.login_path, credentials, stop, results),
+            daemon=True,
+        )
+        for _ in range(args.concurrency)
+    ]
+    start = time.monotonic()
+    for thread in flooders:
+        thread.start()
+    flooded, flooded_errors = probe_todos(
+        args.base_url, token, args.duration, args.probe_interval
+    )
+    stop.set()
+    for thread in flooders:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    logins = [seconds for status, seconds in results if status == 200]
+    return {
+        "login_path": args.login_path,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "login": {
+            "ok": len(logins),
+            "rejected_503": sum(1 for status, _ in results if status == 503),
+            "failed": sum(1 for status, _ in results if status not in (200, 503)),
+            "throughput_per_s": round(len(logins) / elapsed, 2),
+            "latency": latency_summary(logins),
+        },
+        "todos_baseline": {**latency_summary(baseline), "errors": baseline_errors},
+        "todos_during_flood": {**latency_summary(flooded), "errors": flooded_errors},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--login-path", default="/api/v1/auth/login/")
+    parser.add_argument("--email", help="Existing user; a new one is created if omitted.")
+    parser.add_argument("--password", default="benchmark-password-123")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Replay a recorded request log in-process and report per-route statistics.
+
+The log is JSON Lines, one request per line:
+
+    {"method": "GET", "path": "/api/v1/todos/", "user": "bench-3@example.com"}
+    {"method": "POST", "path": "/api/v1/todos/", "body": {"title": "a", "body": "b"}}
+
+``user`` is optional; requests without it are sent with the first ``bench-*``
+user, or anonymously with ``"user": null``. Runs against the configured
+database, e.g. one filled by ``benchmarks.datagen``:
+
+    python -m benchmarks.replay log.jsonl --output replay.json
+"""
+import argparse
+import json
+
+from .inprocess import Recorder, setup_django
+
+DEFAULT_USER = object()
+
+
+def route_name(method, path):
+    from django.urls import Resolver404, resolve
+
+    try:
+        match = resolve(path.split("?", 1)[0])
+    except Resolver404:
+        return f"{method} (unresolved)"
+    return f"{method} {match.url_name or match.route}"
+
+
+def replay(lines, recorder=None):
+    from rest_framework.test import APIClient
+
+    from api.models import User
+
+    from .scenarios import authenticated_client
+
+    recorder = recorder or Recorder()
+    clients = {None: APIClient()}
+    default = User.objects.filter(email__startswith="bench-").order_by("pk").first()
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        method = entry.get("method", "GET").upper()
+        path = entry["path"]
+        email = entry.get("user", DEFAULT_USER)
+        if email is DEFAULT_USER:
+            email = default.email if default else None
+        if email not in clients:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise SystemExit(f"line {number}: unknown user {email}")
+            clients[email] = authenticated_client(user)
+        recorder.request(
+            route_name(method, path), clients[email], method, path, entry.get("body")
+        )
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log", help="JSON Lines request log.")
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Replay the log this many times."
+    )
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    recorder = Recorder()
+    for _ in range(args.repeat):
+        with open(args.log) as lines:
+            replay(lines, recorder)
+
+    text = json.dumps({"scenarios": recorder.summary()}, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
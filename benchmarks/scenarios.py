@@ -0,0 +1,168 @@
+"""
+Run the API scenarios in-process and report latency, throughput and queries.
+
+By default a scratch database is created, filled by ``benchmarks.datagen`` and
+dropped afterwards, so runs are repeatable:
+
+    python -m benchmarks.scenarios --users 20 --todos 500 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
+import argparse
+import json
+import platform
+import random
+import time
+import uuid
+
+from .inprocess import Recorder, scratch_database, setup_django
+
+SCENARIOS = ("signup", "login", "list", "retrieve", "create", "update", "delete")
+
+
+def authenticated_client(user):
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+def run(users, scenarios, requests, auth_requests, seed):
+    from rest_framework.test import APIClient
+
+    from api.models import Todo
+
+    from .datagen import PASSWORD
+
+    rng = random.Random(seed)
+    recorder = Recorder()
+    clients = {user.pk: authenticated_client(user) for user in users}
+    todo_ids = {
+        user.pk: list(Todo.objects.owned_by(user).values_list("pk", flat=True))
+        for user in users
+    }
+    anonymous = APIClient()
+    created = []
+
+    for name in scenarios:
+        count = auth_requests if name in ("signup", "login") else requests
+        for _ in range(count):
+            user = rng.choice(users)
+            client = clients[user.pk]
+            if name == "signup":
+                credentials = {
+                    "email": f"signup-{uuid.uuid4().hex[:12]}@example.com",
+                    "password": PASSWORD,
+                }
+                recorder.request(
+                    name, anonymous, "POST", "/api/v1/auth/signup/", credentials
+                )
+            elif name == "login":
+                credentials = {"email": user.email, "password": PASSWORD}
+                recorder.request(
+                    name, anonymous, "POST", "/api/v1/auth/login/", credentials
+                )
+            elif name == "list":
+                path = f"/api/v1/todos/?page_size={rng.choice((20, 50, 100))}"
+                recorder.request(name, client, "GET", path)
+            elif name == "retrieve" and todo_ids[user.pk]:
+                pk = rng.choice(todo_ids[user.pk])
+                recorder.request(name, client, "GET", f"/api/v1/todos/{pk}/")
+            elif name == "create":
+                data = {"title": "Benchmark", "body": "Created by the benchmark"}
+                response = recorder.request(
+                    name, client, "POST", "/api/v1/todos/", data
+                )
+                if response.status_code == 201:
+                    created.append((user.pk, response.json()["id"]))
+            elif name == "update" and created:
+                user_id, pk = rng.choice(created)
+                recorder.request(
+                    name,
+                    clients[user_id],
+                    "PATCH",
+                    f"/api/v1/todos/{pk}/",
+                    {"status": rng.choice(("in_progress", "completed"))},
+                )
+            elif name == "delete" and created:
+                user_id, pk = created.pop()
+                recorder.request(
+                    name, clients[user_id], "DELETE", f"/api/v1/todos/{pk}/"
+                )
+    return recorder.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--todos", type=int, default=500, help="Todos per user.")
+    parser.add_argument("--requests", type=int, default=500, help="Per scenario.")
+    parser.add_argument(
+        "--auth-requests",
+        type=int,
+        default=20,
+        help="Signup/login requests; each one hashes a password.",
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="Scenario to run (repeatable); defaults to all.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--use-existing-db",
+        action="store_true",
+        help="Use the configured database and its existing bench-* users.",
+    )
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+    from api.models import User
+
+    from .datagen import generate
+
+    def execute():
+        if args.use_existing_db:
+            users = list(User.objects.filter(email__startswith="bench-"))
+            if not users:
+                raise SystemExit("No bench-* users; run python -m benchmarks.datagen.")
+        else:
+            users = generate(args.users, args.todos, args.seed)
+        start = time.perf_counter()
+        scenarios = run(
+            users,
+            args.scenario or SCENARIOS,
+            args.requests,
+            args.auth_requests,
+            args.seed,
+        )
+        return {
+            "meta": {
+                "users": len(users),
+                "todos_per_user": None if args.use_existing_db else args.todos,
+                "requests": args.requests,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "duration_s": round(time.perf_counter() - start, 2),
+            },
+            "scenarios": scenarios,
+        }
+
+    if args.use_existing_db:
+        report = execute()
+    else:
+        with scratch_database():
+            report = execute()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
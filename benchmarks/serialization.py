@@ -0,0 +1,104 @@
+"""
+Compare rows/sec and peak allocations of the todo read paths.
+
+Encodes the same in-memory rows with ``TodoSerializer`` + DRF's
+``JSONRenderer`` (the old path) and with ``TodoRows`` + ``FastJSONRenderer``.
+No database is touched, so the numbers isolate serialization and rendering:
+
+    python -m benchmarks.serialization --rows 10000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from .inprocess import setup_django
+
+
+def make_rows(count):
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": i,
+            "effective_status": "pending",
+            "title": f"Todo {i}",
+            "body": "Lorem ipsum dolor sit amet " * 8,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(days=1),
+            "created_by": 1,
+            "updated_by": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def serializer_path(rows):
+    from rest_framework.renderers import JSONRenderer
+
+    from api.models import Todo
+    from api.serializers import TodoSerializer
+
+    todos = []
+    for row in rows:
+        row = dict(row)
+        effective_status = row.pop("effective_status")
+        row["created_by_id"] = row.pop("created_by")
+        row["updated_by_id"] = row.pop("updated_by")
+        todo = Todo(status=effective_status, **row)
+        todo.effective_status = effective_status
+        todos.append(todo)
+
+    def run():
+        return JSONRenderer().render(TodoSerializer(todos, many=True).data)
+
+    return run
+
+
+def rows_path(rows):
+    from api.renderers import FastJSONRenderer
+    from api.rows import TodoRows
+
+    def run():
+        encoder = TodoRows()
+        return FastJSONRenderer().render([encoder.encode(row) for row in rows])
+
+    return run
+
+
+def measure(run, rows, repeat):
+    run()
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows / best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    rows = make_rows(args.rows)
+    results = {
+        "serializer": measure(serializer_path(rows), args.rows, args.repeat),
+        "rows": measure(rows_path(rows), args.rows, args.repeat),
+    }
+    for name, (rate, peak) in results.items():
+        print(f"{name:<10} {rate:>12,.0f} rows/s {peak / 1024 / 1024:>9.1f} MiB peak")
+    speedup = results["rows"][0] / results["serializer"][0]
+    print(f"TodoRows is {speedup:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
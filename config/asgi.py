@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+from api.scheduler import install_expiry_sweeper  # noqa: E402
+
+install_expiry_sweeper()
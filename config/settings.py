@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 from datetime import timedelta
 import dj_database_url
 
+import math
 import os
 
 load_dotenv()
@@ -41,11 +42,19 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
-    "drf_yasg",
     "api",
 ]
 
+# Swagger/ReDoc docs. When disabled drf_yasg is never imported.
+API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "True").lower() == "true"
+# Schema written by `manage.py generate_api_schema` and served as a static file.
+API_SCHEMA_FILE = Path(os.getenv("API_SCHEMA_FILE", BASE_DIR / "openapi.json"))
+
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index("api"), "drf_yasg")
+
 MIDDLEWARE = [
+    "api.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -56,6 +65,20 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Prometheus metrics at /metrics. Set PROMETHEUS_MULTIPROC_DIR (see api.metrics)
+# when running several worker processes. METRICS_TOKEN requires
+# "Authorization: Bearer <token>" on scrapes; it must be set when DEBUG=False, and
+# metrics are off by default until it is.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ENABLED = (
+    os.getenv("METRICS_ENABLED", str(DEBUG or bool(METRICS_TOKEN))).lower() == "true"
+)
+if METRICS_ENABLED and not DEBUG and not METRICS_TOKEN:
+    raise RuntimeError("METRICS_TOKEN must be set to serve /metrics when DEBUG=False")
+
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(1, "api.metrics.MetricsMiddleware")
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -79,7 +102,12 @@ AUTH_USER_MODEL = "api.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
+        "api.authentication.BatchAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
 }
 
@@ -93,6 +121,12 @@ SWAGGER_SETTINGS = {
         }
     },
     "USE_SESSION_AUTH": False,
+    # The UIs load the precomputed schema instead of regenerating it.
+    "SPEC_URL": "schema-json",
+}
+
+REDOC_SETTINGS = {
+    "SPEC_URL": "schema-json",
 }
 
 SIMPLE_JWT = {
@@ -100,6 +134,129 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "todo-api",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "10000"))},
+    }
+}
+
+# A cache shared by every worker process (Redis). Per-user todo versions must
+# live there when more than one process serves requests.
+if os.getenv("SHARED_CACHE_URL"):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("SHARED_CACHE_URL"),
+    }
+
+# Worker processes per host; gunicorn and uvicorn read WEB_CONCURRENCY as their
+# default worker count. Per-user todo versions (and so cached responses and
+# ETags) are only invalidated in the process that wrote unless they live in the
+# shared cache, so several workers without SHARED_CACHE_URL do not cache todo
+# responses at all (system check api.W001). Set it as well when several hosts
+# serve the API.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+_cache_seen_by_all_workers = WEB_CONCURRENCY == 1 or "shared" in CACHES
+
+TODO_RESPONSE_CACHING = _cache_seen_by_all_workers
+TODO_RESPONSE_CACHE = "default"
+TODO_RESPONSE_CACHE_TIMEOUT = int(os.getenv("TODO_RESPONSE_CACHE_TIMEOUT", "300"))
+TODO_VERSION_CACHE = "shared" if "shared" in CACHES else "default"
+
+# Users resolved from JWTs are kept for TIMEOUT seconds in the shared cache, or
+# else in a per-process LRU of MAX_ENTRIES. Other workers could not evict a
+# per-process entry, so several workers without a shared cache do not cache users.
+AUTH_USER_CACHE = {
+    "MAX_ENTRIES": int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000")),
+    "TIMEOUT": (
+        int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "60"))
+        if _cache_seen_by_all_workers
+        else 0
+    ),
+    "SHARED_CACHE": "shared" if "shared" in CACHES else None,
+}
+
+# Revoked token ids are checked against a per-process Bloom filter sized for
+# CAPACITY tokens at ERROR_RATE false positives, backed by an exact set. Each
+# process pulls revocations made by other processes every SYNC_INTERVAL seconds.
+TOKEN_REVOCATION = {
+    "CAPACITY": int(os.getenv("TOKEN_REVOCATION_CAPACITY", "100000")),
+    "ERROR_RATE": float(os.getenv("TOKEN_REVOCATION_ERROR_RATE", "0.001")),
+    "SYNC_INTERVAL": float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "2")),
+}
+
+# Password hashing for the async signup/login views runs in a process pool of
+# this many workers (0 uses a thread instead). Once QUEUE_LIMIT hashes are
+# running or waiting, further requests get 503.
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv("PASSWORD_HASHING_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+PASSWORD_HASHING_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASHING_QUEUE_LIMIT", "64"))
+
+# Interval in seconds between in-process expiry sweeps; 0 disables the sweeper.
+# Every worker would sweep the same rows, so with several workers the sweeper
+# does not run (system check api.W002); run `manage.py expire_todos --interval N`
+# as one process (or cron) instead.
+TODO_EXPIRY_SWEEP_INTERVAL = int(
+    os.getenv("TODO_EXPIRY_SWEEP_INTERVAL", "60" if WEB_CONCURRENCY == 1 else "0")
+)
+TODO_EXPIRY_BATCH_SIZE = int(os.getenv("TODO_EXPIRY_BATCH_SIZE", "1000"))
+
+# Maximum number of todos accepted by a single bulk create/update/delete request.
+TODO_BULK_MAX_ITEMS = int(os.getenv("TODO_BULK_MAX_ITEMS", "500"))
+
+# POST /api/v1/batch/ accepts at most this many sub-requests and body bytes.
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(1024 * 1024)))
+
+# Rows fetched per round trip (and written per chunk) by the streaming export.
+TODO_EXPORT_CHUNK_SIZE = int(os.getenv("TODO_EXPORT_CHUNK_SIZE", "2000"))
+
+# Rows written per transaction by imports, and how many row errors are reported.
+TODO_IMPORT_BATCH_SIZE = int(os.getenv("TODO_IMPORT_BATCH_SIZE", "1000"))
+TODO_IMPORT_MAX_ERRORS = int(os.getenv("TODO_IMPORT_MAX_ERRORS", "100"))
+
+# Per-request profiling: Server-Timing header and a JSON log line per request,
+# plus cProfile (and optionally tracemalloc) dumps for a sample of requests.
+# Sampled dumps are only kept when the request took at least SLOW_MS (0 = all).
+# Off unless DEBUG; when on, Server-Timing is only sent to staff unless DEBUG.
+REQUEST_PROFILING = {
+    "ENABLED": os.getenv("REQUEST_PROFILING_ENABLED", str(DEBUG)).lower() == "true",
+    "SAMPLE_RATE": float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0")),
+    "SLOW_MS": float(os.getenv("REQUEST_PROFILING_SLOW_MS", "0")),
+    "TRACEMALLOC": os.getenv("REQUEST_PROFILING_TRACEMALLOC", "False").lower()
+    == "true",
+    "DUMP_DIR": os.getenv("REQUEST_PROFILING_DUMP_DIR", str(BASE_DIR / "profiles")),
+}
+
+# Delta sync only returns rows at least this many seconds old, so late commits
+# are not skipped. Deletion tombstones are kept for TODO_DELETION_RETENTION days;
+# older sync cursors get 410 Gone.
+TODO_SYNC_LAG = float(os.getenv("TODO_SYNC_LAG", "2"))
+TODO_DELETION_RETENTION = int(os.getenv("TODO_DELETION_RETENTION", "30"))
+
+# `manage.py archive_todos` moves todos completed or expired more than this many
+# days ago to the archive table.
+TODO_ARCHIVE_AFTER_DAYS = int(os.getenv("TODO_ARCHIVE_AFTER_DAYS", "90"))
+
+# Admin change lists count exactly up to this many rows; larger counts are
+# planner estimates on Postgres and capped at this number on SQLite. Admin
+# actions update or delete this many todos per statement.
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv("ADMIN_EXACT_COUNT_LIMIT", "10000"))
+ADMIN_ACTION_BATCH_SIZE = int(os.getenv("ADMIN_ACTION_BATCH_SIZE", "1000"))
+
+# Real-time todo events: pub/sub backend, events buffered per connection before
+# the client is told to resync, and seconds between keepalive comments.
+TODO_EVENTS_BROKER = os.getenv("TODO_EVENTS_BROKER", "api.events.InProcessBroker")
+TODO_EVENTS_QUEUE_SIZE = int(os.getenv("TODO_EVENTS_QUEUE_SIZE", "100"))
+TODO_EVENTS_HEARTBEAT = float(os.getenv("TODO_EVENTS_HEARTBEAT", "15"))
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
@@ -123,6 +280,76 @@ else:
     if not os.getenv("DATABASE_URL"):
         raise RuntimeError("DATABASE_URL must be set when DEBUG=False")
 
+# Read replicas for safe TodoViewSet reads (see api.replicas): comma-separated
+# database URLs, optionally weighted, e.g. DATABASE_REPLICA_WEIGHTS="3,1".
+# Replicas failing the health check run every CHECK_INTERVAL seconds, or lagging
+# more than MAX_LAG seconds (Postgres), are skipped until the next check, so a
+# replica in use can be up to MAX_LAG + CHECK_INTERVAL seconds behind. A user is
+# kept on the primary for PIN_SECONDS after writing, which defaults to that and
+# may not be shorter. The pin must be seen by every worker, so outside DEBUG
+# replicas need SHARED_CACHE_URL.
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+DATABASE_REPLICA_WEIGHTS = [
+    int(weight)
+    for weight in os.getenv("DATABASE_REPLICA_WEIGHTS", "").split(",")
+    if weight.strip()
+]
+DATABASE_REPLICA_CHECK_INTERVAL = int(
+    os.getenv("DATABASE_REPLICA_CHECK_INTERVAL", "10")
+)
+DATABASE_REPLICA_MAX_LAG = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "5"))
+_replica_staleness = DATABASE_REPLICA_MAX_LAG + DATABASE_REPLICA_CHECK_INTERVAL
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.getenv("DATABASE_REPLICA_PIN_SECONDS", str(math.ceil(_replica_staleness)))
+)
+if DATABASE_REPLICA_PIN_SECONDS < _replica_staleness:
+    raise RuntimeError(
+        "DATABASE_REPLICA_PIN_SECONDS must be at least "
+        "DATABASE_REPLICA_MAX_LAG + DATABASE_REPLICA_CHECK_INTERVAL"
+    )
+if DATABASE_REPLICA_URLS and not DEBUG and "shared" not in CACHES:
+    raise RuntimeError("SHARED_CACHE_URL must be set to use DATABASE_REPLICA_URLS")
+DATABASE_REPLICAS = {}
+
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    alias = f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(
+        url, conn_max_age=DATABASES["default"].get("CONN_MAX_AGE", 0)
+    )
+    # Tests read replicas through the primary's test database.
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    weights = DATABASE_REPLICA_WEIGHTS
+    DATABASE_REPLICAS[alias] = weights[index] if index < len(weights) else 1
+
+# Todo sharding by owner (see api.shards): comma-separated database URLs, e.g.
+# local SQLite files "sqlite:////srv/todos-0.sqlite3,sqlite:////srv/todos-1.sqlite3".
+# Users stay on the default database; each user's todos, tombstones, archive
+# and stats live on one shard. Workers cache where a user lives for
+# DIRECTORY_TIMEOUT seconds, which is also how long rebalance_shards waits
+# between the steps of a move.
+TODO_SHARD_URLS = [
+    url.strip() for url in os.getenv("TODO_SHARD_URLS", "").split(",") if url.strip()
+]
+TODO_SHARD_DIRECTORY_TIMEOUT = int(os.getenv("TODO_SHARD_DIRECTORY_TIMEOUT", "5"))
+TODO_SHARDS = []
+
+for index, url in enumerate(TODO_SHARD_URLS):
+    alias = f"shard_{index}"
+    DATABASES[alias] = dj_database_url.parse(
+        url, conn_max_age=DATABASES["default"].get("CONN_MAX_AGE", 0)
+    )
+    TODO_SHARDS.append(alias)
+
+DATABASE_ROUTERS = []
+if TODO_SHARDS:
+    DATABASE_ROUTERS.append("api.shards.ShardRouter")
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS.append("api.replicas.ReplicaRouter")
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+from api.scheduler import install_expiry_sweeper  # noqa: E402
+
+install_expiry_sweeper()